@@ -1,48 +1,200 @@
 # main.py
 import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
 from pathlib import Path
 
+# --- Definición del pipeline ---
+
+# Cada etapa declara el script que ejecuta, las etapas de las que depende y si es
+# opcional. Las etapas sin dependencias pendientes corren en paralelo. Si una etapa
+# opcional falla, sus dependientes se ejecutan igual con los datos de la corrida
+# anterior; si falla una obligatoria, sus dependientes se omiten.
+ETAPAS = {
+    # Homicidios y robos comparten un mismo pool de navegadores. Robos sigue siendo
+    # opcional dentro de get_flourish.py: si falla, la etapa no falla y el merge usa
+    # el robos.csv anterior.
+    'flourish': {'script': 'get_flourish.py', 'depende_de': [], 'opcional': False},
+    'clima': {'script': 'get_clima.py', 'depende_de': [], 'opcional': True},
+    'dolar': {'script': 'get_dolar.py', 'depende_de': [], 'opcional': True},
+    'dias_pago': {'script': 'get_dias_pago.py', 'depende_de': [], 'opcional': True},
+    'merge': {
+        'script': 'merge_data.py',
+        'depende_de': ['flourish', 'clima', 'dolar', 'dias_pago'],
+        'opcional': False,
+    },
+    'drift': {'script': 'monitor_drift.py', 'depende_de': ['merge'], 'opcional': True},
+}
+
+_print_lock = threading.Lock()
+
 def run_script(script_name):
     """Ejecuta un script de Python y maneja los errores."""
     script_path = Path(__file__).parent / 'utils' / script_name
     try:
-        print(f"--- Ejecutando {script_name} ---")
         result = subprocess.run([sys.executable, str(script_path)], check=True, capture_output=True, text=True)
-        print(result.stdout)
-        if result.stderr:
-            print("Errores:", result.stderr)
-        print(f"--- {script_name} finalizado ---")
+        # La salida se imprime en bloque para que no se mezcle con la de otras etapas
+        with _print_lock:
+            print(f"--- Ejecutando {script_name} ---")
+            print(result.stdout)
+            if result.stderr:
+                print("Errores:", result.stderr)
+            print(f"--- {script_name} finalizado ---")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Error al ejecutar {script_name}:")
-        print(e.stdout)
-        print(e.stderr)
+        with _print_lock:
+            print(f"Error al ejecutar {script_name}:")
+            print(e.stdout)
+            print(e.stderr)
         return False
     except FileNotFoundError:
-        print(f"Error: No se encontró el script {script_path}.")
+        with _print_lock:
+            print(f"Error: No se encontró el script {script_path}.")
         return False
 
+def _ejecutar_etapa(nombre, etapas=ETAPAS):
+    """Ejecuta una etapa y devuelve (éxito, duración en segundos)."""
+    inicio = time.perf_counter()
+    ok = run_script(etapas[nombre]['script'])
+    return ok, time.perf_counter() - inicio
+
+def validar_etapas(etapas):
+    """Verifica que las dependencias existan y que el grafo no tenga ciclos."""
+    for nombre, etapa in etapas.items():
+        for dep in etapa['depende_de']:
+            if dep not in etapas:
+                raise ValueError(f"La etapa '{nombre}' depende de '{dep}', que no existe.")
+
+    visitando, visitadas = set(), set()
+
+    def visitar(nombre):
+        if nombre in visitadas:
+            return
+        if nombre in visitando:
+            raise ValueError(f"Ciclo de dependencias detectado en la etapa '{nombre}'.")
+        visitando.add(nombre)
+        for dep in etapas[nombre]['depende_de']:
+            visitar(dep)
+        visitando.discard(nombre)
+        visitadas.add(nombre)
+
+    for nombre in etapas:
+        visitar(nombre)
+
+def ruta_critica(etapas, duraciones):
+    """
+    Calcula la ruta crítica del pipeline a partir de las duraciones medidas.
+
+    Returns:
+        tuple: (tiempo de la ruta crítica en segundos, lista de etapas de la ruta).
+    """
+    memo = {}
+
+    def fin(nombre):
+        if nombre not in memo:
+            previas = [fin(dep) for dep in etapas[nombre]['depende_de'] if dep in duraciones]
+            t_prev, camino_prev = max(previas, key=lambda r: r[0]) if previas else (0.0, [])
+            memo[nombre] = (t_prev + duraciones[nombre], camino_prev + [nombre])
+        return memo[nombre]
+
+    if not duraciones:
+        return 0.0, []
+    return max((fin(nombre) for nombre in duraciones), key=lambda r: r[0])
+
+def ejecutar_pipeline(etapas=ETAPAS, max_workers=None, ejecutar=None):
+    """
+    Ejecuta las etapas respetando sus dependencias con un pool de workers.
+
+    Args:
+        etapas (dict): Definición de etapas (ver ETAPAS).
+        max_workers (int): Número máximo de etapas simultáneas. Por defecto, una por etapa.
+        ejecutar (callable): Función que recibe el nombre de la etapa y devuelve (ok, duración).
+            Por defecto ejecuta el script de la etapa definido en `etapas`.
+
+    Returns:
+        dict: Estado final de cada etapa ('ok', 'error' u 'omitida') y duraciones medidas.
+    """
+    validar_etapas(etapas)
+    if ejecutar is None:
+        ejecutar = partial(_ejecutar_etapa, etapas=etapas)
+    estado = {}
+    duraciones = {}
+    pendientes = set(etapas)
+
+    def lista(nombre):
+        return all(dep in estado for dep in etapas[nombre]['depende_de'])
+
+    def bloqueada(nombre):
+        # Solo bloquea una dependencia obligatoria que no terminó bien
+        return any(estado[dep] != 'ok' and not etapas[dep]['opcional']
+                   for dep in etapas[nombre]['depende_de'])
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(etapas)) as pool:
+        en_curso = {}
+        while pendientes or en_curso:
+            # Lanzar (u omitir) todas las etapas cuyas dependencias ya terminaron
+            hubo_cambios = True
+            while hubo_cambios:
+                hubo_cambios = False
+                for nombre in sorted(pendientes):
+                    if not lista(nombre):
+                        continue
+                    pendientes.discard(nombre)
+                    hubo_cambios = True
+                    if bloqueada(nombre):
+                        estado[nombre] = 'omitida'
+                        with _print_lock:
+                            print(f"Etapa '{nombre}' omitida: falló una dependencia obligatoria.")
+                    else:
+                        en_curso[pool.submit(ejecutar, nombre)] = nombre
+
+            if not en_curso:
+                break
+
+            terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                nombre = en_curso.pop(futuro)
+                try:
+                    ok, duracion = futuro.result()
+                except Exception as e:
+                    with _print_lock:
+                        print(f"Error inesperado en la etapa '{nombre}': {e}")
+                    ok, duracion = False, 0.0
+                estado[nombre] = 'ok' if ok else 'error'
+                duraciones[nombre] = duracion
+
+    return {'estado': estado, 'duraciones': duraciones}
+
+def imprimir_resumen(resultado, tiempo_total, etapas=ETAPAS):
+    """Muestra el tiempo por etapa, la ruta crítica y el tiempo total del pipeline."""
+    estado, duraciones = resultado['estado'], resultado['duraciones']
+    print("\n=== Resumen del pipeline ===")
+    for nombre in etapas:
+        if nombre in duraciones:
+            print(f"{nombre:<12} {estado[nombre]:<8} {duraciones[nombre]:8.2f} s")
+        else:
+            print(f"{nombre:<12} {estado.get(nombre, 'pendiente'):<8} {'-':>8}")
+    t_critico, camino = ruta_critica(etapas, duraciones)
+    print(f"Ruta crítica: {' -> '.join(camino)} ({t_critico:.2f} s)")
+    print(f"Tiempo total (reloj): {tiempo_total:.2f} s")
+    print(f"Suma secuencial de etapas: {sum(duraciones.values()):.2f} s")
+
 def main():
     """
     Orquesta la ejecución de todos los scripts para actualizar los datos.
     """
     print("Iniciando pipeline de actualización de datos...")
-    
-    # Lista de scripts a ejecutar en orden
-    scripts = [
-        'get_homicidios.py',
-        'get_robos.py',
-        'get_clima.py',
-        'get_dolar.py',
-        'get_dias_pago.py',
-        'merge_data.py'
-    ]
-    
-    for script in scripts:
-        if not run_script(script):
-            print(f"El pipeline se detuvo debido a un error en {script}.")
-            break
+
+    inicio = time.perf_counter()
+    resultado = ejecutar_pipeline(ETAPAS)
+    imprimir_resumen(resultado, time.perf_counter() - inicio, ETAPAS)
+
+    fallidas = [n for n, e in resultado['estado'].items() if e != 'ok']
+    if fallidas:
+        print(f"El pipeline terminó con etapas no completadas: {', '.join(sorted(fallidas))}.")
     else:
         print("Pipeline de actualización completado exitosamente.")
 
@@ -0,0 +1,30 @@
+# tests/conftest.py
+import sys
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Los scripts de utils/ se importan por nombre (sin paquete), como entre ellos mismos
+RAIZ = Path(__file__).parent.parent
+for ruta in (RAIZ, RAIZ / 'utils'):
+    if str(ruta) not in sys.path:
+        sys.path.insert(0, str(ruta))
+
+DIR_FIXTURES = Path(__file__).parent / 'fixtures'
+
+class _ManejadorSilencioso(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope='session')
+def servidor_fixtures():
+    """Sirve tests/fixtures por HTTP local y devuelve la URL base (sin / final)."""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), partial(_ManejadorSilencioso, directory=str(DIR_FIXTURES)))
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{servidor.server_address[1]}"
+    servidor.shutdown()
+    servidor.server_close()
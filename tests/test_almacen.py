@@ -0,0 +1,80 @@
+# tests/test_almacen.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import almacen
+from get_homicidios import guardar_homicidios
+from get_robos import guardar_robos
+
+# --- Datos ---
+
+def _robos(dias, inicio='2024-06-01', semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({'date': pd.date_range(inicio, periods=dias), 'robos': rng.poisson(20, dias)})
+
+def _feather(nombre, tmp_path):
+    return almacen.cargar(nombre, data_dir=tmp_path)
+
+# --- reemplazar_cola ---
+
+def test_cola_vacia_sin_feather_migra_el_csv(tmp_path):
+    _robos(233).to_csv(almacen.ruta_csv('robos', tmp_path), index=False)
+    almacen.reemplazar_cola('robos', _robos(0), tmp_path)
+    assert len(_feather('robos', tmp_path)) == 233
+
+def test_cola_sin_feather_migra_el_csv_completo(tmp_path):
+    # El CSV ya tiene la cola (se actualizó en su lugar); el Feather se crea con todo
+    serie = _robos(234)
+    serie.to_csv(almacen.ruta_csv('robos', tmp_path), index=False)
+    almacen.reemplazar_cola('robos', serie.tail(1), tmp_path)
+    pd.testing.assert_frame_equal(_feather('robos', tmp_path), serie)
+
+def test_cola_vacia_no_toca_el_feather(tmp_path):
+    almacen.guardar(_robos(50), 'robos', tmp_path, espejo_csv=False)
+    antes = almacen.ruta('robos', tmp_path).stat().st_mtime_ns
+    almacen.reemplazar_cola('robos', _robos(0), tmp_path)
+    assert almacen.ruta('robos', tmp_path).stat().st_mtime_ns == antes
+    assert len(_feather('robos', tmp_path)) == 50
+
+def test_cola_reemplaza_desde_su_primera_fecha(tmp_path):
+    serie = _robos(50)
+    almacen.guardar(serie, 'robos', tmp_path, espejo_csv=False)
+    cola = _robos(10, inicio=serie['date'].iloc[45], semilla=1)
+    almacen.reemplazar_cola('robos', cola, tmp_path)
+    esperado = pd.concat([serie.iloc[:45], cola], ignore_index=True)
+    pd.testing.assert_frame_equal(_feather('robos', tmp_path), esperado)
+
+def test_sin_feather_ni_csv(tmp_path):
+    almacen.reemplazar_cola('robos', _robos(0), tmp_path)
+    assert not almacen.existe('robos', tmp_path)
+    almacen.reemplazar_cola('robos', _robos(5), tmp_path)
+    assert len(_feather('robos', tmp_path)) == 5
+
+# --- Guardado incremental de las series ---
+
+def test_robos_csv_sin_feather_y_sin_cambios(tmp_path):
+    ruta = tmp_path / 'robos.csv'
+    serie = _robos(234)
+    serie.iloc[:233].to_csv(ruta, index=False)
+
+    # Corrida sin días nuevos: el Feather se crea con toda la historia del CSV
+    guardar_robos(serie.iloc[:233], ruta)
+    assert len(_feather('robos', tmp_path)) == 233
+
+    # La corrida siguiente agrega un día a ambos
+    guardar_robos(serie, ruta)
+    pd.testing.assert_frame_equal(_feather('robos', tmp_path), serie)
+    assert len(pd.read_csv(ruta)) == 234
+
+def test_homicidios_csv_sin_feather_y_sin_cambios(tmp_path):
+    ruta = tmp_path / 'homicidios.csv'
+    serie = _robos(120).rename(columns={'robos': 'homicidios'})
+    guardar_homicidios(serie.copy(), ruta, incremental=False)
+    almacen.ruta('homicidios', tmp_path).unlink()
+
+    guardar_homicidios(serie.copy(), ruta)
+
+    feather = _feather('homicidios', tmp_path)
+    assert len(feather) == 120
+    assert feather['date'].iloc[0] == serie['date'].iloc[0]
@@ -0,0 +1,73 @@
+# tests/test_backtest.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest import (COLUMNAS_METRICAS, _datos_sinteticos, _walk_forward_secuencial, baseline_ma7,
+                      comparar_modelos, pliegues)
+
+pytest.importorskip('sklearn')
+
+VENTANAS = (40, 60)
+COLUMNAS_FECHAS = ['train_start', 'train_end', 'test_start', 'test_end']
+
+@pytest.fixture(scope='module')
+def datos():
+    return _datos_sinteticos(dias=150, features=6)
+
+def _modelos():
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import PoissonRegressor
+
+    return {
+        'Poisson': PoissonRegressor(alpha=0.1, max_iter=500),
+        'RF': RandomForestRegressor(n_estimators=10, max_depth=4, random_state=42, n_jobs=1),
+    }
+
+@pytest.fixture(scope='module')
+def corridas(datos):
+    X, y, dates = datos
+    modelos = {**_modelos(), 'MA7': baseline_ma7}
+    return {n_jobs: comparar_modelos(modelos, X, y, dates, VENTANAS, test_window=7, gap=3, n_jobs=n_jobs,
+                                     devolver_predicciones=True)
+            for n_jobs in (1, 2)}
+
+def test_pliegues():
+    assert pliegues(20, train_window=10, test_window=3, gap=2) == [
+        (0, 10, 12, 15), (3, 13, 15, 18),
+    ]
+    assert pliegues(14, train_window=10, test_window=3, gap=2) == []
+
+def test_pool_igual_a_secuencia(corridas):
+    secuencia, pool = corridas[1], corridas[2]
+    assert len(pool) == len(secuencia)
+    columnas = ['model', 'train_window', 'fold'] + COLUMNAS_FECHAS + COLUMNAS_METRICAS
+    pd.testing.assert_frame_equal(pool[columnas], secuencia[columnas], check_exact=True)
+    for pred_pool, pred_secuencia in zip(pool['pred'], secuencia['pred']):
+        np.testing.assert_array_equal(pred_pool, pred_secuencia)
+
+@pytest.mark.parametrize('n_jobs', [1, 2])
+@pytest.mark.parametrize('nombre', ['Poisson', 'RF'])
+@pytest.mark.parametrize('ventana', VENTANAS)
+def test_igual_al_notebook_pliegue_por_pliegue(datos, corridas, n_jobs, nombre, ventana):
+    X, y, dates = datos
+    esperado = _walk_forward_secuencial(_modelos()[nombre], X, y, dates, ventana, test_window=7, gap=3)
+    resultado = corridas[n_jobs]
+    obtenido = resultado[(resultado['model'] == nombre) & (resultado['train_window'] == ventana)]
+    obtenido = obtenido.reset_index(drop=True)
+
+    assert obtenido['fold'].tolist() == list(range(len(esperado)))
+    pd.testing.assert_frame_equal(obtenido[esperado.columns], esperado, check_exact=True)
+
+def test_baseline_sin_entrenar(datos, corridas):
+    _, y, _ = datos
+    pred_total = baseline_ma7(y).to_numpy()
+    ma7 = corridas[2][corridas[2]['model'] == 'MA7']
+    for (_, fila), (_, _, gap_end, test_end) in zip(ma7[ma7['train_window'] == 40].iterrows(),
+                                                   pliegues(len(y), 40, 7, 3)):
+        np.testing.assert_array_equal(fila['pred'], pred_total[gap_end:test_end])
+        assert fila['fit_s'] == 0.0
+
+def test_longitudes_distintas():
+    with pytest.raises(ValueError, match='filas'):
+        comparar_modelos({'MA7': baseline_ma7}, np.zeros((10, 2)), np.zeros(9), pd.date_range('2024-01-01', periods=10))
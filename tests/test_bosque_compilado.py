@@ -0,0 +1,59 @@
+# tests/test_bosque_compilado.py
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import (ExtraTreesRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor,
+                              RandomForestClassifier, RandomForestRegressor)
+from sklearn.tree import DecisionTreeRegressor, ExtraTreeRegressor
+
+from bosque_compilado import BosqueCompilado, es_bosque
+
+# --- Datos ---
+
+@pytest.fixture(scope='module')
+def datos():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(300, 5)), columns=[f"f{i}" for i in range(5)])
+    y = X['f0'] * 3 + np.sin(X['f1']) + rng.normal(0, 0.1, 300)
+    return X, y
+
+# --- Compilación ---
+
+@pytest.mark.parametrize('modelo', [
+    RandomForestRegressor(n_estimators=10, max_depth=6, random_state=0),
+    ExtraTreesRegressor(n_estimators=10, random_state=0),
+    DecisionTreeRegressor(max_depth=8, random_state=0),
+    ExtraTreeRegressor(random_state=0),
+], ids=lambda m: type(m).__name__)
+def test_compila_bosques_y_arboles(datos, modelo):
+    X, y = datos
+    modelo.fit(X, y)
+    assert es_bosque(modelo)
+    bosque = BosqueCompilado(modelo)
+    np.testing.assert_allclose(bosque.predict(X), modelo.predict(X), rtol=1e-5, atol=1e-5)
+    hojas = bosque.apply(X)
+    esperado = modelo.apply(X)
+    np.testing.assert_array_equal(hojas, esperado.reshape(len(X), -1))
+
+def test_nan_sigue_a_sklearn(datos):
+    X, y = datos
+    X = X.copy()
+    X.iloc[::7, 0] = np.nan
+    modelo = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    np.testing.assert_allclose(BosqueCompilado(modelo).predict(X), modelo.predict(X), rtol=1e-5, atol=1e-5)
+
+@pytest.mark.parametrize('modelo', [
+    GradientBoostingRegressor(n_estimators=5, random_state=0),
+    HistGradientBoostingRegressor(max_iter=5),
+    RandomForestClassifier(n_estimators=5, random_state=0),
+], ids=lambda m: type(m).__name__)
+def test_otros_modelos_no_son_bosques(datos, modelo):
+    X, y = datos
+    objetivo = (y > y.median()).astype(int) if isinstance(modelo, RandomForestClassifier) else y
+    assert not es_bosque(modelo.fit(X, objetivo))
+
+def test_sin_entrenar_o_varias_salidas(datos):
+    X, y = datos
+    assert not es_bosque(RandomForestRegressor())
+    assert not es_bosque(DecisionTreeRegressor())
+    assert not es_bosque(RandomForestRegressor(n_estimators=3).fit(X, np.c_[y, y]))
@@ -0,0 +1,86 @@
+# tests/test_busqueda.py
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn')
+
+import backtest
+from busqueda import CachePliegues, busqueda_halving, candidatos
+
+TEST_WINDOW, GAP, VENTANA = 7, 3, 40
+
+@pytest.fixture
+def datos():
+    X, y, _ = backtest._datos_sinteticos(dias=120, features=6)
+    return X, y
+
+def _candidatos(X):
+    from sklearn.linear_model import Ridge
+
+    conjuntos = {'todas': None, 'f0_f1': ['f0', 'f1']}
+    return candidatos({'Ridge': Ridge()}, {'Ridge': {'alpha': [0.1, 10.0]}}, conjuntos, ventanas=(VENTANA,))
+
+def _buscar(cands, X, y, ruta, **kwargs):
+    # min_pliegues alto: una sola ronda con todos los pliegues, así los candidatos
+    # evaluados no dependen de las métricas
+    kwargs.setdefault('min_pliegues', 1000)
+    kwargs.setdefault('n_jobs', 1)
+    return busqueda_halving(cands, X, y, TEST_WINDOW, GAP, ruta_cache=ruta, **kwargs)
+
+def test_segunda_busqueda_sale_de_la_cache(datos, tmp_path):
+    X, y = datos
+    cands, ruta = _candidatos(X), tmp_path / 'pliegues.feather'
+
+    ranking, primera = _buscar(cands, X, y, ruta, min_pliegues=2)
+    assert ruta.exists()
+    assert not primera['cache'].any()
+    assert len(CachePliegues(ruta).resultados) == len(primera)
+
+    ranking_repetido, segunda = _buscar(cands, X, y, ruta, min_pliegues=2)
+    assert segunda['cache'].all()
+    columnas = ['candidato', 'fold', 'MAE', 'RMSE', 'PoissonDev', 'Within1']
+    pd.testing.assert_frame_equal(segunda[columnas], primera[columnas])
+    pd.testing.assert_frame_equal(ranking_repetido.drop(columns='fit_s'), ranking.drop(columns='fit_s'))
+
+def test_cambiar_una_fila_invalida_solo_sus_pliegues(datos, tmp_path):
+    X, y = datos
+    cands, ruta = _candidatos(X), tmp_path / 'pliegues.feather'
+    _, antes = _buscar(cands, X, y, ruta)
+
+    fila = 75
+    X = X.copy()
+    X.loc[fila, 'f5'] += 1.0
+    _, despues = _buscar(cands, X, y, ruta)
+
+    folds = backtest.pliegues(len(X), VENTANA, TEST_WINDOW, GAP)
+    afectados = {i for i, (start, _, _, test_end) in enumerate(folds) if start <= fila < test_end}
+    assert 0 < len(afectados) < len(folds)
+    # f5 solo entra en el conjunto 'todas'; los candidatos con f0 y f1 no cambian
+    recalculados = despues[~despues['cache']]
+    assert set(recalculados['features']) == {'todas'}
+    for _, grupo in recalculados.groupby('candidato'):
+        assert set(grupo['fold']) == afectados
+    assert len(despues) == len(antes)
+
+def test_cambiar_y_invalida_todos_los_conjuntos(datos, tmp_path):
+    X, y = datos
+    cands, ruta = _candidatos(X), tmp_path / 'pliegues.feather'
+    _buscar(cands, X, y, ruta)
+
+    y = y.copy()
+    y.iloc[len(y) - 1] += 1
+    _, despues = _buscar(cands, X, y, ruta)
+    recalculados = despues[~despues['cache']]
+    # Solo el último pliegue de cada candidato contiene la última fila
+    ultimo = len(backtest.pliegues(len(X), VENTANA, TEST_WINDOW, GAP)) - 1
+    assert len(recalculados) == len(cands)
+    assert set(recalculados['fold']) == {ultimo}
+
+def test_pool_igual_a_secuencia(datos):
+    X, y = datos
+    cands = _candidatos(X)
+    _, secuencia = _buscar(cands, X, y, None)
+    _, pool = _buscar(cands, X, y, None, n_jobs=2)
+    columnas = ['candidato', 'fold', 'MAE', 'RMSE', 'PoissonDev', 'Within1']
+    pd.testing.assert_frame_equal(pool[columnas], secuencia[columnas], check_exact=True)
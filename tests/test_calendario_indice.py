@@ -0,0 +1,84 @@
+# tests/test_calendario_indice.py
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calendario_indice import CalendarioIndice, cargar_eventos, dias_desde, dias_hasta
+from get_dias_pago import generar_datos_calendario, obtener_festivos_mexico
+
+# --- Referencia ---
+
+def _distancias_ingenuas(fechas, eventos):
+    """Para cada fecha, recorre todos los eventos y toma el más cercano antes y después."""
+    desde, hasta = [], []
+    for fecha in fechas:
+        previos = [(fecha - e).days for e in eventos if e <= fecha]
+        siguientes = [(e - fecha).days for e in eventos if e >= fecha]
+        desde.append(min(previos) if previos else np.nan)
+        hasta.append(min(siguientes) if siguientes else np.nan)
+    return np.array(desde, dtype=float), np.array(hasta, dtype=float)
+
+EVENTOS = pd.to_datetime(['2024-03-10', '2024-03-15', '2024-06-01', '2024-06-02', '2024-12-31'])
+
+# --- Distancias ---
+
+@pytest.mark.parametrize('fechas', [
+    pd.date_range('2024-01-01', '2025-02-28'),                            # antes del primero y después del último
+    pd.to_datetime(['2024-06-01', '2024-03-10', '2024-12-31']),           # caen en un evento
+    pd.to_datetime(['2025-01-05', '2023-12-25', '2024-06-02', '2024-04-01']),  # desordenadas
+], ids=['rango', 'en_evento', 'desordenadas'])
+def test_distancias_iguales_al_recorrido_ingenuo(fechas):
+    indice = CalendarioIndice(EVENTOS)
+    desde, hasta = _distancias_ingenuas(fechas, EVENTOS)
+
+    np.testing.assert_array_equal(indice.dias_desde(fechas, 'evento'), desde)
+    np.testing.assert_array_equal(indice.dias_hasta(fechas, 'evento'), hasta)
+    feats = indice.features(fechas=fechas)
+    np.testing.assert_array_equal(feats['dias_desde_evento'], desde)
+    np.testing.assert_array_equal(feats['dias_hasta_evento'], hasta)
+    np.testing.assert_array_equal(feats['has_event'], (desde == 0).astype(int))
+
+def test_bordes_del_rango_de_eventos():
+    indice = CalendarioIndice(EVENTOS)
+    feats = indice.features('2024-03-08', '2024-03-11').set_index('date')
+    # Antes del primer evento no hay "desde"; el mismo día del evento ambas distancias son 0
+    assert np.isnan(feats.loc['2024-03-08', 'dias_desde_evento'])
+    assert feats.loc['2024-03-08', 'dias_hasta_evento'] == 2
+    assert feats.loc['2024-03-10', ['dias_desde_evento', 'dias_hasta_evento']].tolist() == [0, 0]
+    assert np.isnan(indice.dias_hasta(['2025-01-01'], 'evento')[0])
+
+def test_sin_eventos():
+    feats = CalendarioIndice().features('2024-01-01', '2024-01-10')
+    assert feats['dias_desde_evento'].isna().all() and feats['dias_hasta_evento'].isna().all()
+    assert (feats['has_event'] == 0).all()
+
+def test_funciones_sobre_arreglos_vacios():
+    fechas = np.array(['2024-01-01'], dtype='datetime64[D]')
+    vacio = np.array([], dtype='datetime64[D]')
+    assert np.isnan(dias_desde(fechas, vacio)).all() and np.isnan(dias_hasta(fechas, vacio)).all()
+
+# --- Festivos y días de pago ---
+
+def test_festivos_y_pagos_iguales_al_calendario():
+    # Incluye el cambio de año: "días hasta" encuentra el festivo del año siguiente
+    feats = CalendarioIndice().features('2023-01-01', '2024-12-31')
+    calendario = generar_datos_calendario('2023-01-01', '2024-12-31')
+    np.testing.assert_array_equal(feats['es_festivo'], calendario['es_festivo'])
+    np.testing.assert_array_equal(feats['es_dia_pago'], calendario['es_dia_pago'])
+    np.testing.assert_array_equal(feats['dias_desde_pago'], calendario['dias_desde_pago'])
+    festivos = [pd.Timestamp(f) for año in (2022, 2023, 2024, 2025) for f in obtener_festivos_mexico(año)]
+    desde, hasta = _distancias_ingenuas(feats['date'], festivos)
+    np.testing.assert_array_equal(feats['dias_desde_festivo'], desde)
+    np.testing.assert_array_equal(feats['dias_hasta_festivo'], hasta)
+
+# --- Carga de eventos ---
+
+def test_cargar_eventos(tmp_path, capsys):
+    ruta = tmp_path / 'eventos.csv'
+    # Formatos mezclados, una fecha inválida y una fila que no es evento
+    ruta.write_text("date,hubo\n15/03/2024,1\n2024-03-10,1\n10/03/2024,1\nno es fecha,1\n01/04/2024,0\n")
+    eventos = cargar_eventos(ruta, columna_bandera='hubo')
+    assert eventos.tolist() == [dt.date(2024, 3, 10), dt.date(2024, 3, 15)]
+    assert '1 fechas de evento inválidas' in capsys.readouterr().err
@@ -0,0 +1,273 @@
+# tests/test_clima.py
+import datetime as dt
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+import get_clima
+from get_clima import COLUMNAS_CLIMA, CacheClima, RateLimitedSession, TokenBucket, WeatherAPIManager
+
+# --- API falsa ---
+
+class EstadoAPI:
+    """Peticiones recibidas y fallos programados (respuestas 503) por ubicación."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.peticiones = []
+            self.fallos = {}
+
+    def programar_fallos(self, lat, lon, n):
+        with self.lock:
+            self.fallos[(f"{lat}", f"{lon}")] = n
+
+    def siguiente(self, lat, lon):
+        with self.lock:
+            self.peticiones.append((lat, lon))
+            pendientes = self.fallos.get((lat, lon), 0)
+            if pendientes:
+                self.fallos[(lat, lon)] = pendientes - 1
+                return 503
+            return 200
+
+    def peticiones_a(self, lat, lon):
+        with self.lock:
+            return sum(1 for p in self.peticiones if p == (f"{lat}", f"{lon}"))
+
+def pronostico_falso(lat: float, hoy: dt.date) -> dict:
+    """Respuesta tipo OpenWeather: 5 días en intervalos de 3 horas, temperaturas en Kelvin."""
+    lista = []
+    for d in range(5):
+        fecha = hoy + dt.timedelta(days=d)
+        for hora in range(0, 24, 3):
+            temp = 273.15 + 20 + d + abs(lat) / 10
+            lista.append({
+                'dt_txt': f"{fecha.isoformat()} {hora:02d}:00:00",
+                'main': {'temp': temp, 'temp_min': temp - 2, 'temp_max': temp + 3, 'pressure': 1010},
+                'wind': {'speed': 2.0},
+            })
+    return {'list': lista}
+
+@pytest.fixture(scope='module')
+def api():
+    estado = EstadoAPI()
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            consulta = parse_qs(urlparse(self.path).query)
+            lat, lon = consulta['latitude'][0], consulta['longitude'][0]
+            status = estado.siguiente(lat, lon)
+            cuerpo = json.dumps(pronostico_falso(float(lat), dt.date.today()) if status == 200 else {}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    estado.url = f"http://127.0.0.1:{servidor.server_address[1]}/fivedaysforcast"
+    yield estado
+    servidor.shutdown()
+    servidor.server_close()
+
+@pytest.fixture(autouse=True)
+def limpiar(api):
+    api.reset()
+
+class BucketContador(TokenBucket):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.adquiridos = 0
+
+    def adquirir(self):
+        self.adquiridos += 1
+        super().adquirir()
+
+# --- Token bucket y reintentos ---
+
+def test_token_bucket_respeta_la_tasa():
+    bucket = TokenBucket(tasa=50, capacidad=2)
+    inicio = time.monotonic()
+    for _ in range(12):
+        bucket.adquirir()
+    # 2 tokens de ráfaga y 10 a 50 por segundo
+    assert time.monotonic() - inicio >= 10 / 50 * 0.9
+
+def test_token_bucket_permite_la_rafaga():
+    bucket = TokenBucket(tasa=1, capacidad=5)
+    inicio = time.monotonic()
+    for _ in range(5):
+        bucket.adquirir()
+    assert time.monotonic() - inicio < 0.5
+
+def test_cada_reintento_de_la_sesion_consume_un_token(api):
+    bucket = BucketContador(tasa=1000, capacidad=10)
+    sesion = RateLimitedSession(bucket, reintentos=3, backoff=0.001)
+    api.programar_fallos(1.0, 2.0, 2)
+
+    respuesta = sesion.get(api.url, params={'latitude': '1.0', 'longitude': '2.0'}, timeout=5)
+
+    assert respuesta.status_code == 200
+    assert api.peticiones_a(1.0, 2.0) == 3
+    assert bucket.adquiridos == 3
+
+def test_sesion_sin_reintentos_devuelve_el_error(api):
+    bucket = BucketContador(tasa=1000, capacidad=10)
+    sesion = RateLimitedSession(bucket, reintentos=3, backoff=0.001)
+    api.programar_fallos(1.0, 2.0, 5)
+
+    respuesta = sesion.get(api.url, params={'latitude': '1.0', 'longitude': '2.0'}, timeout=5, reintentos=0)
+
+    assert respuesta.status_code == 503
+    assert api.peticiones_a(1.0, 2.0) == 1
+    assert bucket.adquiridos == 1
+
+# --- Caché y TTL ---
+
+def _manager(tmp_path, api, api_key='clave'):
+    return WeatherAPIManager(api_key=api_key, cache=CacheClima(tmp_path / 'clima.sqlite'), base_url=api.url,
+                             limitador=TokenBucket(tasa=1000, capacidad=10))
+
+def _filas(fechas, tavg=20.0):
+    return pd.DataFrame({'date': pd.to_datetime(fechas), **{c: tavg for c in COLUMNAS_CLIMA}})
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj controlable para get_clima (time.time); arranca al mediodía local de hoy."""
+    ahora = [time.mktime(dt.datetime.combine(dt.date.today(), dt.time(12)).timetuple())]
+    monkeypatch.setattr(get_clima.time, 'time', lambda: ahora[0])
+    return ahora
+
+def test_ttl_solo_para_hoy_y_dias_futuros(tmp_path, reloj):
+    hoy = dt.date.today()
+    ayer, mañana = hoy - dt.timedelta(days=1), hoy + dt.timedelta(days=1)
+    cache = CacheClima(tmp_path / 'clima.sqlite', ttl=3600)
+    cache.guardar(0, 0, _filas([ayer, hoy, mañana]))
+
+    assert len(cache.obtener_rango(0, 0, [ayer, hoy, mañana])) == 3
+
+    # Pasado el TTL (todavía hoy) caducan hoy y mañana; ayer ya quedó congelado
+    reloj[0] += 2 * 3600
+    assert cache.obtener_rango(0, 0, [ayer, hoy, mañana])['date'].dt.date.tolist() == [ayer]
+
+def test_dias_pasados_quedan_congelados(tmp_path, reloj):
+    hoy = dt.date.today()
+    fechas = [hoy + dt.timedelta(days=d) for d in range(5)]
+    cache = CacheClima(tmp_path / 'clima.sqlite', ttl=3600)
+    cache.guardar(0, 0, _filas(fechas))
+
+    # Una semana después, los cinco días del pronóstico ya pasaron y no expiran
+    reloj[0] += 7 * 86400
+    assert cache.obtener_rango(0, 0, fechas)['date'].dt.date.tolist() == fechas
+    reloj[0] += 400 * 86400
+    assert cache.obtener(0, 0, fechas[-1]) is not None
+
+def test_se_congela_el_ultimo_pronostico_guardado(tmp_path, reloj):
+    mañana = dt.date.today() + dt.timedelta(days=1)
+    cache = CacheClima(tmp_path / 'clima.sqlite', ttl=3600)
+    cache.guardar(0, 0, _filas([mañana], tavg=20.0))
+    reloj[0] += 2 * 3600
+    assert cache.obtener(0, 0, mañana) is None
+    cache.guardar(0, 0, _filas([mañana], tavg=25.0))
+
+    reloj[0] += 10 * 86400
+    assert cache.obtener(0, 0, mañana)['tavg'] == 25.0
+
+def test_dias_pasados_usan_el_pronostico_en_cache(tmp_path, api, reloj):
+    manager = _manager(tmp_path, api)
+    manager.session.backoff = 0
+    fechas = pd.date_range(dt.date.today(), periods=5)
+    esperado = [round(20 + d + 2.45, 1) for d in range(5)]
+    assert manager.get_weather_batch(24.5, -107.4, fechas)['tavg'].round(1).tolist() == esperado
+
+    # Una semana después la API no responde: esos días salen de la caché, no del respaldo
+    reloj[0] += 7 * 86400
+    api.programar_fallos(24.5, -107.4, 10)
+    assert manager.get_weather_batch(24.5, -107.4, fechas)['tavg'].round(1).tolist() == esperado
+
+def test_cache_anterior_sin_fecha_de_obtencion(tmp_path, reloj):
+    ruta = tmp_path / 'clima.sqlite'
+    columnas = ", ".join(f"{c} REAL" for c in COLUMNAS_CLIMA)
+    with sqlite3.connect(ruta) as conn:
+        conn.execute(f"CREATE TABLE clima (lat REAL, lon REAL, date TEXT, {columnas}, obtenido REAL, "
+                     "PRIMARY KEY (lat, lon, date))")
+        conn.execute("INSERT INTO clima VALUES (0, 0, '2024-01-01', 1, 1, 1, 1, 1, 1, ?)", (reloj[0] - 86400 * 400,))
+
+    cache = CacheClima(ruta, ttl=3600)
+    assert cache.obtener(0, 0, '2024-01-01')['tavg'] == 1.0
+    cache.guardar(0, 0, _filas([dt.date.today()]))
+    assert cache.obtener(0, 0, dt.date.today()) is not None
+
+def test_pronostico_se_pide_una_vez_por_ttl(tmp_path, api):
+    manager = WeatherAPIManager(api_key='clave', cache=CacheClima(tmp_path / 'clima.sqlite'), base_url=api.url,
+                                limitador=TokenBucket(tasa=1000, capacidad=10))
+    fechas = pd.date_range(dt.date.today() - dt.timedelta(days=3), periods=8)
+
+    clima = manager.get_weather_batch(24.5, -107.4, fechas)
+    manager.get_weather_batch(24.5, -107.4, fechas)
+
+    assert api.peticiones_a(24.5, -107.4) == 1
+    # Los 5 días del pronóstico vienen de la API (20 °C + día + lat/10), el resto del respaldo
+    reales = clima.set_index('date').loc[pd.date_range(dt.date.today(), periods=5), 'tavg']
+    assert reales.round(1).tolist() == [round(20 + d + 2.45, 1) for d in range(5)]
+
+# --- Malla de ubicaciones ---
+
+MALLA = {'a': (24.1, -107.1), 'b': (24.2, -107.2), 'c': (24.3, -107.3)}
+
+def test_malla_reintenta_solo_en_la_capa_asincrona(tmp_path, api):
+    api.programar_fallos(24.2, -107.2, 2)
+    fechas = pd.date_range(dt.date.today(), periods=5)
+
+    malla = _manager(tmp_path, api).get_weather_grid(MALLA, fechas, reintentos=2, backoff=0.001)
+
+    # Dos 503 y un éxito: tres peticiones en total, sin reintentos de la sesión por debajo
+    assert api.peticiones_a(24.2, -107.2) == 3
+    assert api.peticiones_a(24.1, -107.1) == 1
+    assert malla.groupby('ubicacion').size().to_dict() == {'a': 5, 'b': 5, 'c': 5}
+
+def test_malla_sin_datos_reales_no_inventa_filas(tmp_path, api):
+    api.programar_fallos(24.3, -107.3, 10)
+    fechas = pd.date_range(dt.date.today() - dt.timedelta(days=30), periods=35)
+
+    malla = _manager(tmp_path, api).get_weather_grid(MALLA, fechas, reintentos=1, backoff=0.001)
+
+    assert api.peticiones_a(24.3, -107.3) == 2
+    # Solo los días del pronóstico, y ninguna fila para la ubicación que falló
+    assert set(malla['ubicacion']) == {'a', 'b'}
+    assert malla['date'].min() == pd.Timestamp(dt.date.today())
+    esperado = [round(20 + d + 24.1 / 10, 1) for d in range(5)]
+    assert malla[malla['ubicacion'] == 'a']['tavg'].round(1).tolist() == esperado
+
+def test_malla_sin_api_key_queda_vacia(tmp_path, api):
+    malla = _manager(tmp_path, api, api_key=None).get_weather_grid(MALLA, pd.date_range('2025-01-01', periods=10))
+    assert malla.empty
+    assert not api.peticiones
+
+def test_merge_no_rellena_la_malla():
+    from merge_data import _fuentes_sinteticas, fusionar_fuentes, pivotar_clima_ubicaciones
+
+    fuentes = _fuentes_sinteticas(años=1, ubicaciones=2)
+    fin = fuentes['homicidios']['date'].max()
+    largo = pd.DataFrame({'ubicacion': 'mazatlan', 'lat': 23.2, 'lon': -106.4,
+                          'date': pd.date_range(end=fin, periods=5), **{c: 30.0 for c in COLUMNAS_CLIMA}})
+    fuentes['clima_ubicaciones'] = pivotar_clima_ubicaciones(largo)
+
+    df = fusionar_fuentes(fuentes, fin)
+
+    assert df['tavg_mazatlan'].notna().sum() == 5
+    assert df['tavg_mazatlan'].iloc[-5:].tolist() == [30.0] * 5
+    assert df['tavg'].notna().all()
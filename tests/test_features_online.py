@@ -0,0 +1,104 @@
+# tests/test_features_online.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from features_online import (FEATURES_CONOCIDAS, VENTANA_ZSCORE, MotorFeatures, _dataset_sintetico,
+                             _features_pandas)
+
+FEATURES = list(FEATURES_CONOCIDAS)
+
+# Medias y desviaciones móviles: pandas y el motor suman en distinto orden, así que
+# solo estas columnas pueden diferir, y únicamente en el redondeo
+MOMENTOS = [i for i, f in enumerate(FEATURES) if f.startswith('h_roll_') or f.endswith('_zscore')]
+EXACTAS = [i for i in range(len(FEATURES)) if i not in MOMENTOS]
+
+@pytest.fixture(scope='module')
+def dataset():
+    return _dataset_sintetico(años=2)
+
+def _recorrer(motor, df) -> np.ndarray:
+    return np.array([motor.paso(fila) for fila in df.to_dict('records')])
+
+def _comparar(obtenido, esperado):
+    np.testing.assert_array_equal(np.isnan(obtenido), np.isnan(esperado))
+    np.testing.assert_array_equal(obtenido[:, EXACTAS], esperado[:, EXACTAS])
+    np.testing.assert_allclose(obtenido[:, MOMENTOS], esperado[:, MOMENTOS], rtol=1e-9, atol=1e-9)
+
+def _revisado(df, dias_atras, semilla=1) -> pd.DataFrame:
+    """Copia de `df` con homicidios, robos y temperatura cambiados en los días indicados."""
+    rng = np.random.default_rng(semilla)
+    df = df.copy()
+    filas = [len(df) - 1 - d for d in dias_atras]
+    df.loc[filas, 'homicidios'] = rng.integers(0, 20, len(filas)).astype(float)
+    df.loc[filas, 'robos'] = (df.loc[filas, 'robos'] + rng.integers(1, 50, len(filas))).astype(df['robos'].dtype)
+    df.loc[filas, 'tavg'] = df.loc[filas, 'tavg'] + 1.5
+    return df
+
+# --- Equivalencia con pandas ---
+
+def test_vector_igual_al_de_pandas(dataset):
+    obtenido = _recorrer(MotorFeatures(FEATURES), dataset)
+    _comparar(obtenido, _features_pandas(dataset, FEATURES).to_numpy())
+
+def test_vector_no_modifica_el_estado(dataset):
+    motor = MotorFeatures(FEATURES)
+    motor.agregar_dataset(dataset.iloc[:-1])
+    fila = dataset.iloc[-1].to_dict()
+    primero = motor.vector(fila)
+    np.testing.assert_array_equal(motor.vector(fila), primero)
+    np.testing.assert_array_equal(motor.paso(fila), primero)
+
+def test_dia_fuera_de_orden(dataset):
+    motor = MotorFeatures(FEATURES)
+    motor.agregar_dataset(dataset.iloc[:10])
+    with pytest.raises(ValueError, match='Se esperaba'):
+        motor.vector(dataset.iloc[11].to_dict())
+
+# --- Persistencia ---
+
+def test_estado_sobrevive_guardar_y_cargar(dataset, tmp_path):
+    esperado = _features_pandas(dataset, FEATURES).to_numpy()
+    mitad = len(dataset) // 2
+    path = tmp_path / 'estado.json'
+
+    motor = MotorFeatures(FEATURES)
+    primera = _recorrer(motor, dataset.iloc[:mitad])
+    motor.guardar(path)
+    recargado = MotorFeatures.cargar(path)
+
+    assert recargado.ultima_fecha == dataset['date'].iloc[mitad - 1]
+    segunda = _recorrer(recargado, dataset.iloc[mitad:])
+    _comparar(np.vstack([primera, segunda]), esperado)
+
+def test_revision_despues_de_recargar(dataset, tmp_path):
+    corte = len(dataset) - 40
+    path = tmp_path / 'estado.json'
+    motor = MotorFeatures(FEATURES)
+    motor.agregar_dataset(dataset.iloc[:corte])
+    motor.guardar(path)
+
+    # Se revisan días dentro de las ventanas (incluido el último agregado) y uno más antiguo
+    revisado = _revisado(dataset, [40, 41, 45, 60, 40 + VENTANA_ZSCORE - 1, 200])
+    recargado = MotorFeatures.cargar(path)
+    assert recargado.revisar(revisado.iloc[:corte]) == 5
+
+    esperado = _features_pandas(revisado, FEATURES).to_numpy()[corte:]
+    _comparar(_recorrer(recargado, revisado.iloc[corte:]), esperado)
+
+def test_revision_sin_cambios(dataset):
+    motor = MotorFeatures(FEATURES)
+    motor.agregar_dataset(dataset.iloc[:-1])
+    antes = motor.a_dict()
+    assert motor.revisar(dataset) == 0
+    assert motor.a_dict() == antes
+
+def test_revision_con_historia_corta(dataset):
+    """Con menos días que la ventana, los lugares vacíos del buffer no cuentan como revisión."""
+    motor = MotorFeatures(FEATURES)
+    motor.agregar_dataset(dataset.iloc[:5])
+    revisado = dataset.copy()
+    revisado.loc[2, 'homicidios'] = 99.0
+    assert motor.revisar(revisado) == 1
+    esperado = _features_pandas(revisado, FEATURES).to_numpy()[5:20]
+    _comparar(_recorrer(motor, revisado.iloc[5:20]), esperado)
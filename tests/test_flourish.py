@@ -0,0 +1,167 @@
+# tests/test_flourish.py
+import re
+import threading
+import urllib.request
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from selenium.common.exceptions import NoSuchElementException
+
+import flourish
+import get_flourish
+
+REGEX_ARIA = re.compile(r'<path[^>]*class="data-point"[^>]*aria-label="([^"]*)"')
+
+class DriverFalso:
+    """
+    Sustituto de Chrome para las pruebas: `get` descarga la página del servidor
+    local y `execute_script` devuelve los aria-label de los puntos, como haría
+    SCRIPT_ETIQUETAS en la página renderizada.
+    """
+    creados = []
+
+    def __init__(self, fallar_primero=False):
+        self.html = ''
+        self.cargas = []
+        self.cerrado = False
+        self.fallar_primero = fallar_primero
+        DriverFalso.creados.append(self)
+
+    def get(self, url):
+        if self.fallar_primero:
+            self.fallar_primero = False
+            raise RuntimeError("sesión de Chrome perdida")
+        self.cargas.append(url)
+        with urllib.request.urlopen(url, timeout=5) as respuesta:
+            self.html = respuesta.read().decode('utf-8')
+
+    def find_element(self, by, selector):
+        if 'class="data-point"' not in self.html:
+            raise NoSuchElementException(selector)
+        return object()
+
+    def execute_script(self, script, selector):
+        assert selector == flourish.SELECTOR_PUNTOS
+        return REGEX_ARIA.findall(self.html)
+
+    def quit(self):
+        self.cerrado = True
+
+@pytest.fixture(autouse=True)
+def sin_esperas(monkeypatch):
+    DriverFalso.creados = []
+    monkeypatch.setattr(flourish.time, 'sleep', lambda s: None)
+
+@pytest.fixture
+def fuentes(servidor_fixtures):
+    return {
+        'homicidios': f"{servidor_fixtures}/flourish/render_homicidios.html",
+        'robos': f"{servidor_fixtures}/flourish/render_robos.html",
+    }
+
+def test_scrape_varios_comparte_un_driver(fuentes):
+    resultados = flourish.scrape_varios(fuentes, max_workers=1, usar_http=False, factory=DriverFalso)
+
+    assert len(DriverFalso.creados) == 1
+    driver = DriverFalso.creados[0]
+    assert sorted(driver.cargas) == sorted(fuentes.values())
+    assert driver.cerrado  # el pool se cierra al terminar
+
+    homicidios = resultados['homicidios']
+    assert homicidios['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-12-30', '2024-12-31', '2025-01-01', '2025-01-02']
+    # Los valores de varias series en la misma fecha se suman
+    assert homicidios['homicidios'].tolist() == [4, 6, 2, 10]
+    assert resultados['robos']['robos'].tolist() == [12, 15, 11]
+
+def test_pool_no_crea_mas_drivers_que_su_tamaño(fuentes):
+    muchas = {f"{col}_{i}": url for i in range(3) for col, url in fuentes.items()}
+    resultados = flourish.scrape_varios(muchas, max_workers=2, usar_http=False, factory=DriverFalso)
+
+    assert 1 <= len(DriverFalso.creados) <= 2
+    assert sum(len(d.cargas) for d in DriverFalso.creados) == len(muchas)
+    assert all(not df.empty for df in resultados.values())
+
+def test_driver_con_error_se_descarta_y_se_reemplaza(fuentes):
+    primero = threading.Event()
+
+    def fabrica():
+        # Solo el primer driver falla en su primera carga
+        fallar = not primero.is_set()
+        primero.set()
+        return DriverFalso(fallar_primero=fallar)
+
+    pool = flourish.DriverPool(size=1, factory=fabrica)
+    df = flourish.scrape_flourish(fuentes['robos'], 'robos', max_retries=2, pool=pool, usar_http=False)
+    pool.cerrar()
+
+    assert df['robos'].tolist() == [12, 15, 11]
+    assert len(DriverFalso.creados) == 2
+    assert DriverFalso.creados[0].cerrado and not DriverFalso.creados[0].cargas
+
+def test_una_fuente_fallida_no_afecta_a_las_demas(fuentes, servidor_fixtures):
+    fuentes = dict(fuentes, robos=f"{servidor_fixtures}/flourish/no_existe.html")
+    resultados = flourish.scrape_varios(fuentes, max_workers=2, max_retries=2, usar_http=False, factory=DriverFalso)
+
+    assert resultados['robos'].empty
+    assert resultados['homicidios']['homicidios'].sum() == 22
+
+def test_get_flourish_robos_sigue_siendo_opcional(monkeypatch):
+    homicidios = pd.DataFrame({'date': pd.to_datetime(['2025-01-01']), 'homicidios': [3]})
+    guardados = []
+    monkeypatch.setattr(get_flourish, 'scrape_varios', lambda fuentes: {'homicidios': homicidios, 'robos': pd.DataFrame()})
+    monkeypatch.setattr(get_flourish, 'guardar_homicidios', lambda df, incremental: guardados.append('homicidios'))
+
+    def guardar_robos(df, incremental):
+        raise OSError("disco lleno")
+    monkeypatch.setattr(get_flourish, 'guardar_robos', guardar_robos)
+
+    get_flourish.main()  # no debe fallar la etapa
+    assert guardados == ['homicidios']
+
+# --- Extracción sin navegador (embed con _Flourish_data) ---
+
+def _esperado_homicidios(df):
+    assert df['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-12-30', '2024-12-31', '2025-01-01', '2025-01-02']
+    assert df['homicidios'].tolist() == [4, 6, 2, 10]
+
+def test_parsear_embed_guardado():
+    html = (Path(__file__).parent / 'fixtures' / 'flourish' / 'embed_homicidios.html').read_text(encoding='utf-8')
+    _esperado_homicidios(flourish.parsear_embed(html, 'homicidios'))
+
+def test_parsear_embed_formato_desconocido_devuelve_vacio():
+    html = '<script>var _Flourish_data = {"data":[{"label":"2025-01-02","value":["3"]}]};</script>'
+    assert flourish.parsear_embed(html, 'homicidios').empty
+    assert flourish.parsear_embed('<html>sin datos</html>', 'homicidios').empty
+    assert flourish.parsear_embed('<script>var _Flourish_data = {"data": [</script>', 'homicidios').empty
+
+def test_scrape_http_desde_servidor_local(servidor_fixtures):
+    _esperado_homicidios(flourish.scrape_flourish_http(f"{servidor_fixtures}/flourish/embed_homicidios.html", 'homicidios'))
+    assert flourish.scrape_flourish_http(f"{servidor_fixtures}/flourish/no_existe.html", 'homicidios').empty
+
+def test_embed_no_lanza_chrome(servidor_fixtures):
+    def fabrica():
+        raise AssertionError("no debía crearse un driver")
+
+    pool = flourish.DriverPool(size=1, factory=fabrica)
+    df = flourish.scrape_flourish(f"{servidor_fixtures}/flourish/embed_homicidios.html", 'homicidios', pool=pool)
+    _esperado_homicidios(df)
+    assert not DriverFalso.creados
+
+@pytest.mark.parametrize('pagina', ['render_homicidios.html', 'no_existe.html'])
+def test_sin_datos_embebidos_cae_a_selenium(servidor_fixtures, pagina):
+    # La página renderizada no trae _Flourish_data y la inexistente responde 404: ambas
+    # caen al navegador, que aquí carga la página renderizada
+    url_http = f"{servidor_fixtures}/flourish/{pagina}"
+    url_render = f"{servidor_fixtures}/flourish/render_homicidios.html"
+
+    class DriverRender(DriverFalso):
+        def get(self, url):
+            assert url == url_http
+            super().get(url_render)
+
+    pool = flourish.DriverPool(size=1, factory=DriverRender)
+    df = flourish.scrape_flourish(url_http, 'homicidios', pool=pool)
+    pool.cerrar()
+    _esperado_homicidios(df)
+    assert len(DriverFalso.creados) == 1
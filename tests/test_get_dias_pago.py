@@ -0,0 +1,32 @@
+# tests/test_get_dias_pago.py
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from get_dias_pago import (_festivos_mexico, _generar_datos_calendario_lento, contar_dias_desde_pago,
+                           domingo_pascua, generar_datos_calendario)
+
+# --- Equivalencia con la versión fila por fila ---
+
+@pytest.mark.parametrize('inicio, fin', [
+    ('2023-01-01', '2024-12-31'),  # dos años completos, con bisiesto
+    ('2024-07-02', '2024-09-30'),  # no empieza en día de pago
+    ('2024-12-20', '2025-01-10'),  # cruza el cambio de año
+    ('2024-03-15', '2024-03-15'),  # un solo día
+])
+def test_calendario_igual_al_fila_por_fila(inicio, fin):
+    _festivos_mexico.cache_clear()
+    pd.testing.assert_frame_equal(generar_datos_calendario(inicio, fin), _generar_datos_calendario_lento(inicio, fin))
+
+def test_dias_desde_pago():
+    es_pago = pd.Series([False, False, True, False, False, True, True, False])
+    assert contar_dias_desde_pago(es_pago).tolist() == [0, 1, 0, 1, 2, 0, 0, 1]
+
+# --- Festivos ---
+
+def test_festivos_2025():
+    festivos = set(_festivos_mexico(2025))
+    assert domingo_pascua(2025) == dt.date(2025, 4, 20)
+    assert {dt.date(2025, 2, 3), dt.date(2025, 3, 17), dt.date(2025, 4, 17), dt.date(2025, 4, 18),
+            dt.date(2025, 11, 17)} <= festivos
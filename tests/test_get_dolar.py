@@ -0,0 +1,126 @@
+# tests/test_get_dolar.py
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from get_dolar import DIAS_REVISION, ProveedorSintetico, get_dolar_data, guardar_cache, leer_cache
+
+# --- Fixtures ---
+
+INICIO = dt.date(2024, 9, 9)   # lunes
+FIN = dt.date(2024, 12, 27)    # viernes
+
+@pytest.fixture
+def cache(tmp_path):
+    return tmp_path / 'cache' / 'dolar.parquet'
+
+def _completa(inicio, fin):
+    """La serie que daría una descarga completa sin caché."""
+    return get_dolar_data(inicio, fin, ProveedorSintetico(), None)
+
+# --- Caché ---
+
+def test_segunda_corrida_no_llama_al_proveedor(cache):
+    proveedor = ProveedorSintetico()
+    primera = get_dolar_data(INICIO, FIN, proveedor, cache)
+    assert proveedor.rangos == [(INICIO, FIN)]
+
+    segunda = get_dolar_data(INICIO, FIN, proveedor, cache)
+
+    assert proveedor.llamadas == 1
+    pd.testing.assert_frame_equal(segunda, primera)
+    pd.testing.assert_frame_equal(segunda, _completa(INICIO, FIN))
+
+def test_solo_se_piden_los_rangos_faltantes(cache):
+    proveedor = ProveedorSintetico()
+    get_dolar_data(INICIO, FIN, proveedor, cache)
+    ultimo_cierre = FIN
+
+    # Días nuevos al final: se piden junto con la ventana de revisión
+    nuevo_fin = FIN + dt.timedelta(days=10)
+    serie = get_dolar_data(INICIO, nuevo_fin, proveedor, cache)
+    assert proveedor.rangos[-1] == (ultimo_cierre - dt.timedelta(days=DIAS_REVISION), nuevo_fin)
+
+    # Historia anterior al inicio de la caché: solo ese tramo
+    nuevo_inicio = INICIO - dt.timedelta(days=30)
+    serie = get_dolar_data(nuevo_inicio, nuevo_fin, proveedor, cache)
+    assert proveedor.rangos[-1] == (nuevo_inicio, INICIO - dt.timedelta(days=1))
+    assert proveedor.llamadas == 3
+
+    pd.testing.assert_frame_equal(serie, _completa(nuevo_inicio, nuevo_fin))
+    assert get_dolar_data(nuevo_inicio, nuevo_fin, proveedor, cache).equals(serie)
+    assert proveedor.llamadas == 3
+
+def test_fin_de_semana_no_se_vuelve_a_pedir(cache):
+    proveedor = ProveedorSintetico()
+    sabado = FIN + dt.timedelta(days=1)
+    get_dolar_data(INICIO, sabado, proveedor, cache)
+    get_dolar_data(INICIO, sabado, proveedor, cache)
+    assert proveedor.llamadas == 1
+
+class ProveedorRevisado(ProveedorSintetico):
+    """Cambia el cierre de los días a partir de `desde` (un cierre provisional que se corrige)."""
+    def __init__(self, desde, ajuste):
+        super().__init__()
+        self.desde, self.ajuste = pd.Timestamp(desde), ajuste
+
+    def __call__(self, simbolo, start_date, end_date):
+        df = super().__call__(simbolo, start_date, end_date)
+        df.loc[df['date'] >= self.desde, 'precio_dolar'] += self.ajuste
+        return df
+
+def test_ventana_de_revision_se_vuelve_a_pedir(cache):
+    get_dolar_data(INICIO, FIN, ProveedorSintetico(), cache)
+    revisado = ProveedorRevisado(FIN - dt.timedelta(days=1), 0.5)
+
+    serie = get_dolar_data(INICIO, FIN + dt.timedelta(days=3), revisado, cache).set_index('date')['precio_dolar']
+
+    original = _completa(INICIO, FIN).set_index('date')['precio_dolar']
+    # Los cierres dentro de la ventana de revisión se reemplazan; los anteriores no se tocan
+    assert serie[pd.Timestamp(FIN - dt.timedelta(days=1))] == original[pd.Timestamp(FIN - dt.timedelta(days=1))] + 0.5
+    assert serie[pd.Timestamp(FIN - dt.timedelta(days=7))] == original[pd.Timestamp(FIN - dt.timedelta(days=7))]
+    assert revisado.rangos == [(FIN - dt.timedelta(days=DIAS_REVISION), FIN + dt.timedelta(days=3))]
+
+def test_duplicados_se_eliminan(cache):
+    def proveedor(simbolo, inicio, fin):
+        df = ProveedorSintetico()(simbolo, inicio, fin)
+        # Filas repetidas y con hora/zona horaria, como devuelve a veces yfinance
+        repetidas = df.tail(3).assign(precio_dolar=lambda d: d['precio_dolar'] + 1)
+        df = pd.concat([df, repetidas], ignore_index=True)
+        df['date'] = df['date'].dt.tz_localize('America/Mexico_City') + pd.Timedelta(hours=16)
+        return df
+
+    serie = get_dolar_data(INICIO, FIN, proveedor, cache)
+
+    assert serie['date'].is_unique and serie['date'].is_monotonic_increasing
+    esperado = _completa(INICIO, FIN)
+    assert len(serie) == len(esperado)
+    # Se conserva la última versión de cada fecha
+    assert (serie['precio_dolar'].tail(3).values == esperado['precio_dolar'].tail(3).values + 1).all()
+    assert leer_cache(cache)[0]['date'].is_unique
+
+def test_error_del_proveedor_no_avanza_lo_consultado(cache):
+    proveedor = ProveedorSintetico()
+    get_dolar_data(INICIO, FIN, proveedor, cache)
+
+    def falla(*args):
+        raise ConnectionError("sin red")
+
+    nuevo_fin = FIN + dt.timedelta(days=7)
+    serie = get_dolar_data(INICIO, nuevo_fin, falla, cache)
+    assert serie['date'].max() == pd.Timestamp(FIN)
+    assert leer_cache(cache)[1] == (INICIO, FIN)
+
+    get_dolar_data(INICIO, nuevo_fin, proveedor, cache)
+    assert proveedor.llamadas == 2
+
+def test_cache_anterior_sin_metadatos(cache):
+    # Cachés escritas antes de guardar el rango consultado: se piden los días de revisión
+    guardar_cache(_completa(INICIO, FIN), cache)
+    assert leer_cache(cache)[1] is None
+    proveedor = ProveedorSintetico()
+    get_dolar_data(INICIO, FIN, proveedor, cache)
+    assert proveedor.rangos == [(FIN - dt.timedelta(days=DIAS_REVISION), FIN)]
+    get_dolar_data(INICIO, FIN, proveedor, cache)
+    assert proveedor.llamadas == 1
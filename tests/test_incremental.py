@@ -0,0 +1,119 @@
+# tests/test_incremental.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from get_homicidios import CONTEXTO_PROMEDIOS, calcular_promedios_moviles
+from incremental import actualizar_serie_csv, leer_cola_csv
+
+# --- Datos ---
+
+def _serie(dias, inicio='2024-01-01', semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({'date': pd.date_range(inicio, periods=dias),
+                         'homicidios': rng.poisson(5, dias).astype(float)})
+
+def _leer(ruta):
+    return pd.read_csv(ruta, parse_dates=['date'])
+
+def _completo(df, recalcular=None):
+    """Lo que escribiría una corrida completa, leído de vuelta del CSV."""
+    df = df.sort_values('date').reset_index(drop=True)
+    if recalcular is not None:
+        df = recalcular(df.copy())
+    return df
+
+@pytest.fixture
+def ruta(tmp_path):
+    return tmp_path / 'homicidios.csv'
+
+# --- Serie simple ---
+
+def test_sin_archivo_escribe_la_serie_completa(ruta):
+    serie = _serie(50)
+    resultado = actualizar_serie_csv(ruta, serie, 'homicidios')
+    assert resultado['filas_escritas'] == 50
+    pd.testing.assert_frame_equal(_leer(ruta), serie)
+
+def test_dias_nuevos_despues_de_la_marca_de_agua(ruta):
+    serie = _serie(200)
+    actualizar_serie_csv(ruta, serie.iloc[:195], 'homicidios')
+    tamaño = ruta.stat().st_size
+
+    resultado = actualizar_serie_csv(ruta, serie.iloc[150:], 'homicidios')
+
+    assert resultado['nuevas'] == list(serie['date'].iloc[195:])
+    assert resultado['revisadas'] == []
+    assert resultado['filas_escritas'] == 5
+    assert list(resultado['cola']['date']) == list(serie['date'].iloc[195:])
+    assert ruta.stat().st_size > tamaño
+    pd.testing.assert_frame_equal(_leer(ruta), serie)
+
+def test_revision_dentro_de_la_ventana(ruta):
+    serie = _serie(200)
+    actualizar_serie_csv(ruta, serie, 'homicidios')
+    revisada = serie.copy()
+    revisada.loc[180, 'homicidios'] += 3
+    # Fuera de la ventana de revisión: se asume estable y no se toca
+    revisada.loc[10, 'homicidios'] += 3
+
+    resultado = actualizar_serie_csv(ruta, revisada, 'homicidios', ventana_revision=30)
+
+    assert resultado['revisadas'] == [serie['date'].iloc[180]]
+    assert resultado['nuevas'] == []
+    assert resultado['filas_escritas'] == 20
+    esperado = serie.copy()
+    esperado.loc[180, 'homicidios'] += 3
+    pd.testing.assert_frame_equal(_leer(ruta), esperado)
+
+def test_sin_cambios_devuelve_cola_vacia(ruta):
+    serie = _serie(100)
+    actualizar_serie_csv(ruta, serie, 'homicidios')
+    contenido = ruta.read_bytes()
+
+    resultado = actualizar_serie_csv(ruta, serie.iloc[60:], 'homicidios')
+
+    assert resultado['filas_escritas'] == 0
+    assert resultado['nuevas'] == resultado['revisadas'] == []
+    assert resultado['cola'].empty
+    assert ruta.read_bytes() == contenido
+
+# --- Promedios móviles centrados ---
+
+def test_contexto_recalcula_promedios_centrados(ruta):
+    serie = _serie(300)
+    actualizar_serie_csv(ruta, serie.iloc[:290], 'homicidios', recalcular=calcular_promedios_moviles,
+                         contexto=CONTEXTO_PROMEDIOS)
+    revisada = serie.copy()
+    revisada.loc[280, 'homicidios'] += 4
+
+    resultado = actualizar_serie_csv(ruta, revisada.iloc[200:], 'homicidios', recalcular=calcular_promedios_moviles,
+                                     contexto=CONTEXTO_PROMEDIOS)
+
+    # El cambio del día 280 mueve los promedios hasta CONTEXTO_PROMEDIOS filas atrás
+    assert resultado['cola']['date'].iloc[0] == serie['date'].iloc[280 - CONTEXTO_PROMEDIOS]
+    pd.testing.assert_frame_equal(_leer(ruta), _completo(revisada, calcular_promedios_moviles))
+
+def test_contexto_mas_largo_que_la_cola_leida(ruta):
+    # La ventana de revisión es corta: la lectura de la cola tiene que crecer hasta
+    # tener `contexto` filas intactas antes de la primera reescrita
+    serie = _serie(120)
+    actualizar_serie_csv(ruta, serie.iloc[:110], 'homicidios', recalcular=calcular_promedios_moviles,
+                         contexto=CONTEXTO_PROMEDIOS)
+    resultado = actualizar_serie_csv(ruta, serie, 'homicidios', recalcular=calcular_promedios_moviles,
+                                     contexto=CONTEXTO_PROMEDIOS, ventana_revision=3)
+    assert resultado['filas_escritas'] == 10 + CONTEXTO_PROMEDIOS
+    pd.testing.assert_frame_equal(_leer(ruta), _completo(serie, calcular_promedios_moviles))
+
+# --- Lectura de la cola ---
+
+@pytest.mark.parametrize('n', [0, 1, 7, 100])
+def test_leer_cola_csv(ruta, n):
+    serie = _serie(100)
+    serie.to_csv(ruta, index=False)
+    cola, offsets, completo = leer_cola_csv(ruta, n, bloque=64)
+    assert len(cola) == n
+    assert completo == (n == 100)
+    assert offsets[-1] == ruta.stat().st_size
+    if n:
+        pd.testing.assert_frame_equal(cola.reset_index(drop=True), serie.iloc[100 - n:].reset_index(drop=True))
@@ -0,0 +1,76 @@
+# tests/test_intervalos_qrf.py
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('sklearn')
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+from bosque_compilado import BosqueCompilado
+from intervalos_qrf import CUANTILES, IntervalosQRF, _cuantiles_directos, qrf_backtest
+
+Q = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+
+@pytest.fixture(scope='module')
+def datos():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(180, 4)), columns=[f"f{i}" for i in range(4)])
+    y = pd.Series(rng.poisson(np.exp(1.0 + 0.5 * X['f0'])).astype(np.float64))
+    return X, y
+
+@pytest.fixture(scope='module', params=[
+    RandomForestRegressor(n_estimators=20, max_depth=5, min_samples_leaf=2, random_state=0),
+    RandomForestRegressor(n_estimators=15, min_samples_leaf=1, bootstrap=False, max_features=2, random_state=1),
+    ExtraTreesRegressor(n_estimators=10, max_depth=4, random_state=0),
+], ids=['rf', 'rf_sin_bootstrap', 'extra_trees'])
+def modelo(request, datos):
+    X, y = datos
+    return request.param.fit(X[:120], y[:120])
+
+def test_cuantiles_iguales_al_calculo_fila_por_fila(datos, modelo):
+    X, y = datos
+    intervalos = IntervalosQRF(modelo, X[:120], y[:120])
+    np.testing.assert_array_equal(intervalos.cuantiles(X[120:], Q),
+                                  _cuantiles_directos(modelo, X[:120], y[:120], X[120:], Q))
+
+def test_cuantiles_no_se_cruzan(datos, modelo):
+    X, y = datos
+    q = np.linspace(0.01, 0.99, 50)
+    cuantiles = IntervalosQRF(modelo, X[:120], y[:120]).cuantiles(X, q)
+    assert cuantiles.shape == (len(X), len(q))
+    assert (np.diff(cuantiles, axis=1) >= 0).all()
+    # Cada cuantil es uno de los valores de referencia
+    assert np.isin(cuantiles, y[:120].unique()).all()
+
+def test_pred_igual_a_predict(datos, modelo):
+    X, y = datos
+    resultado = IntervalosQRF(modelo, X[:120], y[:120]).intervalos(X[120:])
+    assert list(resultado.columns) == ['pred', 'q10', 'q50', 'q90']
+    np.testing.assert_array_equal(resultado['pred'].to_numpy(), modelo.predict(X[120:]))
+
+def test_bosque_compilado(datos, modelo):
+    X, y = datos
+    bosque = BosqueCompilado(modelo)
+    compilado = IntervalosQRF(bosque, X[:120], y[:120]).intervalos(X[120:])
+    original = IntervalosQRF(modelo, X[:120], y[:120]).intervalos(X[120:])
+    pd.testing.assert_frame_equal(compilado[['q10', 'q50', 'q90']], original[['q10', 'q50', 'q90']])
+    np.testing.assert_allclose(compilado['pred'], bosque.predict(X[120:]), rtol=1e-12)
+
+def test_referencia_con_nan(datos, modelo):
+    X, y = datos
+    y_nan = y[:120].copy()
+    y_nan.iloc[::10] = np.nan
+    intervalos = IntervalosQRF(modelo, X[:120], y_nan)
+    assert not np.isnan(intervalos.valores).any()
+    assert not np.isnan(intervalos.cuantiles(X[120:])).any()
+
+def test_qrf_backtest(datos):
+    X, y = datos
+    dates = pd.Series(pd.date_range('2024-01-01', periods=len(X)))
+    modelo = RandomForestRegressor(n_estimators=10, max_depth=4, random_state=0)
+    resultado = qrf_backtest(modelo, X, y, dates, train_window=100, test_window=14, gap=7)
+    assert list(resultado.columns) == ['date', 'y_true', 'pred'] + [f"q{round(c * 100):02d}" for c in CUANTILES]
+    # Pliegues de 14 días a partir de 100 + 7
+    assert len(resultado) == 14 * ((len(X) - 100 - 7 - 14) // 14 + 1)
+    assert resultado['date'].iloc[0] == dates.iloc[107]
+    assert ((resultado['q10'] <= resultado['q50']) & (resultado['q50'] <= resultado['q90'])).all()
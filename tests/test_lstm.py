@@ -0,0 +1,61 @@
+# tests/test_lstm.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from lstm import comparar_warm_start, lstm_walk_forward, particion_ajuste
+from secuencias import Secuencias, escalar_min_max
+
+WINDOW, TEST_WINDOW, GAP = 5, 7, 3
+
+def _datos(n=150, features=3, semilla=0):
+    rng = np.random.default_rng(semilla)
+    X = pd.DataFrame(rng.normal(size=(n, features)), columns=[f"f{i}" for i in range(features)])
+    return X, pd.Series(rng.poisson(6, size=n).astype(float))
+
+# --- Validación del Ajuste Fino ---
+
+@pytest.mark.parametrize('anterior, fin, ajuste, validacion', [
+    (100, 114, (100, 111), (111, 114)),
+    (100, 107, (100, 106), (106, 107)),
+    (100, 102, (100, 101), (101, 102)),
+    (100, 101, (100, 101), (100, 101)),
+])
+def test_particion_ajuste(anterior, fin, ajuste, validacion):
+    entrenamiento, val = particion_ajuste(anterior, fin)
+    assert (entrenamiento.start, entrenamiento.stop) == ajuste
+    assert (val.start, val.stop) == validacion
+
+def test_validacion_solo_con_secuencias_nuevas():
+    """En cada pliegue la validación sale de lo nuevo, no de lo ya entrenado ni del gap."""
+    X, y = _datos(400)
+    pliegues = Secuencias(escalar_min_max(X), y, WINDOW).pliegues(TEST_WINDOW, GAP)
+    assert len(pliegues) > 2
+    for (_, anterior, _, _), (_, train_end, gap_end, _) in zip(pliegues, pliegues[1:]):
+        ajuste, validacion = particion_ajuste(anterior, train_end)
+        assert anterior <= ajuste.start < ajuste.stop == validacion.start < validacion.stop == train_end < gap_end
+
+# --- Walk-forward ---
+
+def test_walk_forward_con_tensorflow(tmp_path):
+    pytest.importorskip('tensorflow')
+    X, y = _datos()
+    base = escalar_min_max(X)
+    n_pliegues = len(Secuencias(base, y, WINDOW).pliegues(TEST_WINDOW, GAP))
+    assert n_pliegues == 3
+
+    for warm_start, modo in ((False, 'desde_cero'), (True, 'warm_start')):
+        resultado = lstm_walk_forward(base, y, WINDOW, TEST_WINDOW, GAP, epochs=1, warm_start=warm_start,
+                                      epochs_ajuste=1, dir_checkpoints=tmp_path)
+        assert len(resultado) == n_pliegues
+        assert list(resultado['pliegue']) == list(range(n_pliegues))
+        assert (resultado['modo'] == modo).all()
+        assert (resultado['epocas'] == 1).all()
+        assert np.isfinite(resultado['MAE']).all()
+        for pliegue in range(n_pliegues):
+            assert (tmp_path / f"lstm_w{WINDOW}_{modo}_pliegue{pliegue:03d}.keras").exists()
+    assert not list(tmp_path.glob('.*.tmp.keras'))
+
+    resumen = comparar_warm_start(base, y, WINDOW, TEST_WINDOW, GAP, epochs=1, epochs_ajuste=1)
+    assert list(resumen.index) == ['desde_cero', 'warm_start']
+    assert (resumen['pliegues'] == n_pliegues).all()
@@ -0,0 +1,25 @@
+# tests/test_main.py
+import main
+
+ETAPAS_PRUEBA = {
+    'a': {'script': 'no_existe_a.py', 'depende_de': [], 'opcional': True},
+    'b': {'script': 'no_existe_b.py', 'depende_de': ['a'], 'opcional': False},
+    'c': {'script': 'no_existe_c.py', 'depende_de': ['b'], 'opcional': False},
+}
+
+def test_pipeline_usa_las_etapas_recibidas():
+    # Sin `ejecutar` propio, los scripts salen de ETAPAS_PRUEBA y no del ETAPAS global
+    resultado = main.ejecutar_pipeline(ETAPAS_PRUEBA)
+    assert resultado['estado'] == {'a': 'error', 'b': 'error', 'c': 'omitida'}
+
+def test_opcional_fallida_no_bloquea_dependientes():
+    resultado = main.ejecutar_pipeline(ETAPAS_PRUEBA, ejecutar=lambda n: (n != 'a', 1.0))
+    assert resultado['estado'] == {'a': 'error', 'b': 'ok', 'c': 'ok'}
+
+def test_resumen_describe_el_grafo_recibido(capsys):
+    duraciones = {'a': 1.0, 'b': 2.0, 'c': 0.5}
+    resultado = {'estado': {n: 'ok' for n in duraciones}, 'duraciones': duraciones}
+    main.imprimir_resumen(resultado, 3.5, ETAPAS_PRUEBA)
+    salida = capsys.readouterr().out
+    assert 'Ruta crítica: a -> b -> c (3.50 s)' in salida
+    assert 'merge' not in salida
@@ -0,0 +1,93 @@
+# tests/test_merge_data.py
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+import almacen
+from incremental import contar_filas_csv
+from merge_data import _fuentes_sinteticas, cargar_fuentes, fusionar_fuentes, merge_data
+
+# --- Fixtures ---
+
+@pytest.fixture
+def corrida(tmp_path):
+    """Publica las fuentes sintéticas hasta una fecha y corre merge_data sobre tmp_path."""
+    fuentes = _fuentes_sinteticas(años=2, ubicaciones=1)
+    del fuentes['clima_ubicaciones']
+    salida, huellas = tmp_path / 'dataset.csv', tmp_path / 'huellas.feather'
+
+    def correr(hasta, incremental=True):
+        for nombre, df in fuentes.items():
+            almacen.guardar(df[df['date'] <= hasta], nombre, tmp_path, espejo_csv=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            merge_data(incremental, tmp_path, salida, huellas, hasta)
+        return pd.read_csv(salida, parse_dates=['date'])
+
+    def completo(hasta):
+        return fusionar_fuentes(cargar_fuentes(tmp_path), hasta)
+
+    correr.fuentes, correr.salida, correr.completo = fuentes, salida, completo
+    return correr
+
+def _esperado(df):
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), parse_dates=['date'])
+
+# --- CSV incremental ---
+
+def test_incremental_igual_a_fusion_completa(corrida):
+    fin = corrida.fuentes['clima']['date'].max()
+    corrida(fin - pd.Timedelta(days=5), incremental=False)
+    for dias in range(4, -1, -1):
+        hoy = fin - pd.Timedelta(days=dias)
+        # Un día muy caluroso mueve el percentil 90 y cambia banderas de filas anteriores
+        clima = corrida.fuentes['clima']
+        clima.loc[clima['date'] == hoy, 'tmax'] = 60.0
+        csv = corrida(hoy)
+    pd.testing.assert_frame_equal(csv, _esperado(corrida.completo(fin)))
+
+def test_csv_desfasado_se_reescribe_completo(corrida, capsys):
+    fin = corrida.fuentes['clima']['date'].max()
+    inicio = fin - pd.Timedelta(days=3)
+    corrida(inicio, incremental=False)
+    # CSV de otra corrida: mismas fechas finales pero con un hueco de un año en medio
+    previo = pd.read_csv(corrida.salida)
+    previo.drop(previo.index[10:375]).to_csv(corrida.salida, index=False)
+
+    csv = corrida(fin)
+
+    assert contar_filas_csv(corrida.salida) == len(csv)
+    pd.testing.assert_frame_equal(csv, _esperado(corrida.completo(fin)))
+    assert 'se reescribe completo' in capsys.readouterr().err
+
+def test_csv_con_otra_ultima_fecha_se_reescribe_completo(corrida):
+    fin = corrida.fuentes['clima']['date'].max()
+    corrida(fin - pd.Timedelta(days=3), incremental=False)
+    # Mismo número de filas, pero desplazadas un día
+    previo = pd.read_csv(corrida.salida, parse_dates=['date'])
+    previo['date'] += pd.Timedelta(days=1)
+    previo.to_csv(corrida.salida, index=False)
+
+    csv = corrida(fin)
+
+    pd.testing.assert_frame_equal(csv, _esperado(corrida.completo(fin)))
+
+def test_csv_con_fin_de_linea_crlf(corrida):
+    fin = corrida.fuentes['clima']['date'].max()
+    corrida(fin - pd.Timedelta(days=3), incremental=False)
+    previo = pd.read_csv(corrida.salida)
+    previo.to_csv(corrida.salida, index=False, lineterminator='\r\n')
+
+    csv = corrida(fin)
+
+    pd.testing.assert_frame_equal(csv, _esperado(corrida.completo(fin)))
+
+def test_contar_filas_csv(tmp_path):
+    ruta = tmp_path / 'serie.csv'
+    ruta.write_bytes(b'date,x\n2025-01-01,1\n2025-01-02,2')
+    assert contar_filas_csv(ruta) == 2
+    ruta.write_bytes(b'date,x\r\n2025-01-01,1\r\n')
+    assert contar_filas_csv(ruta) == 1
+    ruta.write_bytes(b'date,x\n')
+    assert contar_filas_csv(ruta) == 0
@@ -0,0 +1,113 @@
+# tests/test_monitor_drift.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from features_online import _dataset_sintetico
+from monitor_drift import (NUM_CUBETAS, REFERENCIAS, SketchDrift, _matriz, _puntajes_directos, monitorear)
+
+DIAS_DIARIOS = 20
+
+@pytest.fixture(scope='module')
+def dataset():
+    return _dataset_sintetico(años=2)
+
+def _reconstruido(sketch, df) -> SketchDrift:
+    """Estado armado de una vez con los mismos bordes."""
+    completo = SketchDrift(sketch.columnas, sketch.bordes)
+    completo.actualizar(df)
+    return completo
+
+def _comparar(sketch, esperado):
+    np.testing.assert_array_equal(sketch.fechas, esperado.fechas)
+    np.testing.assert_array_equal(sketch.codigos, esperado.codigos)
+    np.testing.assert_array_equal(sketch.acumulados, esperado.acumulados)
+    pd.testing.assert_frame_equal(sketch.puntajes(), esperado.puntajes())
+
+def _cambiar_cubeta(sketch, df, fila, columna='robos') -> pd.DataFrame:
+    """Copia de `df` con el valor de `fila` movido a la cubeta opuesta."""
+    df = df.copy()
+    actual = sketch.codificar(_matriz(df.iloc[[fila]], sketch.columnas))[0, sketch.columnas.index(columna)]
+    df[columna] = df[columna].astype('float64')
+    df.loc[fila, columna] = -1e9 if actual > 0 else 1e9
+    return df
+
+# --- Actualización Incremental ---
+
+def test_incremental_igual_a_reconstruir(dataset, tmp_path):
+    ruta = tmp_path / 'drift_estado.npz'
+    SketchDrift.desde_dataset(dataset.iloc[:len(dataset) - DIAS_DIARIOS]).guardar(ruta)
+    for fin in range(len(dataset) - DIAS_DIARIOS + 1, len(dataset) + 1):
+        sketch = SketchDrift.cargar(ruta)
+        assert sketch.actualizar(dataset.iloc[:fin]) == 1
+        sketch.guardar(ruta)
+
+    _comparar(SketchDrift.cargar(ruta), _reconstruido(sketch, dataset))
+
+def test_sin_cambios_no_recalcula(dataset):
+    sketch = SketchDrift.desde_dataset(dataset)
+    acumulados = sketch.acumulados.copy()
+    assert sketch.actualizar(dataset) == 0
+    np.testing.assert_array_equal(sketch.acumulados, acumulados)
+
+def test_puntajes_iguales_al_calculo_directo(dataset):
+    sketch = SketchDrift.desde_dataset(dataset)
+    puntajes = sketch.puntajes()
+    directos = _puntajes_directos(sketch, _matriz(dataset.sort_values('date'), sketch.columnas))
+    assert list(puntajes['referencia'].unique()) == list(REFERENCIAS)
+    pd.testing.assert_frame_equal(puntajes[['referencia', 'feature']], directos[['referencia', 'feature']])
+    np.testing.assert_allclose(puntajes['psi'], directos['psi'], atol=1e-12)
+    np.testing.assert_allclose(puntajes['ks'], directos['ks'], atol=1e-12)
+    assert ((puntajes['ks'] >= 0) & (puntajes['ks'] <= 1)).all()
+
+# --- Revisiones ---
+
+@pytest.mark.parametrize('atras', [1, 15, 200])
+def test_revision_recalcula_desde_la_primera_fila_cambiada(dataset, atras):
+    base = dataset.iloc[:len(dataset) - DIAS_DIARIOS].reset_index(drop=True)
+    sketch = SketchDrift.desde_dataset(base)
+    fila = len(base) - atras
+    revisado = _cambiar_cubeta(sketch, dataset, fila)
+    previos = sketch.acumulados[:fila + 1].copy()
+
+    # Días revisados más los nuevos
+    assert sketch.actualizar(revisado) == len(dataset) - fila
+    np.testing.assert_array_equal(sketch.acumulados[:fila + 1], previos)
+    _comparar(sketch, _reconstruido(sketch, revisado))
+
+def test_revision_dentro_de_la_misma_cubeta(dataset):
+    sketch = SketchDrift.desde_dataset(dataset)
+    j = sketch.columnas.index('tavg')
+    fila = len(dataset) - 50
+    revisado = dataset.copy()
+    # Un cambio mínimo que no cruza ningún borde no obliga a recalcular
+    cubeta = sketch.codigos[fila, j]
+    revisado['tavg'] = revisado['tavg'].astype('float64')
+    revisado.loc[fila, 'tavg'] = np.nextafter(float(dataset.loc[fila, 'tavg']), -np.inf if cubeta > 0 else np.inf)
+    assert sketch.codificar(_matriz(revisado.iloc[[fila]], sketch.columnas))[0, j] == cubeta
+    assert sketch.actualizar(revisado) == 0
+
+def test_nan_no_cuentan(dataset):
+    df = dataset.copy()
+    df['robos'] = df['robos'].astype('float64')
+    df.loc[:99, 'robos'] = np.nan
+    sketch = SketchDrift.desde_dataset(df)
+    j = sketch.columnas.index('robos')
+    assert (sketch.codigos[:100, j] == -1).all()
+    assert sketch.histograma(0, 100)[j].sum() == 0
+    assert sketch.histograma(0, len(df))[j].sum() == len(df) - 100
+    assert sketch.acumulados.shape == (len(df) + 1, len(sketch.columnas), NUM_CUBETAS)
+
+# --- Monitoreo ---
+
+def test_monitorear_reconstruye_si_cambian_las_columnas(dataset, tmp_path, capsys):
+    ruta = tmp_path / 'drift_estado.npz'
+    monitorear(dataset.iloc[:-5], ruta)
+    assert 'Drift: %d días (%d recalculados)' % (len(dataset) - 5, len(dataset) - 5) in capsys.readouterr().out
+    monitorear(dataset, ruta)
+    assert '(5 recalculados)' in capsys.readouterr().out
+
+    monitorear(dataset.assign(columna_nueva=1.0), ruta)
+    salida = capsys.readouterr().out
+    assert 'se reconstruye' in salida
+    assert 'columna_nueva' in SketchDrift.cargar(ruta).columnas
@@ -0,0 +1,159 @@
+# tests/test_registro_modelos.py
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from registro_modelos import RegistroModelos, clasificar, uso_disco
+
+# --- Nombres de Archivo ---
+
+@pytest.mark.parametrize('nombre, esperado', [
+    ('modelo_mejorado_RF_improved_20251001_201426.joblib', ('mejorado', 'modelo', 'RF_improved', '20251001_201426')),
+    ('modelo_mejorado_RF_improved_20251001_201426_compilado.joblib',
+     ('mejorado', 'compilado', 'RF_improved', '20251001_201426')),
+    ('metadata_mejorado_20251001_201426.json', ('mejorado', 'metadata', None, '20251001_201426')),
+    ('homicidios_predictor_20250818_215008.joblib', ('predictor', 'modelo', None, '20250818_215008')),
+    ('scaler_20250818_215008.joblib', ('predictor', 'scaler', None, '20250818_215008')),
+    ('model_info_20250818_215008.json', ('predictor', 'metadata', None, '20250818_215008')),
+    ('modelo_RF_full.joblib', ('full', 'modelo', 'RF', None)),
+    ('modelo_RF_full_compilado.joblib', ('full', 'compilado', 'RF', None)),
+    ('modelo_MA7_meta.json', ('full', 'metadata', 'MA7', None)),
+])
+def test_clasificar(nombre, esperado):
+    assert clasificar(nombre) == esperado
+
+@pytest.mark.parametrize('nombre', [
+    'dataset_mejorado_20251001_201426.csv',
+    'comparacion_metodos_alternativos.png',
+    'modelo_mejorado_RF_improved_20251001_201426.joblib.tmp',
+    'scaler_2025.joblib',
+])
+def test_clasificar_ignora_otros_archivos(nombre):
+    assert clasificar(nombre) is None
+
+# --- Registro ---
+
+def _corrida(directorio, sello, modelo, mae=None, tipo='RF_improved'):
+    joblib.dump(modelo, directorio / f"modelo_mejorado_{tipo}_{sello}.joblib")
+    with open(directorio / f"metadata_mejorado_{sello}.json", 'w', encoding='utf-8') as f:
+        json.dump({'model_type': tipo, 'mae': mae, 'features': ['a', 'b']}, f)
+
+@pytest.fixture
+def directorio(tmp_path):
+    directorio = tmp_path / 'modelos'
+    directorio.mkdir()
+    _corrida(directorio, '20250101_000000', {'pesos': np.arange(1000.0)}, mae=1.5)
+    _corrida(directorio, '20250201_000000', {'pesos': np.arange(1000.0)}, mae=1.2)  # mismo contenido
+    _corrida(directorio, '20250301_000000', {'pesos': np.ones(1000)}, mae=1.4)
+    (directorio / 'notas.txt').write_text('no es un artefacto')
+    return directorio
+
+def test_corridas_y_consultas(directorio, tmp_path):
+    registro = RegistroModelos(directorio, tmp_path / 'indice.json')
+    assert set(registro.corridas) == {'mejorado:20250101_000000', 'mejorado:20250201_000000',
+                                      'mejorado:20250301_000000'}
+    assert registro.ultimo()['id'] == 'mejorado:20250301_000000'
+    assert registro.mejor()['id'] == 'mejorado:20250201_000000'
+    assert registro.features('mejorado:20250101_000000') == ['a', 'b']
+    assert list(registro.tabla()['id']) == sorted(registro.corridas)
+
+def test_indice_no_recalcula_hashes(directorio, tmp_path, monkeypatch):
+    ruta_indice = tmp_path / 'indice.json'
+    RegistroModelos(directorio, ruta_indice)
+
+    import registro_modelos
+    llamadas = []
+    original = registro_modelos.sha256_archivo
+    monkeypatch.setattr(registro_modelos, 'sha256_archivo', lambda p: llamadas.append(p.name) or original(p))
+    RegistroModelos(directorio, ruta_indice)
+    assert llamadas == []
+
+    _corrida(directorio, '20250401_000000', {'pesos': np.zeros(3)})
+    RegistroModelos(directorio, ruta_indice)
+    assert sorted(llamadas) == ['metadata_mejorado_20250401_000000.json',
+                                'modelo_mejorado_RF_improved_20250401_000000.joblib']
+
+# --- Deduplicación ---
+
+def test_deduplicar_con_enlaces_duros(directorio, tmp_path):
+    registro = RegistroModelos(directorio, tmp_path / 'indice.json')
+    a = directorio / 'modelo_mejorado_RF_improved_20250101_000000.joblib'
+    b = directorio / 'modelo_mejorado_RF_improved_20250201_000000.joblib'
+    assert list(registro.duplicados().values()) == [[a.name, b.name]]
+    aparentes, reales = uso_disco(directorio)
+    assert aparentes == reales
+
+    liberados = registro.deduplicar()
+    assert liberados == a.stat().st_size
+    assert os.path.samefile(a, b)
+    assert uso_disco(directorio) == (aparentes, reales - liberados)
+    # Los nombres siguen resolviendo al mismo contenido
+    np.testing.assert_array_equal(joblib.load(b)['pesos'], np.arange(1000.0))
+    # Una segunda pasada no hace nada
+    assert registro.deduplicar() == 0
+
+def test_registrar_modelo_repetido_no_ocupa_disco(directorio, tmp_path):
+    registro = RegistroModelos(directorio, tmp_path / 'indice.json')
+    # Sin memory map: un np.memmap se serializa distinto que el arreglo original
+    modelo = registro.cargar('mejorado:20250301_000000', mmap_mode=None)
+    _, antes = uso_disco(directorio)
+
+    corrida = registro.registrar(modelo, {'mae': 1.0}, sello='20250501_000000')
+    assert corrida['id'] == 'mejorado:20250501_000000'
+    assert os.path.samefile(registro.ruta(corrida), directorio / 'modelo_mejorado_RF_improved_20250301_000000.joblib')
+    _, despues = uso_disco(directorio)
+    # Solo crece por la metadata nueva
+    assert despues - antes == (directorio / 'metadata_mejorado_20250501_000000.json').stat().st_size
+    assert registro.mejor()['id'] == 'mejorado:20250501_000000'
+
+# --- Carga ---
+
+def test_lru_por_contenido(directorio, tmp_path):
+    for i in range(3):
+        _corrida(directorio, f"2025060{i + 1}_000000", {'pesos': np.full(10, float(i))})
+    registro = RegistroModelos(directorio, tmp_path / 'indice.json', max_cargados=2)
+
+    enero = registro.cargar('mejorado:20250101_000000')
+    # Mismo contenido: mismo objeto, sin volver a leer el archivo
+    assert registro.cargar('mejorado:20250201_000000') is enero
+    assert (registro.aciertos, registro.fallos) == (1, 1)
+
+    junio_3 = registro.cargar('mejorado:20250603_000000')
+    registro.cargar('mejorado:20250101_000000')           # enero pasa a ser el más reciente
+    registro.cargar('mejorado:20250602_000000')           # desaloja a junio_3
+    assert len(registro.cargados) == 2
+    assert registro.cargar('mejorado:20250101_000000') is enero
+    assert registro.cargar('mejorado:20250603_000000') is not junio_3
+    assert registro.fallos == 4
+
+def test_prefiere_la_version_compilada(tmp_path, capsys):
+    pytest.importorskip('sklearn')
+    from sklearn.ensemble import RandomForestRegressor
+
+    from bosque_compilado import BosqueCompilado, exportar
+
+    directorio = tmp_path / 'modelos'
+    directorio.mkdir()
+    rng = np.random.default_rng(0)
+    X, y = rng.normal(size=(200, 4)), rng.normal(size=200)
+    _corrida(directorio, '20250101_000000', RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y))
+    registro = RegistroModelos(directorio, None)
+    assert isinstance(registro.cargar(registro.ultimo()), RandomForestRegressor)
+
+    exportar(registro)
+    corrida = registro.ultimo()
+    bosque = registro.cargar(corrida)
+    assert isinstance(bosque, BosqueCompilado)
+    original = registro.cargar(corrida, compilado=False)
+    assert isinstance(original, RandomForestRegressor)
+    np.testing.assert_allclose(bosque.predict(X), original.predict(X), rtol=1e-5, atol=1e-5)
+
+    # Si el modelo cambia y la versión compilada queda vieja, se usa el original
+    _corrida(directorio, '20250101_000000', RandomForestRegressor(n_estimators=3, random_state=1).fit(X, y))
+    registro.actualizar()
+    modelo = registro.cargar(registro.ultimo())
+    assert isinstance(modelo, RandomForestRegressor) and modelo.n_estimators == 3
+    assert 'no corresponde al modelo actual' in capsys.readouterr().err
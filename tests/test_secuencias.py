@@ -0,0 +1,46 @@
+# tests/test_secuencias.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from secuencias import Secuencias, _build_sequences, escalar_min_max
+
+# --- Datos ---
+
+def _datos(n, features=3, semilla=0):
+    rng = np.random.default_rng(semilla)
+    X = pd.DataFrame(rng.normal(size=(n, features)), columns=[f"f{i}" for i in range(features)])
+    return X, pd.Series(rng.poisson(6, size=n).astype(float))
+
+# --- Ventanas ---
+
+@pytest.mark.parametrize('n, window, horizon', [(60, 7, 1), (60, 28, 3), (29, 28, 1), (30, 28, 2)])
+def test_igual_a_build_sequences(n, window, horizon):
+    X, y = _datos(n)
+    base = escalar_min_max(X)
+    secuencias = Secuencias(base, y, window, horizon)
+    Xseq, yseq, idx = _build_sequences(pd.DataFrame(base.astype(np.float64), columns=X.columns), y, window, horizon)
+    np.testing.assert_array_equal(secuencias.X, Xseq)
+    np.testing.assert_array_equal(secuencias.y, yseq)
+    np.testing.assert_array_equal(secuencias.indices, idx)
+
+@pytest.mark.parametrize('n, window', [(10, 28), (28, 28), (0, 7)])
+def test_serie_mas_corta_que_la_ventana(n, window):
+    X, y = _datos(n)
+    secuencias = Secuencias(np.zeros((n, 3), dtype=np.float32), y, window)
+    assert len(secuencias) == 0
+    assert secuencias.X.shape == secuencias.forma == (0, window, 3)
+    assert secuencias.X.dtype == np.float32
+    assert list(secuencias.generador()) == []
+    assert secuencias.pliegues() == []
+
+def test_lotes_barajados_cubren_todas_las_muestras():
+    X, y = _datos(80)
+    secuencias = Secuencias(escalar_min_max(X), y, 14)
+    lotes = list(secuencias.generador(batch_size=8, barajar=True, semilla=1))
+    assert sum(len(yb) for _, yb in lotes) == len(secuencias)
+    assert all(Xb.flags['C_CONTIGUOUS'] and Xb.shape[1:] == (14, 3) for Xb, _ in lotes)
+
+def test_y_desalineado():
+    with pytest.raises(ValueError):
+        Secuencias(np.zeros((10, 2), dtype=np.float32), np.zeros(9), 3)
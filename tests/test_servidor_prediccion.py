@@ -0,0 +1,94 @@
+# tests/test_servidor_prediccion.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from servidor_prediccion import LotePredicciones, ServicioPrediccion
+
+# --- Modelo falso ---
+
+class ModeloSuma:
+    """predict = suma de cada fila; `espera` simula un predict lento."""
+    def __init__(self, espera=0.0):
+        self.espera = espera
+        self.llamadas = 0
+
+    def predict(self, X):
+        self.llamadas += 1
+        time.sleep(self.espera)
+        return X.to_numpy().sum(axis=1)
+
+FEATURES = ['a', 'b']
+
+def _predecir_con_limite(lote, vectores, segundos=5):
+    """Corre lote.predecir en un hilo y falla si no termina (en vez de colgar la prueba)."""
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(lote.predecir, vectores).result(timeout=segundos)
+
+# --- Micro-lotes ---
+
+def test_agrupa_peticiones_concurrentes():
+    modelo = ModeloSuma()
+    lote = LotePredicciones(modelo, FEATURES, espera=0.05)
+    with ThreadPoolExecutor(8) as pool:
+        resultados = list(pool.map(lambda i: lote.predecir(np.array([i, 1.0])), range(8)))
+    assert [float(r[0]) for r in resultados] == [i + 1.0 for i in range(8)]
+    assert lote.lotes < 8
+    lote.cerrar()
+
+def test_predecir_despues_de_cerrar_no_se_cuelga():
+    lote = LotePredicciones(ModeloSuma(), FEATURES)
+    lote.cerrar()
+    lote.hilo.join(timeout=5)
+    assert not lote.hilo.is_alive()
+    np.testing.assert_array_equal(_predecir_con_limite(lote, np.array([[1.0, 2.0], [3.0, 4.0]])), [3.0, 7.0])
+
+def test_cerrar_con_peticiones_en_curso():
+    # Las peticiones encoladas antes del cierre salen en el último lote; las demás, directo
+    lote = LotePredicciones(ModeloSuma(espera=0.01), FEATURES, espera=0.005)
+    detener = threading.Event()
+
+    def cliente(k):
+        resultados = []
+        while not detener.is_set():
+            resultados.append(float(lote.predecir(np.array([k, 1.0]))[0]))
+        # Un paso más después del cierre, como el pronóstico recursivo
+        resultados.append(float(lote.predecir(np.array([k, 1.0]))[0]))
+        return resultados
+
+    with ThreadPoolExecutor(6) as pool:
+        futuros = [pool.submit(cliente, k) for k in range(6)]
+        time.sleep(0.05)
+        lote.cerrar()
+        detener.set()
+        for k, futuro in enumerate(futuros):
+            assert set(futuro.result(timeout=5)) == {k + 1.0}
+
+def test_error_del_modelo_llega_a_la_peticion():
+    modelo = SimpleNamespace(predict=lambda X: 1 / 0)
+    lote = LotePredicciones(modelo, FEATURES)
+    with pytest.raises(ZeroDivisionError):
+        _predecir_con_limite(lote, np.array([1.0, 2.0]))
+    lote.cerrar()
+
+# --- Recarga ---
+
+def test_recargar_no_deja_colgado_al_estado_anterior():
+    versiones = iter([1.0, 2.0])
+
+    def cargador():
+        factor = next(versiones)
+        modelo = SimpleNamespace(predict=lambda X: X.to_numpy().sum(axis=1) * factor)
+        return SimpleNamespace(lote=LotePredicciones(modelo, FEATURES))
+
+    servicio = ServicioPrediccion(cargador)
+    anterior = servicio.estado
+    servicio.recargar()
+
+    # Una petición que tomó el estado antes de la recarga termina con el modelo anterior
+    np.testing.assert_array_equal(_predecir_con_limite(anterior.lote, np.array([1.0, 2.0])), [3.0])
+    np.testing.assert_array_equal(_predecir_con_limite(servicio.estado.lote, np.array([1.0, 2.0])), [6.0])
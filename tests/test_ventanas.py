@@ -0,0 +1,56 @@
+# tests/test_ventanas.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from ventanas import _features_pandas, construir_matriz, features_ventanas, nombres_features
+
+# --- Datos ---
+
+def _panel(n, series=3, semilla=0):
+    """Conteos con huecos y un tramo constante, como los días sin registro."""
+    rng = np.random.default_rng(semilla)
+    valores = rng.poisson(rng.uniform(1, 20, series), size=(n, series)).astype(np.float64)
+    valores[rng.random((n, series)) < 0.05] = np.nan
+    valores[n // 3:n // 3 + 8, 0] = 0.0
+    return valores
+
+def _comparar(obtenido, esperado):
+    np.testing.assert_allclose(obtenido, esperado, rtol=1e-9, atol=1e-9)
+
+# --- Equivalencia con pandas ---
+
+@pytest.mark.parametrize('n', [1, 5, 10, 20, 31, 120])
+def test_igual_a_pandas(n):
+    valores = _panel(n)
+    matriz = construir_matriz(valores, series_por_bloque=2)
+    assert matriz.shape == (3, n, len(nombres_features()))
+    for i in range(valores.shape[1]):
+        _comparar(matriz[i], _features_pandas(pd.Series(valores[:, i])).to_numpy())
+
+@pytest.mark.parametrize('n', [5, 20, 60])
+def test_desplazamiento_causal(n):
+    serie = pd.Series(_panel(n, series=1)[:, 0])
+    espec = {'rolling': [7, 14, 28], 'expanding': True, 'volatility': [7]}
+    causal = construir_matriz(serie.to_numpy(), espec, desplazamiento=1)[0]
+    _comparar(causal, _features_pandas(serie.shift(1), espec=espec).to_numpy())
+
+def test_desplazamiento_mayor_que_la_serie():
+    causal = construir_matriz(np.arange(3.0), {'rolling': [2]}, desplazamiento=5)[0]
+    assert np.isnan(causal).all()
+
+def test_features_ventanas_panel():
+    fechas = pd.date_range('2025-01-01', periods=40)
+    df = pd.DataFrame({'date': np.tile(fechas, 2), 'ciudad': np.repeat(['a', 'b'], 40),
+                       'homicidios': _panel(40, series=2).T.ravel()})
+    # Un día faltante en la ciudad b cuenta como NaN
+    df = df.drop(index=45).reset_index(drop=True)
+    resultado = features_ventanas(df, por='ciudad')
+    for ciudad, grupo in df.groupby('ciudad'):
+        serie = grupo.set_index('date')['homicidios'].reindex(fechas)
+        esperado = _features_pandas(serie).loc[grupo['date']].to_numpy()
+        _comparar(resultado.loc[grupo.index].to_numpy(), esperado)
+
+def test_salida_con_forma_incorrecta():
+    with pytest.raises(ValueError):
+        construir_matriz(np.zeros(10), salida=np.empty((1, 9, len(nombres_features()))))
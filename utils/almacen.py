@@ -0,0 +1,179 @@
+# utils/almacen.py
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# --- Constantes y Configuración ---
+
+DIR_DATOS = Path(__file__).parent.parent / 'datos'
+
+# Cada tabla intermedia se guarda como Feather (Arrow IPC) sin comprimir, con el
+# esquema (tipos de pandas incluidos) embebido en el archivo, lo que permite leerla
+# con memory map y solo las columnas pedidas. Los notebooks todavía leen los CSV,
+# así que por defecto también se escribe una copia CSV.
+EXTENSION = '.feather'
+ESPEJO_CSV = True
+
+# --- Rutas ---
+
+def ruta(nombre: str, data_dir=DIR_DATOS) -> Path:
+    """Ruta del archivo Feather de una tabla (p. ej. 'homicidios')."""
+    return Path(data_dir) / f"{nombre}{EXTENSION}"
+
+def ruta_csv(nombre: str, data_dir=DIR_DATOS) -> Path:
+    """Ruta de la copia CSV de una tabla."""
+    return Path(data_dir) / f"{nombre}.csv"
+
+def existe(nombre: str, data_dir=DIR_DATOS) -> bool:
+    """Indica si la tabla existe en Feather o, al menos, en CSV."""
+    return ruta(nombre, data_dir).exists() or ruta_csv(nombre, data_dir).exists()
+
+# --- Escritura ---
+
+def guardar(df: pd.DataFrame, nombre: str, data_dir=DIR_DATOS, espejo_csv: bool = ESPEJO_CSV) -> Path:
+    """
+    Guarda una tabla como Feather de forma atómica y, opcionalmente, su copia CSV.
+
+    Args:
+        df (pd.DataFrame): Tabla a guardar (el índice no se conserva).
+        nombre (str): Nombre de la tabla, sin extensión.
+        data_dir (Path): Carpeta de datos.
+        espejo_csv (bool): Si también se escribe `{nombre}.csv`.
+
+    Returns:
+        Path: Ruta del archivo Feather escrito.
+    """
+    path = ruta(nombre, data_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporal = path.with_suffix(path.suffix + '.tmp')
+    feather.write_feather(df.reset_index(drop=True), temporal, compression='uncompressed')
+    os.replace(temporal, path)
+    if espejo_csv:
+        df.to_csv(ruta_csv(nombre, data_dir), index=False)
+    return path
+
+def reemplazar_cola(nombre: str, cola_df: pd.DataFrame, data_dir=DIR_DATOS) -> Path:
+    """
+    Sustituye las filas desde la primera fecha de `cola_df` en adelante.
+
+    Pensado para las series que se actualizan de forma incremental: la copia CSV ya
+    se actualizó en su lugar, así que aquí solo se reescribe el Feather. Si el
+    Feather todavía no existe, se migra el CSV completo (que ya incluye la cola); la
+    cola solo se aplica sobre un Feather existente y si no está vacía.
+    """
+    path = ruta(nombre, data_dir)
+    if not path.exists():
+        path_csv = ruta_csv(nombre, data_dir)
+        if path_csv.exists():
+            return guardar(_cargar_csv(path_csv), nombre, data_dir, espejo_csv=False)
+        if cola_df.empty:
+            return path
+        return guardar(cola_df, nombre, data_dir, espejo_csv=False)
+    if cola_df.empty:
+        return path
+    previo = cargar(nombre, data_dir=data_dir)
+    previo = previo[previo['date'] < cola_df['date'].min()]
+    cola_df = cola_df.astype(previo.dtypes.to_dict(), errors='ignore')
+    return guardar(pd.concat([previo, cola_df], ignore_index=True), nombre, data_dir, espejo_csv=False)
+
+# --- Lectura ---
+
+def _cargar_csv(path: Path, columnas=None) -> pd.DataFrame:
+    """
+    Lectura de respaldo cuando aún no existe el Feather (datos generados antes del
+    almacén). Aquí sí se parsean fechas y se corrigen tipos.
+    """
+    df = pd.read_csv(path, usecols=columnas)
+    if 'date' in df.columns:
+        # Filas sin fecha válida (p. ej. la fila fantasma del símbolo en dolar.csv)
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df = df.dropna(subset=['date']).reset_index(drop=True)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            df[col] = pd.to_numeric(df[col])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+def cargar(nombre: str, columnas=None, data_dir=DIR_DATOS) -> pd.DataFrame:
+    """
+    Lee una tabla con memory map y solo las columnas pedidas.
+
+    Args:
+        nombre (str): Nombre de la tabla, sin extensión.
+        columnas (list): Columnas a leer. None para todas.
+        data_dir (Path): Carpeta de datos.
+
+    Returns:
+        pd.DataFrame: La tabla con los tipos con los que se guardó.
+    """
+    path = ruta(nombre, data_dir)
+    if path.exists():
+        return feather.read_table(path, columns=columnas, memory_map=True).to_pandas()
+    path_csv = ruta_csv(nombre, data_dir)
+    if path_csv.exists():
+        print(f"{path.name} no existe; se lee {path_csv.name}.", file=sys.stderr)
+        return _cargar_csv(path_csv, columnas)
+    raise FileNotFoundError(2, "No existe la tabla", str(path_csv))
+
+def esquema(nombre: str, data_dir=DIR_DATOS) -> pa.Schema:
+    """Esquema Arrow embebido en el archivo, sin leer los datos."""
+    with pa.memory_map(str(ruta(nombre, data_dir))) as fuente:
+        return pa.ipc.open_file(fuente).schema
+
+# --- Benchmark ---
+
+def benchmark_almacen(filas=20000, columnas=200, repeticiones=5):
+    """Compara leer CSV con parse_dates contra Feather con memory map y proyección."""
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(filas, columnas)).astype('float32'),
+                      columns=[f"c{i}" for i in range(columnas)])
+    df.insert(0, 'date', pd.date_range('1970-01-01', periods=filas))
+    df['bandera'] = rng.random(filas) < 0.3
+
+    with tempfile.TemporaryDirectory() as tmp:
+        guardar(df, 'tabla', tmp)
+
+        def medir(funcion):
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                resultado = funcion()
+            return (time.perf_counter() - inicio) / repeticiones, resultado
+
+        t_csv, desde_csv = medir(lambda: pd.read_csv(ruta_csv('tabla', tmp), parse_dates=['date']))
+        t_feather, completo = medir(lambda: cargar('tabla', data_dir=tmp))
+        t_proy, proyectado = medir(lambda: cargar('tabla', ['date', 'c0', 'bandera'], data_dir=tmp))
+
+        pd.testing.assert_frame_equal(completo, df)
+        assert desde_csv['c0'].dtype == 'float64' and completo['c0'].dtype == 'float32'
+        tam_csv = ruta_csv('tabla', tmp).stat().st_size / 1024**2
+        tam_feather = ruta('tabla', tmp).stat().st_size / 1024**2
+
+    print(f"Tabla: {filas} filas x {df.shape[1]} columnas")
+    print(f"CSV + parse_dates:        {t_csv * 1000:8.1f} ms ({tam_csv:.1f} MB)")
+    print(f"Feather (mmap):           {t_feather * 1000:8.1f} ms ({tam_feather:.1f} MB)")
+    print(f"Feather, 3 columnas:      {t_proy * 1000:8.1f} ms")
+    print("Los tipos (float32, bool, datetime64) se conservan sin conversión.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacén de tablas intermedias en datos/.")
+    parser.add_argument("--benchmark", action="store_true", help="Compara la lectura de CSV y Feather.")
+    parser.add_argument("--migrar", action="store_true",
+                        help="Convierte a Feather los CSV de datos/ que aún no lo tengan.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_almacen()
+    elif args.migrar:
+        for nombre in ['homicidios', 'robos', 'clima', 'clima_ubicaciones', 'dolar', 'calendario']:
+            if ruta_csv(nombre).exists() and not ruta(nombre).exists():
+                guardar(_cargar_csv(ruta_csv(nombre)), nombre, espejo_csv=False)
+                print(f"{nombre}: {ruta(nombre)}")
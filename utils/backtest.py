@@ -0,0 +1,303 @@
+# utils/backtest.py
+import argparse
+import copy
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# --- Constantes y Configuración ---
+
+# Ventanas de analisis_alternativo.ipynb (sección 10)
+TRAIN_WINDOW = 90
+TEST_WINDOW = 7
+GAP = 3
+
+COLUMNAS_METRICAS = ['MAE', 'RMSE', 'PoissonDev', 'Within1']
+
+# --- Métricas ---
+
+def mean_poisson_deviance(y_true, y_pred, eps=1e-6):
+    y_true = np.asarray(y_true)
+    y_pred = np.clip(np.asarray(y_pred), eps, None)
+    return np.mean(2 * (y_true * np.log((y_true + eps) / y_pred) - (y_true - y_pred)))
+
+def within_tolerance(y_true, y_pred, tol=1):
+    return float(np.mean(np.abs(np.array(y_true) - np.array(y_pred)) <= tol))
+
+def metricas(y_true, y_pred) -> dict:
+    """MAE, RMSE, devianza de Poisson y proporción a ±1 de error, como en el notebook."""
+    y_true, y_pred = np.asarray(y_true, dtype=np.float64), np.asarray(y_pred, dtype=np.float64)
+    error = y_true - y_pred
+    return {
+        'MAE': float(np.mean(np.abs(error))),
+        'RMSE': float(np.sqrt(np.mean(error ** 2))),
+        'PoissonDev': float(mean_poisson_deviance(y_true, y_pred)),
+        'Within1': within_tolerance(y_true, y_pred, tol=1),
+    }
+
+# --- Pliegues ---
+
+def pliegues(n: int, train_window=TRAIN_WINDOW, test_window=TEST_WINDOW, gap=GAP) -> list:
+    """
+    Pliegues walk-forward con ventana de entrenamiento deslizante.
+
+    Returns:
+        list: Tuplas (inicio, fin_train, inicio_test, fin_test) de posiciones
+        (fin exclusivo); el test avanza `test_window` filas por pliegue.
+    """
+    resultado = []
+    start = 0
+    while start + train_window + gap + test_window <= n:
+        train_end = start + train_window
+        resultado.append((start, train_end, train_end + gap, train_end + gap + test_window))
+        start += test_window
+    return resultado
+
+# --- Ejecución de un Pliegue ---
+
+def _preparar_modelo(modelo, hilos):
+    """Copia independiente del modelo; limita sus hilos para no saturar los procesos."""
+    try:
+        from sklearn.base import clone
+        modelo = clone(modelo)
+    except (ImportError, TypeError):
+        modelo = copy.deepcopy(modelo)
+    if hilos is not None and hasattr(modelo, 'get_params') and 'n_jobs' in modelo.get_params():
+        modelo.set_params(n_jobs=hilos)
+    return modelo
+
+def evaluar_pliegue(modelo, X, y, pliegue, hilos=None):
+    """
+    Entrena una copia de `modelo` en la parte de entrenamiento del pliegue y lo
+    evalúa en la de test.
+
+    Args:
+        pliegue (tuple): (inicio, fin_train, inicio_test, fin_test), como en `pliegues`.
+        hilos (int): n_jobs del estimador (None no lo cambia).
+
+    Returns:
+        tuple: (métricas con fit_s y predict_s, predicciones float64).
+    """
+    start, train_end, gap_end, test_end = pliegue
+    modelo = _preparar_modelo(modelo, hilos)
+    inicio = time.perf_counter()
+    modelo.fit(X[start:train_end], y[start:train_end])
+    t_fit = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    pred = np.asarray(modelo.predict(X[gap_end:test_end]), dtype=np.float64)
+    t_predict = time.perf_counter() - inicio
+    return {**metricas(y[gap_end:test_end], pred), 'fit_s': t_fit, 'predict_s': t_predict}, pred
+
+# Datos de cada proceso del pool: se abren una sola vez, en el inicializador. Otros
+# módulos (busqueda.py) reutilizan el inicializador y leen de aquí en sus tareas.
+DATOS_PROCESO = {}
+
+def iniciar_proceso(ruta_x, ruta_y, modelos, hilos):
+    """Inicializador del pool: abre X e y (.npy) y guarda los modelos en DATOS_PROCESO."""
+    # Memory map de solo lectura: todos los procesos comparten las páginas de X e y
+    DATOS_PROCESO['X'] = np.load(ruta_x, mmap_mode='r')
+    DATOS_PROCESO['y'] = np.load(ruta_y, mmap_mode='r')
+    DATOS_PROCESO['modelos'] = modelos
+    DATOS_PROCESO['hilos'] = hilos
+
+def _tarea(nombre, pliegue):
+    datos = DATOS_PROCESO
+    return evaluar_pliegue(datos['modelos'][nombre], datos['X'], datos['y'], pliegue, datos['hilos'])
+
+# --- Backtesting ---
+
+def como_arreglos(X, y):
+    """X e y como arreglos float64 contiguos; error si no tienen las mismas filas."""
+    X = np.ascontiguousarray(X.to_numpy(dtype=np.float64) if hasattr(X, 'to_numpy') else X, dtype=np.float64)
+    y = np.ascontiguousarray(y.to_numpy(dtype=np.float64) if hasattr(y, 'to_numpy') else y, dtype=np.float64)
+    if len(X) != len(y):
+        raise ValueError(f"X tiene {len(X)} filas y y tiene {len(y)}.")
+    return X, y
+
+def comparar_modelos(modelos: dict, X, y, dates, ventanas=(TRAIN_WINDOW,), test_window=TEST_WINDOW,
+                     gap=GAP, n_jobs=None, hilos_por_proceso=1, devolver_predicciones=False):
+    """
+    Backtesting walk-forward de varios modelos y ventanas de entrenamiento en un pool de procesos.
+
+    X e y se escriben una vez como .npy y cada proceso los abre con memory map, así
+    que no se copian ni se serializan por pliegue; cada modelo se envía una vez por
+    proceso. Cada pliegue entrena una copia nueva del modelo (sklearn.clone), de modo
+    que el resultado no depende del orden ni del proceso en que se ejecute.
+
+    Args:
+        modelos (dict): Nombre -> estimador con fit/predict. Un callable sin `fit`
+            se trata como baseline: recibe la serie y completa y devuelve la
+            predicción de cada fila (p. ej. baseline_ma7).
+        X (pd.DataFrame | np.ndarray): Features, una fila por día.
+        y (pd.Series | np.ndarray): Objetivo.
+        dates (pd.Series): Fecha de cada fila.
+        ventanas (tuple): Tamaños de la ventana de entrenamiento a comparar.
+        n_jobs (int): Procesos. Por defecto, los CPUs disponibles; 1 ejecuta en secuencia.
+        hilos_por_proceso (int): n_jobs de cada estimador dentro de un proceso (None no lo cambia).
+        devolver_predicciones (bool): Si también se devuelven las predicciones por pliegue.
+
+    Returns:
+        pd.DataFrame: Una fila por modelo, ventana y pliegue con fechas, métricas y
+        tiempos de fit/predict (y la columna 'pred' si se pidió).
+    """
+    X, y = como_arreglos(X, y)
+    dates = pd.Series(pd.to_datetime(np.asarray(dates)))
+    if n_jobs is None:
+        n_jobs = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+
+    entrenables = {nombre: m for nombre, m in modelos.items() if hasattr(m, 'fit')}
+    tareas = [(nombre, w, i, p) for nombre in modelos for w in ventanas
+              for i, p in enumerate(pliegues(len(X), w, test_window, gap))]
+
+    resultados = {}
+    # Baselines: una sola predicción sobre toda la serie, evaluada por pliegue
+    for nombre, baseline in modelos.items():
+        if nombre in entrenables:
+            continue
+        pred_total = np.asarray(baseline(pd.Series(y)), dtype=np.float64)
+        for _, w, i, (_, _, gap_end, test_end) in (t for t in tareas if t[0] == nombre):
+            pred = pred_total[gap_end:test_end]
+            resultados[(nombre, w, i)] = ({**metricas(y[gap_end:test_end], pred), 'fit_s': 0.0, 'predict_s': 0.0}, pred)
+
+    pendientes = [t for t in tareas if t[0] in entrenables]
+    if n_jobs == 1 or len(pendientes) <= 1:
+        for nombre, w, i, p in pendientes:
+            resultados[(nombre, w, i)] = evaluar_pliegue(entrenables[nombre], X, y, p, hilos_por_proceso)
+    elif pendientes:
+        directorio = tempfile.mkdtemp(prefix='backtest_')
+        try:
+            ruta_x, ruta_y = Path(directorio) / 'X.npy', Path(directorio) / 'y.npy'
+            np.save(ruta_x, X)
+            np.save(ruta_y, y)
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(pendientes)), initializer=iniciar_proceso,
+                                     initargs=(ruta_x, ruta_y, entrenables, hilos_por_proceso)) as pool:
+                # Los pliegues más caros (ventanas grandes) primero
+                orden = sorted(pendientes, key=lambda t: -t[1])
+                futuros = {(nombre, w, i): pool.submit(_tarea, nombre, p) for nombre, w, i, p in orden}
+                for clave, futuro in futuros.items():
+                    resultados[clave] = futuro.result()
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    filas = []
+    for nombre, w, i, (start, train_end, gap_end, test_end) in tareas:
+        res, pred = resultados[(nombre, w, i)]
+        fila = {
+            'model': nombre, 'train_window': w, 'fold': i,
+            'train_start': dates.iloc[start], 'train_end': dates.iloc[train_end - 1],
+            'test_start': dates.iloc[gap_end], 'test_end': dates.iloc[test_end - 1],
+            **res,
+        }
+        if devolver_predicciones:
+            fila['pred'] = pred
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+def walk_forward_backtest(model, X, y, dates, train_window=TRAIN_WINDOW, test_window=TEST_WINDOW,
+                          gap=GAP, n_jobs=None):
+    """
+    Misma interfaz y columnas que la función del notebook, con los pliegues en paralelo
+    y los tiempos de fit/predict por pliegue.
+    """
+    resultado = comparar_modelos({'modelo': model}, X, y, dates, (train_window,), test_window, gap, n_jobs)
+    return resultado.drop(columns=['model', 'train_window', 'fold'])
+
+def resumen(resultados: pd.DataFrame) -> pd.DataFrame:
+    """Promedio de métricas y tiempo total por modelo y ventana."""
+    return resultados.groupby(['model', 'train_window']).agg(
+        **{m: (m, 'mean') for m in COLUMNAS_METRICAS},
+        fit_s=('fit_s', 'sum'), predict_s=('predict_s', 'sum'), pliegues=('fold', 'count'),
+    ).sort_values('MAE')
+
+# --- Baselines ---
+
+def baseline_naive(y_series):
+    return y_series.shift(1)
+
+def baseline_ma7(y_series):
+    return y_series.shift(1).rolling(7, min_periods=1).mean()
+
+# --- Referencia ---
+
+def _walk_forward_secuencial(model, X, y, dates, train_window=TRAIN_WINDOW, test_window=TEST_WINDOW, gap=GAP):
+    """Versión del notebook: pliegues en secuencia reutilizando el mismo modelo."""
+    results = []
+    start = 0
+    while True:
+        train_end = start + train_window
+        gap_end = train_end + gap
+        test_end = gap_end + test_window
+        if test_end > len(X):
+            break
+        Xtr, ytr = X.iloc[start:train_end], y.iloc[start:train_end]
+        Xte, yte = X.iloc[gap_end:test_end], y.iloc[gap_end:test_end]
+        dte = dates.iloc[gap_end:test_end]
+        model.fit(Xtr, ytr)
+        pred = model.predict(Xte)
+        results.append({
+            'train_start': dates.iloc[start],
+            'train_end': dates.iloc[train_end - 1],
+            'test_start': dte.iloc[0],
+            'test_end': dte.iloc[-1],
+            **metricas(yte, pred),
+        })
+        start += test_window
+    return pd.DataFrame(results)
+
+# --- Benchmark ---
+
+def _datos_sinteticos(dias=900, features=57, semilla=0):
+    rng = np.random.default_rng(semilla)
+    X = pd.DataFrame(rng.normal(size=(dias, features)), columns=[f'f{i}' for i in range(features)])
+    tasa = np.exp(1.2 + 0.3 * X['f0'] - 0.2 * X['f1'] + 0.1 * np.sin(np.arange(dias) / 7))
+    y = pd.Series(rng.poisson(tasa).astype(np.float64))
+    dates = pd.Series(pd.date_range('2022-01-01', periods=dias))
+    return X, y, dates
+
+def benchmark_backtest(dias=900, n_jobs=None):
+    """Compara el backtesting secuencial del notebook con el pool de procesos."""
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import PoissonRegressor
+
+    X, y, dates = _datos_sinteticos(dias)
+    modelos = {
+        'Poisson': PoissonRegressor(alpha=0.1, max_iter=500),
+        'RF': RandomForestRegressor(n_estimators=100, max_depth=6, random_state=42, n_jobs=1),
+    }
+    ventanas = (90, 120)
+
+    inicio = time.perf_counter()
+    secuencial = {(nombre, w): _walk_forward_secuencial(m, X, y, dates, w)
+                  for nombre, m in modelos.items() for w in ventanas}
+    t_secuencial = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    paralelo = comparar_modelos({**modelos, 'MA7': baseline_ma7}, X, y, dates, ventanas, n_jobs=n_jobs)
+    t_paralelo = time.perf_counter() - inicio
+
+    for (nombre, w), esperado in secuencial.items():
+        obtenido = paralelo[(paralelo['model'] == nombre) & (paralelo['train_window'] == w)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(obtenido[esperado.columns], esperado, check_exact=False, rtol=1e-10)
+    # Mismo resultado en una segunda corrida
+    repetido = comparar_modelos({**modelos, 'MA7': baseline_ma7}, X, y, dates, ventanas, n_jobs=n_jobs)
+    pd.testing.assert_frame_equal(repetido[COLUMNAS_METRICAS], paralelo[COLUMNAS_METRICAS])
+
+    procesos = n_jobs or len(os.sched_getaffinity(0))
+    print(f"{dias} días, {len(paralelo)} pliegues (2 modelos + MA7, ventanas {ventanas})")
+    print(f"Secuencial (notebook):  {t_secuencial:6.2f} s")
+    print(f"Pool de {procesos} procesos:    {t_paralelo:6.2f} s")
+    print(resumen(paralelo).round(3).to_string())
+    print("Métricas idénticas a la versión secuencial y entre corridas.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtesting walk-forward en paralelo.")
+    parser.add_argument("--dias", type=int, default=900)
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args()
+    benchmark_backtest(args.dias, args.procesos)
@@ -0,0 +1,275 @@
+# utils/bosque_compilado.py
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from registro_modelos import RegistroModelos
+
+# --- Constantes y Configuración ---
+
+SUFIJO = '_compilado'
+
+# Filas por bloque al recorrer: la matriz de nodos actuales es (filas, árboles) y
+# conviene que quepa en caché
+FILAS_POR_BLOQUE = 128
+
+# --- Bosque Compilado ---
+
+class BosqueCompilado:
+    """
+    Bosque de regresión de sklearn (RandomForest, ExtraTrees o un solo árbol)
+    aplanado en arreglos contiguos: los nodos de todos los árboles van uno tras
+    otro y `raices` marca dónde empieza cada árbol.
+
+    Por nodo se guarda la feature (int16/int32), el umbral (float32), los dos hijos
+    (int32), hacia dónde van los NaN y el valor de la hoja (float32). Las hojas
+    apuntan a sí mismas, así que todos los árboles se recorren a la vez durante
+    `profundidad` pasos, sin ramas por fila.
+
+    sklearn compara `float32(x) <= umbral` con el umbral en float64. Para que el
+    recorrido sea idéntico con umbrales float32 se guarda el mayor float32 que no
+    supera el umbral original (redondeo hacia abajo con nextafter): para un x
+    float32, x <= u64 equivale a x <= u32.
+    """
+    def __init__(self, modelo):
+        arboles = [e.tree_ for e in modelo.estimators_] if hasattr(modelo, 'estimators_') else [modelo.tree_]
+        if any(t.n_outputs != 1 for t in arboles):
+            raise ValueError("Solo se compilan bosques de regresión con una salida.")
+        nodos = np.array([t.node_count for t in arboles])
+        inicio = np.concatenate([[0], np.cumsum(nodos)[:-1]])
+        total = int(nodos.sum())
+
+        self.n_features_in_ = int(modelo.n_features_in_)
+        nombres = getattr(modelo, 'feature_names_in_', None)
+        self.feature_names_in_ = None if nombres is None else np.asarray(nombres, dtype=object)
+        self.n_arboles = len(arboles)
+        self.profundidad = max(t.max_depth for t in arboles)
+        self.raices = inicio.astype(np.int32)
+
+        tipo_feature = np.int16 if self.n_features_in_ < np.iinfo(np.int16).max else np.int32
+        self.feature = np.empty(total, dtype=tipo_feature)
+        self.umbral = np.empty(total, dtype=np.float32)
+        self.hijos = np.empty((total, 2), dtype=np.int32)
+        self.nan_izquierda = np.zeros(total, dtype=bool)
+        self.valor = np.empty(total, dtype=np.float32)
+
+        for t, desde in zip(arboles, inicio):
+            hasta = desde + t.node_count
+            hoja = t.children_left < 0
+            propios = np.arange(desde, hasta, dtype=np.int32)
+            self.feature[desde:hasta] = np.where(hoja, 0, t.feature)
+            self.umbral[desde:hasta] = _umbral_float32(np.where(hoja, np.inf, t.threshold))
+            self.hijos[desde:hasta, 0] = np.where(hoja, propios, t.children_left + desde)
+            self.hijos[desde:hasta, 1] = np.where(hoja, propios, t.children_right + desde)
+            if hasattr(t, 'missing_go_to_left'):
+                self.nan_izquierda[desde:hasta] = t.missing_go_to_left.astype(bool)
+            self.valor[desde:hasta] = t.value[:, 0, 0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.raices, self.feature, self.umbral, self.hijos, self.nan_izquierda, self.valor))
+
+    def _matriz(self, X) -> np.ndarray:
+        if hasattr(X, 'columns') and self.feature_names_in_ is not None:
+            X = X[list(self.feature_names_in_)]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X tiene {X.shape[1]} features; el modelo espera {self.n_features_in_}.")
+        return np.ascontiguousarray(X)
+
+    def _hojas(self, X: np.ndarray) -> np.ndarray:
+        """Índice global de la hoja de cada fila en cada árbol, (filas, árboles)."""
+        n, m = X.shape
+        plano = X.ravel()
+        base = (np.arange(n, dtype=np.int32) * m)[:, None]
+        nodo = np.broadcast_to(self.raices, (n, self.n_arboles)).copy()
+        hijos = self.hijos.ravel()
+        hay_nan = np.isnan(plano).any()
+        for _ in range(self.profundidad):
+            x = plano[base + self.feature[nodo]]
+            derecha = x > self.umbral[nodo]
+            if hay_nan:
+                derecha |= np.isnan(x) & ~self.nan_izquierda[nodo]
+            nodo = hijos[2 * nodo + derecha]
+        return nodo
+
+    def apply(self, X) -> np.ndarray:
+        """Hoja de cada fila en cada árbol, con la numeración de sklearn (como `apply`)."""
+        X = self._matriz(X)
+        bloques = [self._hojas(X[i:i + FILAS_POR_BLOQUE]) for i in range(0, len(X), FILAS_POR_BLOQUE)]
+        hojas = np.concatenate(bloques) if bloques else np.empty((0, self.n_arboles), dtype=np.int32)
+        return hojas - self.raices
+
+    def predict(self, X) -> np.ndarray:
+        """Promedio de los árboles, como RandomForestRegressor.predict."""
+        X = self._matriz(X)
+        salida = np.empty(len(X), dtype=np.float64)
+        for i in range(0, len(X), FILAS_POR_BLOQUE):
+            hojas = self._hojas(X[i:i + FILAS_POR_BLOQUE])
+            salida[i:i + FILAS_POR_BLOQUE] = self.valor[hojas].sum(axis=1, dtype=np.float64) / self.n_arboles
+        return salida
+
+def _umbral_float32(umbral: np.ndarray) -> np.ndarray:
+    """Mayor float32 <= cada umbral float64."""
+    u32 = umbral.astype(np.float32)
+    arriba = u32.astype(np.float64) > umbral
+    u32[arriba] = np.nextafter(u32[arriba], np.float32(-np.inf))
+    return u32
+
+def es_bosque(modelo) -> bool:
+    """
+    Si el modelo es un árbol o bosque de regresión de sklearn, ya entrenado y con una
+    salida, que se puede compilar. Otros ensambles de árboles (p. ej. gradient
+    boosting) no promedian sus árboles y quedan fuera.
+    """
+    from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+    from sklearn.tree import DecisionTreeRegressor
+
+    if isinstance(modelo, (RandomForestRegressor, ExtraTreesRegressor)):
+        entrenado = len(getattr(modelo, 'estimators_', [])) > 0
+    elif isinstance(modelo, DecisionTreeRegressor):
+        entrenado = hasattr(modelo, 'tree_')
+    else:
+        return False
+    return entrenado and getattr(modelo, 'n_outputs_', 1) == 1
+
+# --- Exportación ---
+
+def ruta_compilada(ruta_modelo) -> Path:
+    ruta_modelo = Path(ruta_modelo)
+    return ruta_modelo.with_name(f"{ruta_modelo.stem}{SUFIJO}.joblib")
+
+def exportar(registro: RegistroModelos = None, forzar=False) -> list:
+    """
+    Compila los bosques del registro que no tienen versión compilada (o cuyo modelo
+    cambió) y la guarda junto al original como `<nombre>_compilado.joblib`, sin
+    compresión para poder abrirla con mmap_mode='r'.
+
+    Returns:
+        list: Rutas escritas.
+    """
+    import joblib
+
+    registro = registro or RegistroModelos()
+    escritas = []
+    for corrida in registro.corridas.values():
+        if 'modelo' not in corrida['artefactos']:
+            continue
+        sha = corrida['artefactos']['modelo']['sha256']
+        destino = ruta_compilada(registro.ruta(corrida))
+        if not forzar and 'compilado' in corrida['artefactos']:
+            previo = registro.cargar(corrida, 'compilado')
+            if getattr(previo, 'sha256_origen', None) == sha:
+                continue
+        modelo = registro.cargar(corrida, compilado=False)
+        if not es_bosque(modelo):
+            continue
+        bosque = BosqueCompilado(modelo)
+        bosque.sha256_origen = sha
+        temporal = destino.with_suffix('.joblib.tmp')
+        joblib.dump(bosque, temporal)
+        temporal.replace(destino)
+        escritas.append(destino)
+        print(f"{registro.ruta(corrida).name} -> {destino.name} ({bosque.nbytes / 1e6:.2f} MB de nodos)")
+    if escritas:
+        registro.actualizar()
+    return escritas
+
+# --- Bloque de Ejecución ---
+
+def main(forzar=False):
+    escritas = exportar(forzar=forzar)
+    if not escritas:
+        print("Todas las versiones compiladas están al día.")
+
+# --- Benchmark ---
+
+def benchmark_bosque(repeticiones=200):
+    """
+    Compara, para cada bosque de modelos/, sklearn contra la versión compilada:
+    hojas y predicciones, tamaño del archivo, tiempo de carga y latencia por lote.
+    """
+    import tempfile
+    import warnings
+
+    import joblib
+    import pandas as pd
+
+    warnings.filterwarnings('ignore')
+    registro = RegistroModelos()
+    vistos = set()
+    for corrida in sorted(registro.corridas.values(), key=lambda c: c['id']):
+        if 'modelo' not in corrida['artefactos'] or corrida['artefactos']['modelo']['sha256'] in vistos:
+            continue
+        vistos.add(corrida['artefactos']['modelo']['sha256'])
+        ruta = registro.ruta(corrida)
+        modelo = joblib.load(ruta)
+        if not es_bosque(modelo):
+            continue
+        modelo.set_params(n_jobs=1)
+        bosque = BosqueCompilado(modelo)
+
+        # Filas con la escala del entrenamiento (umbrales) y algunos NaN
+        rng = np.random.default_rng(0)
+        umbrales = np.concatenate([e.tree_.threshold[e.tree_.children_left >= 0] for e in modelo.estimators_])
+        features = np.concatenate([e.tree_.feature[e.tree_.children_left >= 0] for e in modelo.estimators_])
+        X = np.empty((5000, modelo.n_features_in_))
+        for j in range(modelo.n_features_in_):
+            propios = umbrales[features == j]
+            X[:, j] = rng.choice(propios, len(X)) if len(propios) else rng.normal(size=len(X))
+        X += rng.normal(scale=1e-3, size=X.shape) * (rng.random(X.shape) < 0.5)
+        X[rng.random(X.shape) < 0.01] = np.nan
+        X = pd.DataFrame(X, columns=getattr(modelo, 'feature_names_in_', None))
+
+        np.testing.assert_array_equal(bosque.apply(X), modelo.apply(X))
+        diferencia = np.abs(bosque.predict(X) - modelo.predict(X)).max()
+        assert diferencia < 1e-5, diferencia
+
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta_bosque = Path(tmp) / 'bosque.joblib'
+            joblib.dump(bosque, ruta_bosque)
+
+            def medir_carga(funcion, n=5):
+                inicio = time.perf_counter()
+                for _ in range(n):
+                    funcion()
+                return (time.perf_counter() - inicio) / n
+
+            t_carga_sk = medir_carga(lambda: joblib.load(ruta))
+            t_carga_bosque = medir_carga(lambda: joblib.load(ruta_bosque, mmap_mode='r'))
+            tamaño = ruta_bosque.stat().st_size
+
+        print(f"\n{ruta.name}: {bosque.n_arboles} árboles, {len(bosque.valor)} nodos, profundidad {bosque.profundidad}")
+        print(f"  Hojas idénticas a sklearn; diferencia máxima en predicción {diferencia:.1e}")
+        print(f"  Archivo: {ruta.stat().st_size / 1e6:.2f} MB (sklearn) vs {tamaño / 1e6:.2f} MB (compilado)")
+        print(f"  Carga:   {t_carga_sk * 1000:.1f} ms (sklearn) vs {t_carga_bosque * 1000:.2f} ms (compilado, mmap)")
+        for filas in (1, 8, 64, 1000):
+            lote = X.iloc[:filas]
+            n = max(5, repeticiones // filas) if filas > 1 else repeticiones // 4
+            tiempos = {}
+            for nombre, funcion in (('sklearn', modelo.predict), ('compilado', bosque.predict)):
+                muestras = []
+                for _ in range(n):
+                    inicio = time.perf_counter()
+                    funcion(lote)
+                    muestras.append(time.perf_counter() - inicio)
+                tiempos[nombre] = np.median(muestras) * 1000
+            print(f"  {filas:4d} filas: sklearn {tiempos['sklearn']:8.2f} ms, compilado {tiempos['compilado']:7.3f} ms "
+                  f"({tiempos['sklearn'] / tiempos['compilado']:.0f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compila los bosques de modelos/ en arreglos contiguos.")
+    parser.add_argument("--forzar", action="store_true", help="Vuelve a compilar aunque no haya cambios.")
+    parser.add_argument("--benchmark", action="store_true", help="Compara sklearn con la versión compilada.")
+    args = parser.parse_args()
+    # Se usa el módulo importado y no __main__ para que los bosques guardados
+    # apunten a bosque_compilado.BosqueCompilado y cualquier script pueda cargarlos
+    import bosque_compilado
+    if args.benchmark:
+        bosque_compilado.benchmark_bosque()
+    else:
+        bosque_compilado.main(args.forzar)
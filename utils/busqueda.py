@@ -0,0 +1,380 @@
+# utils/busqueda.py
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import almacen
+import backtest
+from backtest import COLUMNAS_METRICAS, GAP, TEST_WINDOW, TRAIN_WINDOW
+
+# --- Constantes y Configuración ---
+
+# Resultados por pliegue de todas las búsquedas. La clave de cada fila es un hash de
+# los datos que ve el pliegue (filas y columnas), la configuración de ventanas y el
+# estimador con sus parámetros: si algo de eso cambia, la clave cambia y el pliegue
+# se vuelve a calcular; si no, se toma de aquí. Como la huella es la de las filas del
+# pliegue, agregar días al dataset solo invalida los pliegues nuevos.
+RUTA_CACHE = almacen.DIR_DATOS / 'cache' / 'busqueda_pliegues.feather'
+COLUMNAS_CACHE = COLUMNAS_METRICAS + ['fit_s', 'predict_s']
+
+# Parámetros que no cambian las predicciones y no entran en la clave
+PARAMS_IGNORADOS = {'n_jobs', 'verbose', 'verbosity'}
+
+# Successive halving: en cada ronda sobrevive 1/ETA de los candidatos y se multiplica
+# por ETA el número de pliegues; la primera ronda usa al menos MIN_PLIEGUES.
+ETA = 3
+MIN_PLIEGUES = 6
+
+# --- Caché de Pliegues ---
+
+class CachePliegues:
+    """Métricas por pliegue en un archivo Feather, indexadas por clave."""
+    def __init__(self, ruta=RUTA_CACHE):
+        self.ruta = Path(ruta) if ruta is not None else None
+        self.resultados = {}
+        self.nuevos = 0
+        if self.ruta is not None and self.ruta.exists():
+            tabla = feather.read_feather(self.ruta)
+            self.resultados = tabla.set_index('clave')[COLUMNAS_CACHE].to_dict('index')
+
+    def __contains__(self, clave):
+        return clave in self.resultados
+
+    def __getitem__(self, clave):
+        return self.resultados[clave]
+
+    def agregar(self, clave, resultado: dict):
+        self.resultados[clave] = {c: float(resultado[c]) for c in COLUMNAS_CACHE}
+        self.nuevos += 1
+
+    def guardar(self):
+        """Escribe la caché de forma atómica si hay resultados nuevos."""
+        if self.ruta is None or self.nuevos == 0:
+            return
+        tabla = pd.DataFrame.from_dict(self.resultados, orient='index').rename_axis('clave').reset_index()
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta.with_suffix(self.ruta.suffix + '.tmp')
+        feather.write_feather(tabla, temporal, compression='uncompressed')
+        os.replace(temporal, self.ruta)
+        self.nuevos = 0
+
+# --- Claves ---
+
+def _hash(*partes) -> str:
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(parte if isinstance(parte, bytes) else str(parte).encode())
+        h.update(b'\x00')
+    return h.hexdigest()
+
+def firma_estimador(estimador) -> str:
+    """Clase, versión de sklearn y parámetros (sin n_jobs/verbose) del estimador."""
+    import sklearn
+    params = {k: v for k, v in estimador.get_params(deep=False).items() if k not in PARAMS_IGNORADOS}
+    clase = f"{type(estimador).__module__}.{type(estimador).__qualname__}"
+    return f"{clase}@{sklearn.__version__}:" + json.dumps(params, sort_keys=True, default=repr)
+
+def huella_datos(X, y, columnas, inicio, fin) -> str:
+    """Hash de las filas [inicio, fin) de las columnas dadas de X y de y."""
+    bloque = np.ascontiguousarray(X[inicio:fin][:, columnas])
+    return _hash(bloque.shape, bloque.tobytes(), np.ascontiguousarray(y[inicio:fin]).tobytes())
+
+# --- Candidatos ---
+
+def _texto_params(params: dict) -> str:
+    return ','.join(f"{k}={v}" for k, v in sorted(params.items()))
+
+def candidatos(modelos: dict, grillas: dict = None, conjuntos: dict = None, ventanas=(TRAIN_WINDOW,),
+               n_iter=None, semilla=42) -> list:
+    """
+    Producto modelos × parámetros × conjuntos de features × ventanas, como los ciclos
+    de experimentación del notebook.
+
+    Args:
+        modelos (dict): Nombre -> estimador base.
+        grillas (dict): Nombre -> grilla de parámetros (formato de GridSearchCV). Los
+            modelos sin grilla se usan con sus parámetros actuales.
+        conjuntos (dict): Nombre -> columnas (nombres o posiciones); None usa todas.
+            Por defecto, un solo conjunto 'todas'.
+        ventanas (tuple): Tamaños de la ventana de entrenamiento.
+        n_iter (int): Si se da, se muestrean hasta n_iter combinaciones por modelo
+            (como RandomizedSearchCV) en lugar de la grilla completa.
+        semilla (int): Semilla del muestreo.
+
+    Returns:
+        list: Un dict por candidato con 'nombre', 'modelo', 'params', 'features',
+        'columnas', 'train_window' y 'estimador' (ya con los parámetros).
+    """
+    from sklearn.base import clone
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+    grillas = grillas or {}
+    conjuntos = conjuntos or {'todas': None}
+    resultado = []
+    for modelo, base in modelos.items():
+        grilla = grillas.get(modelo) or {}
+        if n_iter is not None and grilla:
+            combinaciones = list(ParameterSampler(grilla, n_iter=min(n_iter, len(ParameterGrid(grilla))),
+                                                  random_state=semilla))
+        else:
+            combinaciones = list(ParameterGrid(grilla))
+        for params in combinaciones:
+            for features, columnas in conjuntos.items():
+                for w in ventanas:
+                    resultado.append({
+                        'nombre': f"{modelo}[{_texto_params(params)}]|{features}|w{w}",
+                        'modelo': modelo, 'params': params, 'features': features,
+                        'columnas': columnas, 'train_window': w,
+                        'estimador': clone(base).set_params(**params),
+                    })
+    return resultado
+
+def _resolver_columnas(columnas, nombres, total):
+    if columnas is None:
+        return np.arange(total)
+    columnas = list(columnas)
+    if nombres is not None and columnas and not isinstance(columnas[0], (int, np.integer)):
+        posiciones = pd.Index(nombres).get_indexer(columnas)
+        if (posiciones < 0).any():
+            faltantes = [c for c, p in zip(columnas, posiciones) if p < 0]
+            raise KeyError(f"Columnas que no están en X: {faltantes}")
+        return posiciones
+    return np.asarray(columnas, dtype=np.int64)
+
+# --- Evaluación ---
+
+def _evaluar_columnas(estimador, X, y, pliegue, columnas, hilos=None):
+    """Evalúa un pliegue con solo las filas y columnas que usa."""
+    start, train_end, gap_end, test_end = pliegue
+    bloque = np.ascontiguousarray(X[start:test_end][:, columnas])
+    local = (0, train_end - start, gap_end - start, test_end - start)
+    resultado, _ = backtest.evaluar_pliegue(estimador, bloque, np.asarray(y[start:test_end]), local, hilos)
+    return resultado
+
+def _tarea_columnas(indice, pliegue, columnas):
+    datos = backtest.DATOS_PROCESO
+    return _evaluar_columnas(datos['modelos'][indice], datos['X'], datos['y'], pliegue, columnas, datos['hilos'])
+
+def _subconjunto(n_pliegues: int, paso: int) -> list:
+    """Uno de cada `paso` pliegues, contando desde el más reciente (anidados al bajar el paso)."""
+    return [i for i in range(n_pliegues) if (n_pliegues - 1 - i) % paso == 0]
+
+def _pasos(n_pliegues: int, eta: int, min_pliegues: int) -> list:
+    k = 0
+    while math.ceil(n_pliegues / eta ** (k + 1)) >= min_pliegues:
+        k += 1
+    return [eta ** i for i in range(k, -1, -1)]
+
+# --- Búsqueda ---
+
+def busqueda_halving(cands: list, X, y, test_window=TEST_WINDOW, gap=GAP, eta=ETA,
+                     min_pliegues=MIN_PLIEGUES, ruta_cache=RUTA_CACHE, n_jobs=None, hilos_por_proceso=1):
+    """
+    Successive halving sobre pliegues walk-forward, con caché de pliegues en disco.
+
+    Todos los candidatos se evalúan primero en un subconjunto espaciado de pliegues
+    (siempre incluye el más reciente); sobrevive el 1/eta con menor MAE promedio, que
+    pasa a un subconjunto eta veces más denso, hasta evaluar a los finalistas en todos
+    los pliegues. Los subconjuntos están anidados, así que nada se calcula dos veces,
+    y cada pliegue ya calculado en una corrida anterior se lee de la caché.
+
+    Args:
+        cands (list): Candidatos de `candidatos()`.
+        X (pd.DataFrame | np.ndarray): Features, una fila por día.
+        y (pd.Series | np.ndarray): Objetivo.
+        eta (int): Factor de reducción por ronda.
+        min_pliegues (int): Pliegues mínimos de la primera ronda.
+        ruta_cache (Path): Archivo de la caché; None para no usar disco.
+        n_jobs (int): Procesos para los pliegues pendientes (1 = en secuencia).
+        hilos_por_proceso (int): n_jobs de cada estimador dentro de un proceso.
+
+    Returns:
+        tuple: (ranking, pliegues). `ranking` tiene una fila por candidato con la
+        ronda alcanzada, los pliegues evaluados y el promedio de métricas, ordenado
+        por ronda y MAE; `pliegues` tiene una fila por candidato y pliegue evaluado,
+        con la columna 'cache' indicando si venía de una corrida anterior.
+    """
+    nombres = list(X.columns) if hasattr(X, 'columns') else None
+    X, y = backtest.como_arreglos(X, y)
+    if n_jobs is None:
+        n_jobs = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    cache = CachePliegues(ruta_cache)
+
+    columnas = [_resolver_columnas(c['columnas'], nombres, X.shape[1]) for c in cands]
+    claves_cand = [_hash(firma_estimador(c['estimador']), columnas[j].tolist(),
+                         nombres and [nombres[k] for k in columnas[j]], c['train_window'], test_window, gap)
+                   for j, c in enumerate(cands)]
+    folds = {w: backtest.pliegues(len(X), w, test_window, gap) for w in {c['train_window'] for c in cands}}
+    if not cands or min(len(f) for f in folds.values()) == 0:
+        raise ValueError("No hay pliegues suficientes para las ventanas pedidas.")
+    pasos = _pasos(min(len(f) for f in folds.values()), eta, min_pliegues)
+
+    huellas = {}
+    def clave_pliegue(j, i):
+        w = cands[j]['train_window']
+        id_datos = (columnas[j].tobytes(), w, i)
+        if id_datos not in huellas:
+            start, _, _, test_end = folds[w][i]
+            huellas[id_datos] = huella_datos(X, y, columnas[j], start, test_end)
+        return _hash(claves_cand[j], huellas[id_datos])
+
+    pool, directorio = None, None
+    def ejecutar(pendientes):
+        nonlocal pool, directorio
+        if n_jobs == 1 or len(pendientes) <= 1:
+            return [_evaluar_columnas(cands[j]['estimador'], X, y, folds[cands[j]['train_window']][i],
+                                      columnas[j], hilos_por_proceso) for j, i in pendientes]
+        if pool is None:
+            directorio = tempfile.mkdtemp(prefix='busqueda_')
+            ruta_x, ruta_y = Path(directorio) / 'X.npy', Path(directorio) / 'y.npy'
+            np.save(ruta_x, X)
+            np.save(ruta_y, y)
+            estimadores = {j: c['estimador'] for j, c in enumerate(cands)}
+            pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=backtest.iniciar_proceso,
+                                       initargs=(ruta_x, ruta_y, estimadores, hilos_por_proceso))
+        futuros = [pool.submit(_tarea_columnas, j, folds[cands[j]['train_window']][i], columnas[j])
+                   for j, i in pendientes]
+        return [f.result() for f in futuros]
+
+    filas, ronda_final = {}, {}
+    vivos = list(range(len(cands)))
+    try:
+        for ronda, paso in enumerate(pasos):
+            subconjuntos = {w: _subconjunto(len(f), paso) for w, f in folds.items()}
+            pendientes, desde_cache = [], 0
+            for j in vivos:
+                for i in subconjuntos[cands[j]['train_window']]:
+                    if (j, i) in filas:
+                        continue
+                    clave = clave_pliegue(j, i)
+                    if clave in cache:
+                        filas[(j, i)] = {**cache[clave], 'cache': True}
+                        desde_cache += 1
+                    else:
+                        pendientes.append((j, i))
+            inicio = time.perf_counter()
+            for (j, i), resultado in zip(pendientes, ejecutar(pendientes)):
+                clave = clave_pliegue(j, i)
+                cache.agregar(clave, resultado)
+                filas[(j, i)] = {**cache[clave], 'cache': False}
+            cache.guardar()
+
+            mae = {j: np.mean([filas[(j, i)]['MAE'] for i in subconjuntos[cands[j]['train_window']]])
+                   for j in vivos}
+            for j in vivos:
+                ronda_final[j] = ronda
+            print(f"Ronda {ronda}: {len(vivos)} candidatos × {len(next(iter(subconjuntos.values())))} pliegues; "
+                  f"{len(pendientes)} calculados en {time.perf_counter() - inicio:.1f} s, {desde_cache} desde caché.")
+            if paso > 1:
+                vivos = sorted(vivos, key=lambda j: mae[j])[:max(1, math.ceil(len(vivos) / eta))]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    detalle = pd.DataFrame([
+        {'candidato': cands[j]['nombre'], 'modelo': cands[j]['modelo'], 'features': cands[j]['features'],
+         'train_window': cands[j]['train_window'], 'fold': i, **res}
+        for (j, i), res in sorted(filas.items())
+    ])
+    ranking = detalle.groupby('candidato', sort=False).agg(
+        **{m: (m, 'mean') for m in COLUMNAS_METRICAS},
+        fit_s=('fit_s', 'sum'), pliegues=('fold', 'count'),
+    )
+    info = pd.DataFrame([{'candidato': c['nombre'], 'modelo': c['modelo'], 'features': c['features'],
+                          'train_window': c['train_window'], 'params': _texto_params(c['params']),
+                          'ronda': ronda_final[j]} for j, c in enumerate(cands)]).set_index('candidato')
+    ranking = info.join(ranking).sort_values(['ronda', 'MAE'], ascending=[False, True]).reset_index()
+    return ranking, detalle
+
+# --- Referencia ---
+
+def _busqueda_exhaustiva(cands: list, X: pd.DataFrame, y: pd.Series, dates, test_window=TEST_WINDOW, gap=GAP):
+    """Versión del notebook: cada candidato en todos los pliegues, en secuencia y sin caché."""
+    from sklearn.base import clone
+
+    filas = []
+    for c in cands:
+        Xc = X if c['columnas'] is None else X[list(c['columnas'])]
+        res = backtest._walk_forward_secuencial(clone(c['estimador']), Xc, y, dates, c['train_window'],
+                                                test_window, gap)
+        filas.append({'candidato': c['nombre'], **res[COLUMNAS_METRICAS].mean().to_dict()})
+    return pd.DataFrame(filas).sort_values('MAE').reset_index(drop=True)
+
+# --- Benchmark ---
+
+def benchmark_busqueda(dias=600, n_jobs=1):
+    """Compara la búsqueda exhaustiva con successive halving en frío, repetida y con un candidato nuevo."""
+    import warnings
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.linear_model import PoissonRegressor, Ridge
+
+    warnings.filterwarnings('ignore')
+    X, y, dates = backtest._datos_sinteticos(dias)
+    modelos = {
+        'RF': RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=1),
+        'Ridge': Ridge(),
+        'Poisson': PoissonRegressor(max_iter=500),
+    }
+    grillas = {
+        'RF': {'max_depth': [4, 8, None], 'min_samples_leaf': [1, 5]},
+        'Ridge': {'alpha': [0.1, 1.0, 10.0]},
+        'Poisson': {'alpha': [0.01, 0.1, 1.0]},
+    }
+    conjuntos = {'todas': None, 'top_20': list(X.columns[:20]), 'top_10': list(X.columns[:10])}
+    cands = candidatos(modelos, grillas, conjuntos)
+
+    inicio = time.perf_counter()
+    exhaustiva = _busqueda_exhaustiva(cands, X, y, dates)
+    t_exhaustiva = time.perf_counter() - inicio
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(tmp) / 'pliegues.feather'
+        inicio = time.perf_counter()
+        ranking, detalle = busqueda_halving(cands, X, y, ruta_cache=ruta, n_jobs=n_jobs)
+        t_halving = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        _, repetido = busqueda_halving(cands, X, y, ruta_cache=ruta, n_jobs=n_jobs)
+        t_repetido = time.perf_counter() - inicio
+        assert repetido['cache'].all()
+
+        extra = candidatos({'Ridge': Ridge()}, {'Ridge': {'alpha': [3.0]}}, conjuntos)
+        inicio = time.perf_counter()
+        _, ampliado = busqueda_halving(cands + extra, X, y, ruta_cache=ruta, n_jobs=n_jobs)
+        t_ampliado = time.perf_counter() - inicio
+
+    # Los finalistas se evaluaron en todos los pliegues: mismas métricas que el notebook
+    finalistas = ranking[ranking['ronda'] == ranking['ronda'].max()].set_index('candidato')
+    esperado = exhaustiva.set_index('candidato').loc[finalistas.index]
+    pd.testing.assert_frame_equal(finalistas[COLUMNAS_METRICAS], esperado[COLUMNAS_METRICAS],
+                                  check_exact=False, rtol=1e-10)
+    posicion = exhaustiva.index[exhaustiva['candidato'] == ranking['candidato'].iloc[0]][0] + 1
+
+    total = len(cands) * len(backtest.pliegues(dias))
+    print(f"\n{dias} días, {len(cands)} candidatos, {total} pliegues en la búsqueda exhaustiva")
+    print(f"Exhaustiva (notebook):        {t_exhaustiva:6.2f} s, {total} ajustes")
+    print(f"Halving, caché vacía:         {t_halving:6.2f} s, {len(detalle)} ajustes")
+    print(f"Halving, misma búsqueda:      {t_repetido:6.2f} s, 0 ajustes")
+    print(f"Halving, +{len(extra)} candidatos:        {t_ampliado:6.2f} s, {(~ampliado['cache']).sum()} ajustes")
+    print(f"Ganador: {ranking['candidato'].iloc[0]} (MAE {ranking['MAE'].iloc[0]:.4f}), "
+          f"puesto {posicion} de {len(exhaustiva)} en la búsqueda exhaustiva.")
+    print("Métricas de los finalistas idénticas a la búsqueda exhaustiva.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Búsqueda de modelos con successive halving y caché de pliegues.")
+    parser.add_argument("--dias", type=int, default=600)
+    parser.add_argument("--procesos", type=int, default=1)
+    args = parser.parse_args()
+    benchmark_busqueda(args.dias, args.procesos)
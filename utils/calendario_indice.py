@@ -0,0 +1,221 @@
+# utils/calendario_indice.py
+import argparse
+import datetime as dt
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from get_dias_pago import obtener_festivos_mexico, marcar_dias_pago
+
+# --- Constantes y Configuración ---
+
+# Años extra que se cubren alrededor del rango consultado, para que "días hasta" y
+# "días desde" encuentren la fecha del año anterior o siguiente.
+MARGEN_AÑOS = 1
+
+# Tipo de fecha especial -> columna con su bandera (mismos nombres que el calendario
+# y los notebooks)
+BANDERAS = {'festivo': 'es_festivo', 'pago': 'es_dia_pago', 'evento': 'has_event'}
+
+# --- Consultas sobre Fechas Ordenadas ---
+
+def _a_dias(fechas) -> np.ndarray:
+    """Convierte fechas (strings, datetimes, Series o índices) a datetime64[D]."""
+    return pd.DatetimeIndex(pd.to_datetime(fechas)).values.astype('datetime64[D]')
+
+def dias_desde(fechas: np.ndarray, marcas: np.ndarray) -> np.ndarray:
+    """
+    Días desde la marca más reciente (incluida la del mismo día) para cada fecha.
+
+    Args:
+        fechas (np.ndarray): Fechas consultadas (datetime64[D]), en cualquier orden.
+        marcas (np.ndarray): Fechas de los eventos, ordenadas y sin repetir.
+
+    Returns:
+        np.ndarray: float64, NaN si no hay una marca anterior.
+    """
+    idx = np.searchsorted(marcas, fechas, side='right') - 1
+    hay = idx >= 0
+    resultado = np.full(len(fechas), np.nan)
+    resultado[hay] = (fechas[hay] - marcas[idx[hay]]).astype(np.int64)
+    return resultado
+
+def dias_hasta(fechas: np.ndarray, marcas: np.ndarray) -> np.ndarray:
+    """Días hasta la próxima marca (0 si es el mismo día); NaN si no hay una posterior."""
+    idx = np.searchsorted(marcas, fechas, side='left')
+    hay = idx < len(marcas)
+    resultado = np.full(len(fechas), np.nan)
+    resultado[hay] = (marcas[idx[hay]] - fechas[hay]).astype(np.int64)
+    return resultado
+
+# --- Índice de Calendario ---
+
+def cargar_eventos(path, columna_fecha='date', columna_bandera=None) -> np.ndarray:
+    """
+    Lee un CSV de eventos y devuelve sus fechas.
+
+    Las fechas pueden venir como 'dd/mm/aaaa' o 'aaaa-mm-dd'. Las filas con fecha
+    inválida se descartan.
+
+    Args:
+        path (Path): Ruta del CSV.
+        columna_fecha (str): Columna con la fecha del evento.
+        columna_bandera (str): Si se indica, solo cuentan las filas con valor distinto de 0.
+
+    Returns:
+        np.ndarray: Fechas datetime64[D] ordenadas y sin repetir.
+    """
+    df = pd.read_csv(path)
+    # 'mixed' interpreta cada fila por separado; si no, pandas toma el formato de la primera
+    fechas = pd.to_datetime(df[columna_fecha], dayfirst=True, errors='coerce', format='mixed')
+    if columna_bandera is not None:
+        fechas = fechas[pd.to_numeric(df[columna_bandera], errors='coerce').fillna(0) != 0]
+    invalidas = int(fechas.isna().sum())
+    if invalidas:
+        print(f"{invalidas} fechas de evento inválidas descartadas en {Path(path).name}.", file=sys.stderr)
+    return np.unique(fechas.dropna().values.astype('datetime64[D]'))
+
+class CalendarioIndice:
+    """
+    Índice de fechas especiales (festivos, días de pago y eventos) como arreglos
+    datetime64 ordenados.
+
+    Responde "días desde" y "días hasta" para cualquier vector de fechas con
+    `searchsorted`, en O(n log m). Los festivos y días de pago se generan por años
+    según se necesiten, así que no hay que materializar un calendario por rango.
+    """
+    def __init__(self, eventos=None):
+        """
+        Args:
+            eventos: Fechas de eventos definidos por el usuario (cualquier formato que
+                acepte pd.to_datetime) o un arreglo devuelto por cargar_eventos.
+        """
+        self.eventos = np.unique(_a_dias(eventos)) if eventos is not None else np.array([], dtype='datetime64[D]')
+        self.festivos = np.array([], dtype='datetime64[D]')
+        self.pagos = np.array([], dtype='datetime64[D]')
+        self._años = None  # (primer año, último año) cubiertos
+
+    @classmethod
+    def desde_csv(cls, path, columna_fecha='date', columna_bandera=None):
+        """Crea el índice con los eventos de un CSV (ver cargar_eventos)."""
+        return cls(cargar_eventos(path, columna_fecha, columna_bandera))
+
+    def _cubrir(self, fechas: np.ndarray):
+        """Genera festivos y días de pago para los años de `fechas` más el margen."""
+        if len(fechas) == 0:
+            return
+        primero = int(fechas.min().astype('datetime64[Y]').astype(int)) + 1970 - MARGEN_AÑOS
+        ultimo = int(fechas.max().astype('datetime64[Y]').astype(int)) + 1970 + MARGEN_AÑOS
+        if self._años is not None:
+            if self._años[0] <= primero and ultimo <= self._años[1]:
+                return
+            primero, ultimo = min(primero, self._años[0]), max(ultimo, self._años[1])
+
+        self.festivos = np.array(
+            [f for año in range(primero, ultimo + 1) for f in obtener_festivos_mexico(año)],
+            dtype='datetime64[D]',
+        )
+        dias = pd.Series(pd.date_range(dt.date(primero, 1, 1), dt.date(ultimo, 12, 31)))
+        self.pagos = dias[marcar_dias_pago(dias)].values.astype('datetime64[D]')
+        self._años = (primero, ultimo)
+
+    def _marcas(self, tipo: str) -> np.ndarray:
+        return {'festivo': self.festivos, 'pago': self.pagos, 'evento': self.eventos}[tipo]
+
+    def dias_desde(self, fechas, tipo: str) -> np.ndarray:
+        """Días desde el último 'festivo', 'pago' o 'evento' para cada fecha."""
+        fechas = _a_dias(fechas)
+        self._cubrir(fechas)
+        return dias_desde(fechas, self._marcas(tipo))
+
+    def dias_hasta(self, fechas, tipo: str) -> np.ndarray:
+        """Días hasta el próximo 'festivo', 'pago' o 'evento' para cada fecha."""
+        fechas = _a_dias(fechas)
+        self._cubrir(fechas)
+        return dias_hasta(fechas, self._marcas(tipo))
+
+    def features(self, start_date=None, end_date=None, fechas=None) -> pd.DataFrame:
+        """
+        Genera las características de distancia a fechas especiales.
+
+        Args:
+            start_date, end_date: Rango diario a generar (ambos incluidos).
+            fechas: Alternativamente, un vector de fechas arbitrario.
+
+        Returns:
+            pd.DataFrame: 'date', banderas es_festivo/es_dia_pago/has_event y columnas
+            dias_desde_*/dias_hasta_* (float, NaN si no hay evento antes/después).
+            A diferencia de calendario.csv, dias_desde_pago cuenta desde el último
+            pago aunque sea anterior al rango.
+        """
+        if fechas is None:
+            fechas = pd.date_range(start_date, end_date)
+        dias = _a_dias(fechas)
+        self._cubrir(dias)
+
+        df = pd.DataFrame({'date': dias.astype('datetime64[ns]')})
+        for tipo, bandera in BANDERAS.items():
+            marcas = self._marcas(tipo)
+            desde = dias_desde(dias, marcas)
+            # Distancia 0 hacia atrás = la fecha es un día especial de ese tipo
+            df[bandera] = desde == 0
+            df[f'dias_desde_{tipo}'] = desde
+            df[f'dias_hasta_{tipo}'] = dias_hasta(dias, marcas)
+        df['has_event'] = df['has_event'].astype(int)
+        return df
+
+# --- Benchmark ---
+
+def benchmark_indice(años=50, n_eventos=2000):
+    """Compara las consultas con searchsorted contra un recorrido día por día."""
+    from get_dias_pago import generar_datos_calendario
+
+    inicio_rango, fin_rango = dt.date(2025 - años, 1, 1), dt.date(2024, 12, 31)
+    rng = np.random.default_rng(0)
+    fechas = pd.date_range(inicio_rango, fin_rango)
+    eventos = np.sort(rng.choice(fechas.values, n_eventos, replace=False))
+    indice = CalendarioIndice(eventos)
+
+    inicio = time.perf_counter()
+    feats = indice.features(inicio_rango, fin_rango)
+    t_indice = time.perf_counter() - inicio
+
+    # Referencia: recorrido secuencial de los días del rango
+    inicio = time.perf_counter()
+    es_evento = fechas.isin(eventos)
+    ultimo, esperado = None, []
+    for i, fecha in enumerate(fechas):
+        if es_evento[i]:
+            ultimo = fecha
+        esperado.append(np.nan if ultimo is None else (fecha - ultimo).days)
+    t_bucle = time.perf_counter() - inicio
+    np.testing.assert_array_equal(feats['dias_desde_evento'].values, np.array(esperado, dtype=float))
+
+    # Las banderas coinciden con el calendario materializado
+    calendario = generar_datos_calendario(inicio_rango, fin_rango)
+    assert (feats['es_festivo'].values == calendario['es_festivo'].values).all()
+    assert (feats['es_dia_pago'].values == calendario['es_dia_pago'].values).all()
+    # El rango empieza un día 1 (día de pago), así que dias_desde_pago coincide completo
+    assert (feats['dias_desde_pago'].values == calendario['dias_desde_pago'].values).all()
+
+    print(f"Días: {len(fechas)}, eventos: {n_eventos}")
+    print(f"Índice ordenado (todas las características): {t_indice * 1000:.1f} ms")
+    print(f"Recorrido día por día (solo dias_desde_evento): {t_bucle * 1000:.1f} ms")
+    print("Resultados idénticos.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Características de distancia a festivos, pagos y eventos.")
+    parser.add_argument("--eventos", type=Path, help="CSV de eventos con columna 'date'.")
+    parser.add_argument("--bandera", help="Columna que indica si la fila es un evento.")
+    parser.add_argument("--desde", default=str(dt.date.today() - dt.timedelta(days=30)))
+    parser.add_argument("--hasta", default=str(dt.date.today()))
+    parser.add_argument("--benchmark", action="store_true", help="Verifica y mide las consultas.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_indice()
+    else:
+        indice = CalendarioIndice.desde_csv(args.eventos, columna_bandera=args.bandera) if args.eventos else CalendarioIndice()
+        print(indice.features(args.desde, args.hasta).to_string(index=False))
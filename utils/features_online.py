@@ -0,0 +1,510 @@
+# utils/features_online.py
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import almacen
+
+# --- Constantes y Configuración ---
+
+DIR_MODELOS = Path(__file__).parent.parent / 'modelos'
+RUTA_ESTADO = almacen.DIR_DATOS / 'cache' / 'features_estado.json'
+
+# Definiciones de analisis_alternativo.ipynb (secciones 9 y MEJORAS 3-4)
+COLUMNAS_BASE = ['robos', 'tavg', 'tmin', 'tmax', 'prcp', 'wspd', 'pres', 'precio_dolar',
+                 'año', 'mes', 'dia', 'dia_semana_num', 'quincena', 'dias_desde_pago', 'has_event',
+                 'es_fin_semana', 'es_dia_pago', 'es_festivo', 'despues_festivo', 'antes_festivo',
+                 'is_outlier']
+LAGS_HOMICIDIOS = [1, 2, 3, 7, 14, 28]
+VENTANAS_HOMICIDIOS = [7, 14, 28]
+MIN_PERIODOS_VENTANA = 3
+LAGS_ROBOS = [1, 7, 14]
+VARIABLES_ZSCORE = ['tavg', 'tmin', 'tmax', 'precio_dolar', 'mes']
+VENTANA_ZSCORE = 30
+MIN_PERIODOS_ZSCORE = 7
+EPSILON_ZSCORE = 1e-8
+
+FEATURES_CONOCIDAS = (
+    COLUMNAS_BASE
+    + [f'h_lag_{lag}' for lag in LAGS_HOMICIDIOS]
+    + [f'h_roll_{stat}_{w}' for w in VENTANAS_HOMICIDIOS for stat in ('mean', 'std')]
+    + ['amplitud_termica', 'llueve', 'dolar_ret']
+    + [f'robos_lag_{lag}' for lag in LAGS_ROBOS]
+    + ['dow'] + [f'dow_{d}' for d in range(1, 7)]
+    + ['temp_x_finde', 'dolar_x_evento', 'robos_x_finde', 'lluvia_x_temp', 'lag1_x_finde', 'pago_x_robos']
+    + [f'{var}_zscore' for var in VARIABLES_ZSCORE]
+)
+
+def cargar_lista_features(path=None) -> list:
+    """
+    Lista ordenada de features que espera el modelo mejorado.
+
+    Args:
+        path (Path): metadata_mejorado_*.json. Por defecto, el más reciente de modelos/.
+    """
+    if path is None:
+        candidatos = sorted(DIR_MODELOS.glob('metadata_mejorado_*.json'))
+        if not candidatos:
+            raise FileNotFoundError(2, "No hay metadata_mejorado_*.json", str(DIR_MODELOS))
+        path = candidatos[-1]
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['features']
+
+# --- Ventana Móvil ---
+
+class VentanaMovil:
+    """
+    Buffer circular de tamaño fijo con media y varianza de la ventana (Welford
+    con altas y bajas). Los NaN ocupan su lugar en el buffer pero no cuentan en los
+    momentos, igual que en `rolling` de pandas.
+
+    Cada `tamaño` altas los momentos se recalculan desde el buffer para que el error
+    de redondeo no se acumule; el costo sigue siendo O(1) amortizado por día. Como
+    pandas, se lleva la racha de valores iguales al final para devolver varianza 0
+    exacta en ventanas constantes (p. ej. 'mes').
+    """
+    __slots__ = ('tamaño', 'valores', 'pos', 'altas', 'momentos')
+
+    def __init__(self, tamaño: int):
+        self.tamaño = tamaño
+        self.valores = [math.nan] * tamaño
+        self.pos = 0
+        self.altas = 0
+        # (n, media, m2, racha de valores iguales, último valor válido)
+        self.momentos = (0, 0.0, 0.0, 0, math.nan)
+
+    def _mover(self, x):
+        """Momentos tras agregar x (y sacar el valor más antiguo), sin modificar la ventana."""
+        n, media, m2, racha, ultimo = self.momentos
+        saliente = self.valores[self.pos]
+        if saliente == saliente:
+            if n <= 1:
+                n, media, m2 = 0, 0.0, 0.0
+            else:
+                n -= 1
+                delta = saliente - media
+                media -= delta / n
+                m2 = max(m2 - delta * (saliente - media), 0.0)
+        if x == x:
+            n += 1
+            delta = x - media
+            media += delta / n
+            m2 += delta * (x - media)
+            racha = racha + 1 if x == ultimo else 1
+            ultimo = x
+        return n, media, m2, racha, ultimo
+
+    def agregar(self, x: float):
+        """Agrega un valor (NaN si falta) desplazando el más antiguo."""
+        x = float(x)
+        self.momentos = self._mover(x)
+        self.valores[self.pos] = x
+        self.pos = (self.pos + 1) % self.tamaño
+        self.altas += 1
+        if self.altas % self.tamaño == 0:
+            self._recalcular()
+
+    def _recalcular(self):
+        orden = self.valores[self.pos:] + self.valores[:self.pos]
+        validos = [v for v in orden if v == v]
+        n = len(validos)
+        media = math.fsum(validos) / n if n else 0.0
+        m2 = math.fsum((v - media) ** 2 for v in validos)
+        racha, ultimo = 0, validos[-1] if validos else math.nan
+        for v in reversed(validos):
+            if v != ultimo:
+                break
+            racha += 1
+        self.momentos = (n, media, m2, racha, ultimo)
+
+    def anterior(self, k: int) -> float:
+        """Valor agregado hace k altas (1 = el último); NaN si aún no existe."""
+        if k > self.altas:
+            return math.nan
+        return self.valores[(self.pos - k) % self.tamaño]
+
+    @staticmethod
+    def _estadisticos(momentos, min_periodos):
+        n, media, m2, racha, ultimo = momentos
+        if n < min_periodos or n == 0:
+            return math.nan, math.nan
+        if racha >= n:
+            return ultimo, (0.0 if n > 1 else math.nan)
+        return media, (math.sqrt(m2 / (n - 1)) if n > 1 else math.nan)
+
+    def media_std(self, min_periodos: int = 1):
+        """Media y desviación estándar (ddof=1) de la ventana actual."""
+        return self._estadisticos(self.momentos, min_periodos)
+
+    def media_std_con(self, x: float, min_periodos: int = 1):
+        """Media y desviación estándar que tendría la ventana tras agregar x."""
+        return self._estadisticos(self._mover(float(x)), min_periodos)
+
+    def a_dict(self) -> dict:
+        # Los valores se guardan en orden cronológico (el más antiguo primero)
+        orden = self.valores[self.pos:] + self.valores[:self.pos]
+        return {'tamaño': self.tamaño, 'altas': self.altas,
+                'valores': [None if v != v else v for v in orden]}
+
+    @classmethod
+    def desde_dict(cls, datos: dict):
+        ventana = cls(datos['tamaño'])
+        ventana.valores = [math.nan if v is None else float(v) for v in datos['valores']]
+        ventana.altas = datos['altas']
+        ventana._recalcular()
+        return ventana
+
+# --- Motor de Features ---
+
+class MotorFeatures:
+    """
+    Estado incremental que produce, día por día, el vector de features del modelo
+    RF_improved en el orden de su metadata.
+
+    Uso diario: `vector(fila)` con las covariables del día a predecir (no modifica
+    el estado) y, cuando se conoce el conteo de ese día, `agregar(fila)`. Ambas
+    operaciones son O(1) respecto a la longitud de la historia.
+    """
+    def __init__(self, features=None):
+        """
+        Args:
+            features (list): Orden de salida. Por defecto, el de la metadata más reciente.
+        """
+        self.features = list(features) if features is not None else cargar_lista_features()
+        desconocidas = [f for f in self.features if f not in FEATURES_CONOCIDAS]
+        if desconocidas:
+            raise ValueError(f"Features sin definición incremental: {desconocidas}")
+        self.ultima_fecha = None
+        self.homicidios = {w: VentanaMovil(w) for w in VENTANAS_HOMICIDIOS}
+        self.robos = VentanaMovil(max(LAGS_ROBOS))
+        self.zscore = {var: VentanaMovil(VENTANA_ZSCORE) for var in VARIABLES_ZSCORE}
+
+    @staticmethod
+    def _fila(fila) -> dict:
+        """Valores numéricos del día, con las columnas de fecha derivadas si faltan."""
+        fecha = pd.Timestamp(fila['date']).normalize()
+        valores = {
+            'año': fecha.year, 'mes': fecha.month, 'dia': fecha.day,
+            'dia_semana_num': fecha.weekday(), 'quincena': 1 if fecha.day <= 15 else 2,
+            'es_fin_semana': int(fecha.weekday() >= 5),
+        }
+        for col in COLUMNAS_BASE + ['homicidios']:
+            if col in fila and fila[col] is not None:
+                valores[col] = float(fila[col])
+            else:
+                valores.setdefault(col, math.nan if col == 'homicidios' else 0.0)
+        return fecha, {k: float(v) for k, v in valores.items()}
+
+    def _validar_fecha(self, fecha):
+        if self.ultima_fecha is not None and fecha != self.ultima_fecha + pd.Timedelta(days=1):
+            raise ValueError(f"Se esperaba el día {(self.ultima_fecha + pd.Timedelta(days=1)).date()} "
+                             f"y se recibió {fecha.date()}.")
+
+    def vector(self, fila) -> np.ndarray:
+        """
+        Features del día de `fila` a partir de la historia agregada hasta el día anterior.
+
+        Args:
+            fila (Mapping): 'date' y las columnas base (robos, clima, dólar, calendario,
+                has_event, is_outlier). Las de calendario simples se derivan de la fecha
+                y has_event/is_outlier valen 0 si faltan.
+
+        Returns:
+            np.ndarray: float64 en el orden de `self.features` (NaN donde no hay historia).
+        """
+        fecha, v = self._fila(fila)
+        self._validar_fecha(fecha)
+        f = {col: v[col] for col in COLUMNAS_BASE}
+
+        h28 = self.homicidios[28]
+        for lag in LAGS_HOMICIDIOS:
+            f[f'h_lag_{lag}'] = h28.anterior(lag)
+        for w, ventana in self.homicidios.items():
+            f[f'h_roll_mean_{w}'], f[f'h_roll_std_{w}'] = ventana.media_std(MIN_PERIODOS_VENTANA)
+
+        f['amplitud_termica'] = v['tmax'] - v['tmin']
+        f['llueve'] = float(v['prcp'] > 0)
+        dolar_previo = self.zscore['precio_dolar'].anterior(1)
+        f['dolar_ret'] = v['precio_dolar'] / dolar_previo - 1 if dolar_previo == dolar_previo and dolar_previo != 0 else math.nan
+        for lag in LAGS_ROBOS:
+            f[f'robos_lag_{lag}'] = self.robos.anterior(lag)
+
+        dow = fecha.weekday()
+        f['dow'] = float(dow)
+        for d in range(1, 7):
+            f[f'dow_{d}'] = float(dow == d)
+
+        finde = v['es_fin_semana']
+        f['temp_x_finde'] = v['tavg'] * finde
+        f['dolar_x_evento'] = v['precio_dolar'] * v['has_event']
+        f['robos_x_finde'] = v['robos'] * finde
+        f['lluvia_x_temp'] = f['llueve'] * v['tavg']
+        f['lag1_x_finde'] = f['h_lag_1'] * finde
+        f['pago_x_robos'] = v['es_dia_pago'] * v['robos']
+
+        # z-score móvil: la ventana incluye el propio día
+        for var, ventana in self.zscore.items():
+            media, std = ventana.media_std_con(v[var], MIN_PERIODOS_ZSCORE)
+            z = (v[var] - media) / (std + EPSILON_ZSCORE)
+            f[f'{var}_zscore'] = z if z == z else 0.0
+
+        return np.array([f[nombre] for nombre in self.features], dtype=np.float64)
+
+    def agregar(self, fila):
+        """Incorpora un día completo (incluido 'homicidios', NaN si no se conoce)."""
+        fecha, v = self._fila(fila)
+        self._validar_fecha(fecha)
+        for ventana in self.homicidios.values():
+            ventana.agregar(v['homicidios'])
+        self.robos.agregar(v['robos'])
+        for var, ventana in self.zscore.items():
+            ventana.agregar(v[var])
+        self.ultima_fecha = fecha
+
+    def paso(self, fila) -> np.ndarray:
+        """vector(fila) seguido de agregar(fila), para recorrer una historia."""
+        resultado = self.vector(fila)
+        self.agregar(fila)
+        return resultado
+
+    def _ventanas(self):
+        """Pares (columna, ventana) de todo el estado."""
+        return ([('homicidios', v) for v in self.homicidios.values()] + [('robos', self.robos)]
+                + [(var, v) for var, v in self.zscore.items()])
+
+    def revisar(self, df: pd.DataFrame) -> int:
+        """
+        Corrige el estado con los valores revisados de días ya agregados.
+
+        El estado solo depende de los días que siguen en las ventanas (a lo sumo los
+        últimos VENTANA_ZSCORE), así que basta con reemplazar esos valores y recalcular
+        los momentos; las revisiones más antiguas no cambian ninguna feature futura.
+
+        Args:
+            df (pd.DataFrame): Dataset con los valores vigentes.
+
+        Returns:
+            int: Días del estado cuyo valor cambió.
+        """
+        if self.ultima_fecha is None:
+            return 0
+        ventanas = self._ventanas()
+        desde = self.ultima_fecha - pd.Timedelta(days=max(v.tamaño for _, v in ventanas) - 1)
+        tramo = df[(df['date'] >= desde) & (df['date'] <= self.ultima_fecha)]
+        filas = [self._fila(fila) for fila in tramo.to_dict('records')]
+
+        revisados = set()
+        for columna, ventana in ventanas:
+            orden = ventana.valores[ventana.pos:] + ventana.valores[:ventana.pos]
+            cambio = False
+            for fecha, v in filas:
+                atras = (self.ultima_fecha - fecha).days
+                if atras >= min(ventana.tamaño, ventana.altas):
+                    continue
+                i = ventana.tamaño - 1 - atras
+                nuevo = v[columna]
+                if nuevo != orden[i] and (nuevo == nuevo or orden[i] == orden[i]):
+                    orden[i] = nuevo
+                    revisados.add(fecha)
+                    cambio = True
+            if cambio:
+                ventana.valores, ventana.pos = orden, 0
+                ventana._recalcular()
+        return len(revisados)
+
+    def agregar_dataset(self, df: pd.DataFrame) -> int:
+        """Agrega los días de `df` posteriores a `ultima_fecha`. Devuelve cuántos se agregaron."""
+        if self.ultima_fecha is not None:
+            df = df[df['date'] > self.ultima_fecha]
+        for fila in df.to_dict('records'):
+            self.agregar(fila)
+        return len(df)
+
+    # --- Persistencia ---
+
+    def a_dict(self) -> dict:
+        return {
+            'features': self.features,
+            'ultima_fecha': None if self.ultima_fecha is None else self.ultima_fecha.strftime('%Y-%m-%d'),
+            'homicidios': {str(w): v.a_dict() for w, v in self.homicidios.items()},
+            'robos': self.robos.a_dict(),
+            'zscore': {var: v.a_dict() for var, v in self.zscore.items()},
+        }
+
+    @classmethod
+    def desde_dict(cls, datos: dict):
+        motor = cls(datos['features'])
+        if datos['ultima_fecha'] is not None:
+            motor.ultima_fecha = pd.Timestamp(datos['ultima_fecha'])
+        motor.homicidios = {int(w): VentanaMovil.desde_dict(v) for w, v in datos['homicidios'].items()}
+        motor.robos = VentanaMovil.desde_dict(datos['robos'])
+        motor.zscore = {var: VentanaMovil.desde_dict(v) for var, v in datos['zscore'].items()}
+        return motor
+
+    def guardar(self, path=RUTA_ESTADO):
+        """Guarda el estado como JSON de forma atómica."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporal = path.with_suffix(path.suffix + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.a_dict(), f, ensure_ascii=False)
+        os.replace(temporal, path)
+
+    @classmethod
+    def cargar(cls, path=RUTA_ESTADO):
+        with open(path, encoding='utf-8') as f:
+            return cls.desde_dict(json.load(f))
+
+def fila_pronostico(ultima_fila, fecha, indice=None) -> dict:
+    """
+    Fila para predecir `fecha` cuando aún no hay covariables de ese día: se usan los
+    últimos valores conocidos de robos, clima y dólar, y el calendario de la fecha.
+
+    Args:
+        ultima_fila (Mapping): Último día del dataset.
+        fecha: Día a predecir.
+        indice (CalendarioIndice): Índice de festivos/pagos/eventos a reutilizar.
+    """
+    from calendario_indice import CalendarioIndice
+
+    indice = indice or CalendarioIndice()
+    fecha = pd.Timestamp(fecha).normalize()
+    cal = indice.features(fechas=[fecha]).iloc[0]
+    fila = {col: ultima_fila[col] for col in ['robos', 'tavg', 'tmin', 'tmax', 'prcp', 'wspd', 'pres', 'precio_dolar']}
+    fila.update({
+        'date': fecha,
+        'es_festivo': cal['es_festivo'], 'es_dia_pago': cal['es_dia_pago'],
+        'dias_desde_pago': cal['dias_desde_pago'], 'has_event': cal['has_event'],
+        'despues_festivo': cal['dias_desde_festivo'] == 1, 'antes_festivo': cal['dias_hasta_festivo'] == 1,
+    })
+    return fila
+
+# --- Referencia ---
+
+def _features_pandas(df: pd.DataFrame, features: list) -> pd.DataFrame:
+    """Features calculadas como en el notebook, con shift/rolling sobre toda la historia."""
+    # Aritmética en float64, como el motor (el dataset guarda float32)
+    Xy = df.astype({c: 'float64' for c in df.columns[df.dtypes == 'float32']})
+    for col in ['has_event', 'is_outlier']:
+        if col not in Xy.columns:
+            Xy[col] = 0
+    for lag in LAGS_HOMICIDIOS:
+        Xy[f'h_lag_{lag}'] = Xy['homicidios'].shift(lag)
+    for w in VENTANAS_HOMICIDIOS:
+        Xy[f'h_roll_mean_{w}'] = Xy['homicidios'].shift(1).rolling(w, min_periods=MIN_PERIODOS_VENTANA).mean()
+        Xy[f'h_roll_std_{w}'] = Xy['homicidios'].shift(1).rolling(w, min_periods=MIN_PERIODOS_VENTANA).std()
+    Xy['amplitud_termica'] = Xy['tmax'] - Xy['tmin']
+    Xy['llueve'] = (Xy['prcp'] > 0).astype(int)
+    Xy['dolar_ret'] = Xy['precio_dolar'].pct_change(fill_method=None).replace([np.inf, -np.inf], np.nan)
+    for lag in LAGS_ROBOS:
+        Xy[f'robos_lag_{lag}'] = Xy['robos'].shift(lag)
+    Xy['dow'] = Xy['date'].dt.dayofweek
+    Xy = Xy.join(pd.get_dummies(Xy['dow'], prefix='dow', drop_first=True))
+    Xy['temp_x_finde'] = Xy['tavg'] * Xy['es_fin_semana']
+    Xy['dolar_x_evento'] = Xy['precio_dolar'] * Xy['has_event']
+    Xy['robos_x_finde'] = Xy['robos'] * Xy['es_fin_semana']
+    Xy['lluvia_x_temp'] = Xy['llueve'] * Xy['tavg']
+    Xy['lag1_x_finde'] = Xy['h_lag_1'] * Xy['es_fin_semana']
+    Xy['pago_x_robos'] = Xy['es_dia_pago'] * Xy['robos']
+    for var in VARIABLES_ZSCORE:
+        media = Xy[var].rolling(window=VENTANA_ZSCORE, min_periods=MIN_PERIODOS_ZSCORE).mean()
+        std = Xy[var].rolling(window=VENTANA_ZSCORE, min_periods=MIN_PERIODOS_ZSCORE).std()
+        Xy[f'{var}_zscore'] = ((Xy[var] - media) / (std + EPSILON_ZSCORE)).fillna(0)
+    return Xy[features].astype('float64')
+
+# --- Bloque de Ejecución ---
+
+def main(ruta_estado=RUTA_ESTADO):
+    """
+    Actualiza el estado con los días nuevos del dataset y muestra el vector de
+    features para el día siguiente.
+    """
+    try:
+        df = almacen.cargar('dataset')
+    except FileNotFoundError:
+        print("Error: No existe el dataset. Ejecuta merge_data.py primero.", file=sys.stderr)
+        return
+
+    ruta_estado = Path(ruta_estado)
+    motor = MotorFeatures.cargar(ruta_estado) if ruta_estado.exists() else MotorFeatures()
+    if motor.ultima_fecha is not None and motor.ultima_fecha > df['date'].iloc[-1]:
+        print("El estado es posterior al dataset; se reconstruye desde el inicio.")
+        motor = MotorFeatures(motor.features)
+    revisados = motor.revisar(df)
+    if revisados:
+        print(f"{revisados} días revisados en el dataset; estado corregido.")
+    nuevos = motor.agregar_dataset(df)
+    motor.guardar(ruta_estado)
+    print(f"{nuevos} días agregados; estado al {motor.ultima_fecha.date()} en {ruta_estado}")
+
+    siguiente = motor.ultima_fecha + pd.Timedelta(days=1)
+    vector = motor.vector(fila_pronostico(df.iloc[-1], siguiente))
+    print(f"\nFeatures para {siguiente.date()}:")
+    for nombre, valor in zip(motor.features, vector):
+        print(f"  {nombre:<22} {valor:.6g}")
+
+# --- Benchmark ---
+
+def _dataset_sintetico(años=10, semilla=0) -> pd.DataFrame:
+    """Dataset diario con las columnas del merge y huecos en homicidios."""
+    from merge_data import _fuentes_sinteticas, fusionar_fuentes
+
+    fuentes = _fuentes_sinteticas(años, 1, semilla)
+    del fuentes['clima_ubicaciones']
+    df = fusionar_fuentes(fuentes, fuentes['clima']['date'].max())
+    rng = np.random.default_rng(semilla)
+    df['homicidios'] = df['homicidios'].astype('float64')
+    df.loc[rng.random(len(df)) < 0.02, 'homicidios'] = np.nan
+    df['has_event'] = (rng.random(len(df)) < 0.05).astype(int)
+    return df
+
+def benchmark_online(años=10, dias_diarios=60):
+    """
+    Compara el costo de calcular el vector de un día nuevo recalculando con pandas
+    contra un paso del motor. La equivalencia se verifica en tests/test_features_online.py.
+    """
+    features = cargar_lista_features()
+    df = _dataset_sintetico(años)
+    filas = df.to_dict('records')
+
+    motor = MotorFeatures(features)
+    inicio = time.perf_counter()
+    for fila in filas:
+        motor.paso(fila)
+    t_motor = time.perf_counter() - inicio
+
+    # Corridas diarias: recalcular todo con pandas contra un paso del motor
+    base = len(df) - dias_diarios
+    motor = MotorFeatures(features)
+    motor.agregar_dataset(df.iloc[:base])
+    t_pandas = t_paso = 0.0
+    for i in range(base, len(df)):
+        inicio = time.perf_counter()
+        _features_pandas(df.iloc[:i + 1], features).to_numpy()[-1]
+        t_pandas += time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        motor.paso(filas[i])
+        t_paso += time.perf_counter() - inicio
+
+    print(f"Historia: {len(df)} días, {len(features)} features")
+    print(f"Motor, historia completa: {t_motor * 1000:.0f} ms ({t_motor / len(df) * 1e6:.0f} µs por día)")
+    print(f"Día nuevo, recalculando con pandas: {t_pandas / dias_diarios * 1000:8.2f} ms")
+    print(f"Día nuevo, motor incremental:       {t_paso / dias_diarios * 1000:8.3f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Features del modelo RF_improved día por día.")
+    parser.add_argument("--estado", type=Path, default=RUTA_ESTADO, help="Archivo JSON del estado.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Mide el costo por día contra pandas.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_online()
+    else:
+        main(args.estado)
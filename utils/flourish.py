@@ -0,0 +1,474 @@
+# utils/flourish.py
+import pandas as pd
+import numpy as np
+import re
+import datetime as dt
+import json
+import queue
+import argparse
+import threading
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+
+import requests
+
+# Para web scraping
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.chrome.service import Service
+
+# --- Constantes y Configuración ---
+
+# Regex para extraer datos de Flourish
+REGEX_DL = re.compile(r",\s*(\d{2}-[a-z]{3}-\d{2}):\s*(\d+)", re.I)
+MES = {"ene":"jan","feb":"feb","mar":"mar","abr":"apr","may":"may","jun":"jun",
+       "jul":"jul","ago":"aug","sep":"sep","oct":"oct","nov":"nov","dic":"dec"}
+# Número de mes por abreviatura en español, para el parseo vectorizado
+MES_NUM = {m: i for i, m in enumerate(MES, start=1)}
+REGEX_FECHA_PARTES = r"^(\d{2})-([a-zA-Z]{3})-(\d{2})$"
+# Igual que REGEX_DL pero separando día, mes y año para el parseo vectorizado
+REGEX_DL_PARTES = re.compile(r",\s*(\d{2})-([a-z]{3})-(\d{2}):\s*(\d+)", re.I)
+
+HO_URL = "https://flo.uri.sh/visualisation/19405940/embed?auto=1"
+RB_URL = "https://flo.uri.sh/visualisation/21616394/embed"
+
+# Visualizaciones conocidas: nombre de columna -> URL del embed
+FUENTES = {
+    "homicidios": HO_URL,
+    "robos": RB_URL,
+}
+
+SELECTOR_PUNTOS = "path.data-point[aria-label]"
+# Lee todas las etiquetas en una sola ejecución de script (un solo viaje al driver)
+SCRIPT_ETIQUETAS = (
+    "return Array.from(document.querySelectorAll(arguments[0]), "
+    "el => el.getAttribute('aria-label'));"
+)
+
+# Los embeds de Flourish incluyen sus datos en el HTML como `_Flourish_data = {...}`
+REGEX_FLOURISH_DATA = re.compile(r"_Flourish_data\s*=\s*")
+REGEX_FECHA_ES = re.compile(r"^\s*(\d{2}-[a-z]{3}-\d{2})\s*$", re.I)
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)"}
+
+# --- Funciones Auxiliares ---
+
+def date_es(txt: str) -> dt.date:
+    """Convierte fecha en español a formato date"""
+    try:
+        d, m, y = txt.split("-")
+        return dt.datetime.strptime(f"{d}-{MES[m.lower()]}-{y}", "%d-%b-%y").date()
+    except (ValueError, KeyError) as e:
+        print(f"Error al procesar fecha: {txt}. Error: {e}", file=sys.stderr)
+        return None
+
+@lru_cache(maxsize=1)
+def ruta_chromedriver() -> str:
+    """Resuelve la ruta del chromedriver una sola vez por proceso."""
+    return ChromeDriverManager().install()
+
+def get_driver():
+    """Configura y devuelve un driver de Chrome para scraping"""
+    opt = Options()
+    opt.add_argument("--headless=new")
+    opt.add_argument("--disable-gpu")
+    opt.add_argument("--no-sandbox")
+    opt.add_argument("--disable-dev-shm-usage")
+    opt.add_argument("--disable-logging")
+    opt.add_argument("--log-level=3")
+
+    try:
+        service = Service(ruta_chromedriver())
+        return webdriver.Chrome(service=service, options=opt)
+    except Exception as e:
+        print(f"Error al configurar el driver de Chrome: {e}", file=sys.stderr)
+        return None
+
+def _fechas_desde_partes(dia: pd.Series, mes: pd.Series, yy: pd.Series) -> pd.Series:
+    """Arma fechas datetime64 a partir de día, abreviatura de mes y año de dos dígitos."""
+    dia = pd.to_numeric(dia, errors="coerce").to_numpy(dtype=float)
+    yy = pd.to_numeric(yy, errors="coerce").to_numpy(dtype=float)
+    num_mes = mes.str.lower().map(MES_NUM).to_numpy(dtype=float)
+
+    validas = ~(np.isnan(dia) | np.isnan(yy) | np.isnan(num_mes))
+    dia = np.where(validas, dia, 1).astype(np.int64)
+    num_mes = np.where(validas, num_mes, 1).astype(np.int64)
+    yy = np.where(validas, yy, 0).astype(np.int64)
+    # Misma regla que %y: 00-68 -> 20xx, 69-99 -> 19xx
+    año = yy + np.where(yy < 69, 2000, 1900)
+
+    inicio_mes = ((año - 1970) * 12 + num_mes - 1).astype("datetime64[M]")
+    dias_en_mes = ((inicio_mes + 1).astype("datetime64[D]") - inicio_mes.astype("datetime64[D]")).astype(np.int64)
+    validas &= (dia >= 1) & (dia <= dias_en_mes)
+
+    fechas = inicio_mes.astype("datetime64[D]") + (dia - 1)
+    return pd.Series(pd.to_datetime(np.where(validas, fechas, np.datetime64("NaT"))), index=mes.index)
+
+def parsear_fechas_es(fechas: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de date_es: convierte fechas como "05-ene-25" a datetime64.
+
+    Las fechas que no se pueden interpretar quedan como NaT.
+    """
+    partes = pd.Series(fechas, dtype="object").astype(str).str.strip().str.extract(REGEX_FECHA_PARTES)
+    return _fechas_desde_partes(partes[0], partes[1], partes[2])
+
+def _construir_frame(fechas, valores, col: str) -> pd.DataFrame:
+    """Agrupa valores por fecha (datetime64) en el DataFrame limpio de 'date' y col."""
+    df = pd.DataFrame({"date": fechas, col: pd.to_numeric(valores, errors="coerce")})
+    n_invalidas = int(df["date"].isna().sum())
+    if n_invalidas:
+        print(f"Se descartaron {n_invalidas} fechas que no se pudieron procesar.", file=sys.stderr)
+    df = df.dropna(subset=['date']) # Eliminar fechas que no se pudieron procesar
+    df = df.groupby("date")[col].sum().reset_index()
+    df = df.sort_values("date", ascending=True).reset_index(drop=True)
+    return df[["date", col]]
+
+def parsear_etiquetas(etiquetas, col: str) -> pd.DataFrame:
+    """
+    Convierte los `aria-label` de los puntos de Flourish en el DataFrame de 'date' y col.
+
+    Una sola pasada de Series.str.extract separa día, mes, año y valor; el mes se
+    traduce con MES_NUM y las fechas se arman de forma vectorizada.
+    """
+    partes = pd.Series(list(etiquetas), dtype="object").str.extract(REGEX_DL_PARTES).dropna()
+    if partes.empty:
+        return pd.DataFrame()
+    fechas = _fechas_desde_partes(partes[0], partes[1], partes[2])
+    return _construir_frame(fechas, partes[3].astype(np.int64), col)
+
+# --- Extracción sin Navegador ---
+
+def extraer_datos_embed(html: str):
+    """
+    Extrae el objeto `_Flourish_data` embebido en el HTML de una visualización.
+
+    Returns:
+        dict: Los datos de la visualización, o None si no se encontraron.
+    """
+    match = REGEX_FLOURISH_DATA.search(html)
+    if not match:
+        return None
+    try:
+        datos, _ = json.JSONDecoder().raw_decode(html, match.end())
+    except ValueError:
+        return None
+    return datos if isinstance(datos, dict) else None
+
+def parsear_embed(html: str, col: str) -> pd.DataFrame:
+    """
+    Convierte el HTML de un embed de Flourish en el DataFrame de 'date' y col.
+
+    Cada fila de `_Flourish_data["data"]` trae una etiqueta de fecha en español
+    (p. ej. "05-ene-25") y una lista de valores, una por serie; los valores de
+    una misma fecha se suman igual que en la extracción con Selenium.
+
+    Returns:
+        pd.DataFrame: DataFrame con 'date' y col, vacío si el formato no es el esperado.
+    """
+    datos = extraer_datos_embed(html)
+    filas = datos.get("data") if datos else None
+    if not isinstance(filas, list) or not filas:
+        return pd.DataFrame()
+
+    fechas, numeros = [], []
+    for fila in filas:
+        if not isinstance(fila, dict):
+            return pd.DataFrame()
+        match = REGEX_FECHA_ES.match(str(fila.get("label", "")))
+        if not match:
+            # Formato de etiqueta desconocido: mejor caer a Selenium que adivinar
+            return pd.DataFrame()
+        valores = fila.get("value", [])
+        if not isinstance(valores, list):
+            valores = [valores]
+        for valor in valores:
+            if valor in (None, ""):
+                continue
+            try:
+                numeros.append(int(float(valor)))
+            except (TypeError, ValueError):
+                return pd.DataFrame()
+            fechas.append(match.group(1))
+
+    if not fechas:
+        return pd.DataFrame()
+    return _construir_frame(parsear_fechas_es(fechas).to_numpy(), numeros, col)
+
+def scrape_flourish_http(url: str, col: str, timeout: float = 15) -> pd.DataFrame:
+    """
+    Obtiene los datos de una visualización de Flourish con una sola petición HTTP.
+
+    Args:
+        url (str): La URL del embed de Flourish.
+        col (str): El nombre de la columna para los datos extraídos.
+        timeout (float): Tiempo máximo de la petición en segundos.
+
+    Returns:
+        pd.DataFrame: DataFrame con 'date' y col, vacío si no se pudo extraer.
+    """
+    try:
+        response = requests.get(url, headers=HTTP_HEADERS, timeout=timeout)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Error al descargar el embed de {col}: {e}", file=sys.stderr)
+        return pd.DataFrame()
+    return parsear_embed(response.text, col)
+
+# --- Pool de Drivers ---
+
+class DriverPool:
+    """
+    Pool de drivers de Chrome reutilizables.
+
+    Los drivers se crean bajo demanda hasta `size` y se devuelven al pool al
+    terminar cada carga, de modo que varias visualizaciones (y sus reintentos)
+    comparten el mismo navegador en lugar de lanzar uno nuevo cada vez.
+    """
+    def __init__(self, size: int = 2, factory=get_driver):
+        self.size = size
+        self.factory = factory
+        self._libres = queue.Queue()
+        self._creados = 0
+        self._todos = []
+        self._lock = threading.Lock()
+
+    def obtener(self, timeout: float = None):
+        """Devuelve un driver libre, creando uno nuevo si el pool no está lleno."""
+        try:
+            return self._libres.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            crear = self._creados < self.size
+            if crear:
+                self._creados += 1
+        if crear:
+            driver = self.factory()
+            if driver is None:
+                with self._lock:
+                    self._creados -= 1
+                return None
+            with self._lock:
+                self._todos.append(driver)
+            return driver
+
+        try:
+            return self._libres.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def devolver(self, driver, descartar: bool = False):
+        """Regresa un driver al pool o lo cierra si quedó en mal estado."""
+        if driver is None:
+            return
+        if not descartar:
+            self._libres.put(driver)
+            return
+        with self._lock:
+            if driver in self._todos:
+                self._todos.remove(driver)
+                self._creados -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def driver(self, timeout: float = None):
+        """Context manager que presta un driver y lo descarta si hubo un error."""
+        driver = self.obtener(timeout=timeout)
+        try:
+            yield driver
+        except Exception:
+            self.devolver(driver, descartar=True)
+            raise
+        else:
+            self.devolver(driver)
+
+    def cerrar(self):
+        """Cierra todos los drivers creados por el pool."""
+        with self._lock:
+            todos, self._todos = self._todos, []
+            self._creados = 0
+        while not self._libres.empty():
+            self._libres.get_nowait()
+        for driver in todos:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+# --- Funciones Principales de Scraping ---
+
+def scrape_flourish(url: str, col: str, max_retries: int = 3, pool: DriverPool = None,
+                    usar_http: bool = True) -> pd.DataFrame:
+    """
+    Realiza scraping de datos de una visualización de Flourish.
+
+    Primero intenta leer los datos embebidos con una petición HTTP; solo si eso
+    falla se renderiza la página con Chrome y se leen los `aria-label`.
+
+    Args:
+        url (str): La URL de la visualización de Flourish (también acepta file:// para
+            páginas guardadas en disco).
+        col (str): El nombre de la columna para los datos extraídos.
+        max_retries (int): Número máximo de reintentos.
+        pool (DriverPool): Pool de drivers a reutilizar. Si no se indica, se crea uno
+            de un solo driver que se cierra al terminar.
+        usar_http (bool): Si se intenta primero la extracción sin navegador.
+
+    Returns:
+        pd.DataFrame: Un DataFrame con 'date' y la columna especificada.
+    """
+    if usar_http:
+        df = scrape_flourish_http(url, col)
+        if not df.empty:
+            print(f"Datos de {col} obtenidos exitosamente (sin navegador).")
+            return df
+        print(f"No se pudieron leer los datos embebidos de {col}; usando Selenium.", file=sys.stderr)
+
+    # Los drivers del pool se crean bajo demanda, así que Chrome solo arranca aquí
+    pool_propio = pool is None
+    if pool_propio:
+        pool = DriverPool(size=1)
+
+    try:
+        for attempt in range(max_retries):
+            try:
+                print(f"Intento {attempt + 1}/{max_retries} para obtener datos de {col}...")
+                with pool.driver() as driver:
+                    if not driver:
+                        print("Driver no disponible, saltando intento.", file=sys.stderr)
+                        time.sleep(5)
+                        continue
+
+                    driver.get(url)
+
+                    # Espera a que los elementos de datos carguen usando un selector más específico
+                    WebDriverWait(driver, 20).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, SELECTOR_PUNTOS))
+                    )
+
+                    # Extraer todas las etiquetas en un solo viaje al navegador
+                    etiquetas = driver.execute_script(SCRIPT_ETIQUETAS, SELECTOR_PUNTOS) or []
+
+                # Procesar y limpiar datos
+                df = parsear_etiquetas(etiquetas, col)
+                if df.empty:
+                    print(f"No se encontraron datos en el intento {attempt + 1}", file=sys.stderr)
+                    time.sleep(5)
+                    continue
+
+                print(f"Datos de {col} obtenidos exitosamente.")
+                return df
+
+            except Exception as e:
+                print(f"Error en el intento {attempt + 1} para {col}: {e}", file=sys.stderr)
+                time.sleep(5)
+    finally:
+        if pool_propio:
+            pool.cerrar()
+
+    print(f"No se pudieron obtener los datos de {col} después de {max_retries} intentos.", file=sys.stderr)
+    return pd.DataFrame()
+
+def scrape_varios(fuentes: dict = None, max_workers: int = 2, max_retries: int = 3,
+                  usar_http: bool = True, factory=get_driver) -> dict:
+    """
+    Obtiene varias visualizaciones de Flourish en paralelo con un pool compartido.
+
+    Args:
+        fuentes (dict): Nombre de columna -> URL. Por defecto, FUENTES.
+        max_workers (int): Número de drivers (y cargas simultáneas) del pool.
+        max_retries (int): Número máximo de reintentos por visualización.
+        usar_http (bool): Si se intenta primero la extracción sin navegador.
+        factory (callable): Crea los drivers del pool. Por defecto, get_driver.
+
+    Returns:
+        dict: Nombre de columna -> DataFrame devuelto por scrape_flourish; vacío
+        para una visualización que falló, sin afectar a las demás.
+    """
+    fuentes = fuentes or FUENTES
+    n = max(1, min(max_workers, len(fuentes)))
+    resultados = {}
+    with DriverPool(size=n, factory=factory) as pool, ThreadPoolExecutor(max_workers=n) as executor:
+        futuros = {
+            col: executor.submit(scrape_flourish, url, col, max_retries, pool, usar_http)
+            for col, url in fuentes.items()
+        }
+        for col, futuro in futuros.items():
+            try:
+                resultados[col] = futuro.result()
+            except Exception as e:
+                print(f"Error inesperado al obtener {col}: {e}", file=sys.stderr)
+                resultados[col] = pd.DataFrame()
+    return resultados
+
+# --- Benchmark ---
+
+def _parsear_etiquetas_lento(etiquetas, col: str) -> pd.DataFrame:
+    """Implementación anterior (ciclo de regex + date_es por fila), solo como referencia."""
+    registros = []
+    for etiqueta in etiquetas:
+        match = REGEX_DL.search(etiqueta)
+        if match:
+            fecha_str, valor = match.groups()
+            registros.append({"fecha_str": fecha_str, col: int(valor)})
+    df = pd.DataFrame(registros)
+    df["date"] = df["fecha_str"].apply(date_es)
+    df = df.dropna(subset=['date'])
+    df[col] = pd.to_numeric(df[col])
+    df = df.groupby("date")[col].sum().reset_index()
+    return df.sort_values("date", ascending=True).reset_index(drop=True)[["date", col]]
+
+def benchmark_parseo(tamaños=(1_000, 10_000, 100_000), repeticiones: int = 3):
+    """
+    Compara el parseo por fila con el vectorizado sobre etiquetas sintéticas.
+
+    Verifica además que ambos produzcan las mismas fechas y valores.
+    """
+    meses = list(MES)
+    print(f"{'puntos':>8} {'lento (s)':>10} {'vectorizado (s)':>16} {'aceleración':>12}")
+    for n in tamaños:
+        # Con años de dos dígitos solo hay un siglo de fechas distintas: las demás se
+        # repiten, como cuando una visualización tiene varias series por día
+        fechas = pd.date_range("1969-01-01", "2068-12-31", freq="D")
+        etiquetas = [
+            f"Homicidios, {f.day:02d}-{meses[f.month - 1]}-{f.year % 100:02d}: {i % 17}"
+            for i, f in ((i, fechas[i % len(fechas)]) for i in range(n))
+        ]
+        tiempos = {}
+        for nombre, funcion in [("lento", _parsear_etiquetas_lento), ("vectorizado", parsear_etiquetas)]:
+            mejor = float("inf")
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                resultado = funcion(etiquetas, "homicidios")
+                mejor = min(mejor, time.perf_counter() - inicio)
+            tiempos[nombre] = (mejor, resultado)
+
+        lento, rapido = tiempos["lento"][1], tiempos["vectorizado"][1]
+        assert (pd.to_datetime(lento["date"]).values == rapido["date"].values).all()
+        assert (lento["homicidios"].values == rapido["homicidios"].values).all()
+        t_lento, t_rapido = tiempos["lento"][0], tiempos["vectorizado"][0]
+        print(f"{n:>8} {t_lento:>10.4f} {t_rapido:>16.4f} {t_lento / t_rapido:>11.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Utilidades de scraping de Flourish.")
+    parser.add_argument("--benchmark", action="store_true", help="Mide el parseo de etiquetas.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_parseo()
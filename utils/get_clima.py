@@ -6,12 +6,295 @@ from pathlib import Path
 import time
 import requests
 import sys
+import argparse
+import asyncio
+import random
+import sqlite3
+import threading
+from requests.adapters import HTTPAdapter
+
+import almacen
 
 # --- Constantes y Configuración ---
 
 CULIACAN_LAT = 24.840216
 CULIACAN_LON = -107.385207
 
+# Ubicaciones para la malla de clima (municipios y sindicaturas de Sinaloa)
+UBICACIONES_SINALOA = {
+    'culiacan': (CULIACAN_LAT, CULIACAN_LON),
+    'navolato': (24.765278, -107.701944),
+    'eldorado': (24.323611, -107.363611),
+    'costa_rica': (24.589444, -107.387778),
+    'mazatlan': (23.249444, -106.411111),
+    'los_mochis': (25.790556, -108.985833),
+    'guasave': (25.567500, -108.469722),
+    'guamuchil': (25.463611, -108.078611),
+}
+
+# Clima típico de Culiacán por mes: (temperatura promedio, mínima típica, máxima típica)
+CLIMA_CULIACAN = {
+    1: (18.5, 13.0, 24.0), 2: (21.0, 15.0, 27.0), 3: (24.5, 18.0, 31.0),
+    4: (27.5, 21.0, 34.0), 5: (30.0, 23.0, 37.0), 6: (32.0, 25.0, 39.0),
+    7: (29.0, 24.0, 34.0), 8: (29.0, 24.0, 34.0), 9: (28.5, 23.0, 34.0),
+    10: (26.0, 20.0, 32.0), 11: (22.0, 16.0, 28.0), 12: (19.0, 13.0, 25.0)
+}
+
+# Semilla del generador del clima de respaldo. Cada día usa su propio bloque del
+# contador de Philox, así que sus valores no dependen del rango que se pida.
+SEMILLA_CLIMA = 20240909
+UNIFORMES_POR_DIA = 8  # Dos incrementos del contador de Philox (4 valores cada uno)
+
+COLUMNAS_CLIMA = ['tavg', 'tmin', 'tmax', 'prcp', 'wspd', 'pres']
+
+# API de pronóstico (5 días en intervalos de 3 horas)
+API_HOST = "open-weather13.p.rapidapi.com"
+API_URL = f"https://{API_HOST}/fivedaysforcast"
+
+# Caché persistente del clima. Las filas de hoy o días futuros son pronósticos y,
+# como la marca de "ya se consultó esta ubicación", caducan tras el TTL; cuando su
+# día pasa, el último pronóstico guardado queda congelado y no expira.
+RUTA_CACHE = Path(__file__).parent.parent / 'datos' / 'cache' / 'clima.sqlite'
+TTL_PRONOSTICO = 6 * 3600  # segundos
+
+# Límite de peticiones a la API (token bucket): tasa sostenida y ráfaga máxima
+PETICIONES_POR_SEGUNDO = 2.0
+RAFAGA_MAXIMA = 5
+
+# Reintentos de la sesión HTTP (cada intento pasa por el TokenBucket)
+REINTENTOS_HTTP = 3
+BACKOFF_HTTP = 0.5
+STATUS_REINTENTO = (429, 500, 502, 503, 504)
+
+# Modo asíncrono de la malla: consultas simultáneas y reintentos con backoff exponencial
+MAX_CONCURRENCIA = 4
+REINTENTOS_MALLA = 3
+BACKOFF_MALLA = 0.5  # segundos antes del primer reintento
+
+# --- Generación Vectorizada del Clima de Respaldo ---
+
+def _uniformes_por_dia(dias: np.ndarray, semilla: int = SEMILLA_CLIMA) -> np.ndarray:
+    """
+    Devuelve UNIFORMES_POR_DIA números uniformes en [0, 1) por cada día.
+
+    Los días se identifican por su número desde 1970-01-01. Se genera el tramo
+    completo entre el primer y el último día con un solo generador, arrancando el
+    contador de Philox en el bloque del primer día, por lo que cada día obtiene
+    siempre los mismos valores (un flujo independiente por día).
+    """
+    if len(dias) == 0:
+        return np.empty((0, UNIFORMES_POR_DIA))
+    inicio = int(dias.min())
+    n_dias = int(dias.max()) - inicio + 1
+    # El contador no admite negativos; el desplazamiento cubre fechas anteriores a 1970
+    bits = np.random.Philox(key=semilla, counter=[2 * (inicio + 2**32), 0, 0, 0])
+    tramo = np.random.Generator(bits).random(n_dias * UNIFORMES_POR_DIA)
+    return tramo.reshape(n_dias, UNIFORMES_POR_DIA)[dias - inicio]
+
+def _normales(u1: np.ndarray, u2: np.ndarray):
+    """Transformación de Box-Muller: dos uniformes -> dos normales estándar."""
+    radio = np.sqrt(-2.0 * np.log1p(-u1))
+    return radio * np.cos(2 * np.pi * u2), radio * np.sin(2 * np.pi * u2)
+
+# --- Cliente HTTP con Límite de Peticiones ---
+
+class TokenBucket:
+    """Limitador token bucket: permite ráfagas de `capacidad` y una tasa sostenida."""
+    def __init__(self, tasa: float = PETICIONES_POR_SEGUNDO, capacidad: int = RAFAGA_MAXIMA):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._tokens = float(capacidad)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Bloquea hasta que haya un token disponible y lo consume."""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.tasa
+            time.sleep(espera)
+
+class RateLimitedSession(requests.Session):
+    """
+    Sesión de requests con pool de conexiones, reintentos y un TokenBucket.
+
+    Los reintentos se hacen aquí y no en el adaptador de urllib3, para que cada
+    intento consuma su propio token del limitador.
+    """
+    def __init__(self, limitador: TokenBucket = None, pool_maxsize: int = 10,
+                 reintentos: int = REINTENTOS_HTTP, backoff: float = BACKOFF_HTTP):
+        super().__init__()
+        self.limitador = limitador or TokenBucket()
+        self.reintentos = reintentos
+        self.backoff = backoff
+        adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, *args, reintentos: int = None, **kwargs):
+        """
+        Como `Session.request`, con `reintentos` opcional para esta petición
+        (por defecto los de la sesión; 0 si el llamador reintenta por su cuenta).
+        """
+        reintentos = self.reintentos if reintentos is None else reintentos
+        for intento in range(reintentos + 1):
+            self.limitador.adquirir()
+            ultimo = intento == reintentos or method.upper() != 'GET'
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if ultimo:
+                    raise
+            else:
+                if ultimo or response.status_code not in STATUS_REINTENTO:
+                    return response
+                response.close()
+            time.sleep(self.backoff * 2 ** intento)
+
+# --- Caché Persistente del Clima ---
+
+class CacheClima:
+    """
+    Caché en disco (SQLite) de clima diario por (lat, lon, fecha).
+
+    Las filas de hoy o de días futuros son pronósticos y se descartan después de
+    `ttl` segundos. Una vez que su día pasó, el último pronóstico guardado para ese
+    día queda congelado y ya no expira (la API solo da el pronóstico de 5 días, así
+    que es el mejor dato disponible). Cada fila guarda además la fecha local en que
+    se obtuvo.
+    """
+    def __init__(self, path=RUTA_CACHE, ttl: float = TTL_PRONOSTICO):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        columnas = ", ".join(f"{col} REAL" for col in COLUMNAS_CLIMA)
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS clima (lat REAL, lon REAL, date TEXT, {columnas}, "
+                "obtenido REAL, PRIMARY KEY (lat, lon, date))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS consultas (lat REAL, lon REAL, obtenido REAL, "
+                "PRIMARY KEY (lat, lon))"
+            )
+            # Cachés anteriores no tienen la columna de la fecha de obtención
+            existentes = {fila[1] for fila in self._conn.execute("PRAGMA table_info(clima)")}
+            if 'fecha_obtenido' not in existentes:
+                self._conn.execute("ALTER TABLE clima ADD COLUMN fecha_obtenido TEXT")
+
+    @staticmethod
+    def _clave(lat, lon):
+        return round(float(lat), 4), round(float(lon), 4)
+
+    def obtener_rango(self, lat, lon, fechas) -> pd.DataFrame:
+        """Devuelve las fechas vigentes en caché para una ubicación (columna 'date' + clima)."""
+        lat, lon = self._clave(lat, lon)
+        fechas = pd.DatetimeIndex(pd.to_datetime(fechas))
+        if len(fechas) == 0:
+            return pd.DataFrame(columns=['date'] + COLUMNAS_CLIMA)
+        with self._lock:
+            filas = self._conn.execute(
+                f"SELECT date, {', '.join(COLUMNAS_CLIMA)}, obtenido, fecha_obtenido FROM clima "
+                "WHERE lat = ? AND lon = ? AND date BETWEEN ? AND ?",
+                (lat, lon, fechas.min().strftime('%Y-%m-%d'), fechas.max().strftime('%Y-%m-%d')),
+            ).fetchall()
+        df = pd.DataFrame(filas, columns=['date'] + COLUMNAS_CLIMA + ['obtenido', 'fecha_obtenido'])
+        df['date'] = pd.to_datetime(df['date'])
+        ahora = time.time()
+        pasado = df['date'] < pd.Timestamp(dt.date.fromtimestamp(ahora))
+        vigente = pasado | (ahora - df['obtenido'] <= self.ttl)
+        df = df[vigente & df['date'].isin(fechas)]
+        return df.drop(columns=['obtenido', 'fecha_obtenido']).reset_index(drop=True)
+
+    def obtener(self, lat, lon, fecha):
+        """Devuelve el clima en caché para una fecha, o None si no está o expiró."""
+        df = self.obtener_rango(lat, lon, [fecha])
+        if df.empty:
+            return None
+        return {col: float(df.iloc[0][col]) for col in COLUMNAS_CLIMA}
+
+    def guardar(self, lat, lon, clima_df: pd.DataFrame):
+        """Guarda (o reemplaza) las filas de clima_df ('date' + COLUMNAS_CLIMA)."""
+        lat, lon = self._clave(lat, lon)
+        ahora = time.time()
+        hoy = dt.date.fromtimestamp(ahora).isoformat()
+        filas = [
+            (lat, lon, pd.Timestamp(fila['date']).strftime('%Y-%m-%d'),
+             *(float(fila[col]) for col in COLUMNAS_CLIMA), ahora, hoy)
+            for _, fila in clima_df.iterrows()
+        ]
+        columnas = ", ".join(['lat', 'lon', 'date'] + COLUMNAS_CLIMA + ['obtenido', 'fecha_obtenido'])
+        marcadores = ", ".join("?" * (len(COLUMNAS_CLIMA) + 5))
+        with self._lock, self._conn:
+            self._conn.executemany(f"INSERT OR REPLACE INTO clima ({columnas}) VALUES ({marcadores})", filas)
+
+    def consulta_vigente(self, lat, lon) -> bool:
+        """Indica si la API ya se consultó para esta ubicación dentro del TTL."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT obtenido FROM consultas WHERE lat = ? AND lon = ?", self._clave(lat, lon)
+            ).fetchone()
+        return fila is not None and time.time() - fila[0] <= self.ttl
+
+    def registrar_consulta(self, lat, lon):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO consultas VALUES (?, ?, ?)",
+                               (*self._clave(lat, lon), time.time()))
+
+# --- Parseo del Pronóstico ---
+
+def parsear_pronostico(respuesta: dict) -> pd.DataFrame:
+    """
+    Agrega el pronóstico de 5 días (intervalos de 3 horas) a valores diarios.
+
+    Args:
+        respuesta (dict): JSON de `fivedaysforcast` (formato de OpenWeather, con 'list').
+
+    Returns:
+        pd.DataFrame: Una fila por fecha con 'date' y COLUMNAS_CLIMA (°C, mm, km/h, hPa).
+    """
+    registros = []
+    for item in respuesta.get('list', []) if isinstance(respuesta, dict) else []:
+        try:
+            if 'dt_txt' in item:
+                fecha = pd.Timestamp(item['dt_txt']).normalize()
+            else:
+                fecha = pd.Timestamp(item['dt'], unit='s').normalize()
+            principal = item['main']
+            registros.append({
+                'date': fecha,
+                'temp': principal['temp'],
+                'temp_min': principal.get('temp_min', principal['temp']),
+                'temp_max': principal.get('temp_max', principal['temp']),
+                'pres': principal.get('pressure', np.nan),
+                'wspd': item.get('wind', {}).get('speed', np.nan),
+                'prcp': item.get('rain', {}).get('3h', 0.0),
+            })
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    if not registros:
+        return pd.DataFrame(columns=['date'] + COLUMNAS_CLIMA)
+
+    df = pd.DataFrame(registros)
+    # La API responde en Kelvin salvo que se pidan otras unidades
+    if df['temp'].median() > 150:
+        df[['temp', 'temp_min', 'temp_max']] -= 273.15
+    diario = df.groupby('date').agg(
+        tavg=('temp', 'mean'), tmin=('temp_min', 'min'), tmax=('temp_max', 'max'),
+        prcp=('prcp', 'sum'), wspd=('wspd', 'mean'), pres=('pres', 'mean'),
+    )
+    diario['wspd'] = diario['wspd'] * 3.6  # m/s -> km/h
+    return diario.round(1).reset_index()[['date'] + COLUMNAS_CLIMA]
+
 # --- Clase para Manejar APIs del Clima ---
 
 class WeatherAPIManager:
@@ -19,69 +302,138 @@ class WeatherAPIManager:
     Maneja la obtención de datos climáticos, usando una API real si está configurada,
     o generando datos realistas como fallback.
     """
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, cache=None, base_url=API_URL, limitador=None):
         self.api_key = api_key
-        self.session = requests.Session()
+        self.base_url = base_url
+        self.cache = cache if cache is not None else CacheClima()
+        self.session = RateLimitedSession(limitador)
         self.session.headers.update({
             "x-rapidapi-key": self.api_key,
-            "x-rapidapi-host": "open-weather13.p.rapidapi.com"
+            "x-rapidapi-host": API_HOST
         })
 
-    def get_forecast_from_api(self, lat, lon, target_date):
-        """Intenta obtener el pronóstico de la API de RapidAPI."""
-        if not self.api_key:
-            return None
-
-        url = "https://open-weather13.p.rapidapi.com/fivedaysforcast"
+    def _pedir_pronostico(self, lat, lon, reintentos: int = None) -> pd.DataFrame:
+        """Hace la petición del pronóstico y lo devuelve por día. Propaga los errores."""
         querystring = {"latitude": str(lat), "longitude": str(lon)}
-        
+        response = self.session.get(self.base_url, params=querystring, timeout=10, reintentos=reintentos)
+        response.raise_for_status()
+        return parsear_pronostico(response.json())
+
+    def _guardar_pronostico(self, lat, lon, pronostico: pd.DataFrame):
+        if not pronostico.empty:
+            self.cache.guardar(lat, lon, pronostico)
+        self.cache.registrar_consulta(lat, lon)
+
+    def actualizar_pronostico(self, lat, lon) -> bool:
+        """
+        Consulta el pronóstico de 5 días una vez y guarda todas sus fechas en caché.
+
+        No vuelve a llamar a la API para la misma ubicación mientras la consulta
+        anterior siga vigente.
+
+        Returns:
+            bool: True si se hizo una petición real a la API.
+        """
+        if not self.api_key or self.cache.consulta_vigente(lat, lon):
+            return False
+
         try:
-            response = self.session.get(url, params=querystring, timeout=10)
-            response.raise_for_status()
-            # Aquí se necesitaría lógica para parsear la respuesta de la API
-            # y encontrar el día correcto. Por ahora, se asume que no funciona
-            # y se pasa al fallback.
-            # print(f"Respuesta de la API: {response.json()}") # Para depuración
-            return None # Forzamos fallback por ahora
-        except requests.exceptions.RequestException as e:
+            pronostico = self._pedir_pronostico(lat, lon)
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"Error en la API del clima: {e}", file=sys.stderr)
-            return None
+            return True
 
-    def get_realistic_fallback(self, target_date):
-        """Genera datos climáticos realistas para Culiacán."""
-        date_obj = dt.datetime.strptime(target_date, '%Y-%m-%d')
-        
-        clima_culiacan = {
-            1: (18.5, 13.0, 24.0), 2: (21.0, 15.0, 27.0), 3: (24.5, 18.0, 31.0),
-            4: (27.5, 21.0, 34.0), 5: (30.0, 23.0, 37.0), 6: (32.0, 25.0, 39.0),
-            7: (29.0, 24.0, 34.0), 8: (29.0, 24.0, 34.0), 9: (28.5, 23.0, 34.0),
-            10: (26.0, 20.0, 32.0), 11: (22.0, 16.0, 28.0), 12: (19.0, 13.0, 25.0)
-        }
-        
-        temp_prom, min_tipica, max_tipica = clima_culiacan.get(date_obj.month, (25.0, 18.0, 32.0))
-        
-        np.random.seed(date_obj.timetuple().tm_yday)
-        temp_avg = temp_prom + np.random.normal(0, 1.0)
-        
-        rango_tipico = max_tipica - min_tipica
-        rango_diario = max(9, min(15, rango_tipico + np.random.normal(0, 0.5)))
-        
+        self._guardar_pronostico(lat, lon, pronostico)
+        return True
+
+    async def actualizar_pronostico_async(self, lat, lon, semaforo: asyncio.Semaphore,
+                                          reintentos: int = REINTENTOS_MALLA,
+                                          backoff: float = BACKOFF_MALLA) -> bool:
+        """
+        Versión asíncrona de actualizar_pronostico con reintentos y backoff exponencial.
+
+        La petición corre en un hilo (`asyncio.to_thread`) para reutilizar la sesión,
+        su pool de conexiones y el TokenBucket. Los reintentos son solo los de aquí
+        (la sesión no reintenta por debajo), así que cada intento es una petición y
+        un token. El semáforo limita cuántas peticiones hay en vuelo; se libera
+        durante la espera entre reintentos.
+
+        Returns:
+            bool: True si se hizo al menos una petición real a la API.
+        """
+        if not self.api_key or self.cache.consulta_vigente(lat, lon):
+            return False
+
+        for intento in range(reintentos + 1):
+            try:
+                async with semaforo:
+                    pronostico = await asyncio.to_thread(self._pedir_pronostico, lat, lon, 0)
+                break
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if intento == reintentos:
+                    print(f"Error en la API del clima ({lat}, {lon}) tras {reintentos + 1} "
+                          f"intentos: {e}", file=sys.stderr)
+                    return True
+                # Backoff exponencial con jitter para no sincronizar los reintentos
+                await asyncio.sleep(backoff * 2 ** intento * (1 + random.random()))
+
+        self._guardar_pronostico(lat, lon, pronostico)
+        return True
+
+    def get_forecast_from_api(self, lat, lon, target_date):
+        """Obtiene el clima de la caché o del pronóstico de RapidAPI (si cubre la fecha)."""
+        datos = self.cache.obtener(lat, lon, target_date)
+        if datos is None and self.actualizar_pronostico(lat, lon):
+            datos = self.cache.obtener(lat, lon, target_date)
+        return datos
+
+    def get_realistic_fallback_batch(self, dates) -> pd.DataFrame:
+        """
+        Genera datos climáticos realistas para Culiacán para muchas fechas a la vez.
+
+        Args:
+            dates: Fechas (strings 'YYYY-MM-DD', datetimes o un DatetimeIndex).
+
+        Returns:
+            pd.DataFrame: Columnas COLUMNAS_CLIMA más 'date', una fila por fecha.
+        """
+        fechas = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+        dias = fechas.values.astype('datetime64[D]').astype(np.int64)
+        u = _uniformes_por_dia(dias)
+
+        clima_mes = np.array([CLIMA_CULIACAN[m] for m in range(1, 13)])
+        mes = fechas.month.to_numpy()
+        temp_prom, min_tipica, max_tipica = clima_mes[mes - 1].T
+
+        ruido_temp, ruido_rango = _normales(u[:, 0], u[:, 1])
+        ruido_pres, _ = _normales(u[:, 2], u[:, 3])
+
+        temp_avg = temp_prom + ruido_temp * 1.0
+        rango_diario = np.clip((max_tipica - min_tipica) + ruido_rango * 0.5, 9, 15)
         temp_max = temp_avg + (rango_diario * 0.55)
         temp_min = temp_avg - (rango_diario * 0.45)
-        
-        if date_obj.month in [6, 7, 8, 9]: prob_lluvia, lluvia_base = 0.25, 5.0
-        elif date_obj.month in [12, 1, 2, 3]: prob_lluvia, lluvia_base = 0.02, 1.0
-        else: prob_lluvia, lluvia_base = 0.10, 3.0
-        
-        prcp = lluvia_base * np.random.exponential(1.5) if np.random.random() < prob_lluvia else 0
-        
-        wspd = np.random.uniform(3, 12)
-        pres = np.random.normal(1012, 5)
-        
-        return {
-            'tavg': round(temp_avg, 1), 'tmin': round(temp_min, 1), 'tmax': round(temp_max, 1),
-            'prcp': round(prcp, 1), 'wspd': round(wspd, 1), 'pres': round(pres, 1)
-        }
+
+        lluviosos = np.isin(mes, [6, 7, 8, 9])
+        secos = np.isin(mes, [12, 1, 2, 3])
+        prob_lluvia = np.select([lluviosos, secos], [0.25, 0.02], default=0.10)
+        lluvia_base = np.select([lluviosos, secos], [5.0, 1.0], default=3.0)
+        # Exponencial con escala 1.5 por transformación inversa
+        prcp = np.where(u[:, 4] < prob_lluvia, lluvia_base * -1.5 * np.log1p(-u[:, 5]), 0.0)
+
+        wspd = 3 + 9 * u[:, 6]
+        pres = 1012 + 5 * ruido_pres
+
+        clima_df = pd.DataFrame({
+            'tavg': temp_avg, 'tmin': temp_min, 'tmax': temp_max,
+            'prcp': prcp, 'wspd': wspd, 'pres': pres,
+        }).round(1)
+        clima_df['date'] = fechas
+        return clima_df
+
+    def get_realistic_fallback(self, target_date):
+        """Genera datos climáticos realistas para Culiacán."""
+        fila = self.get_realistic_fallback_batch([target_date]).iloc[0]
+        return {col: float(fila[col]) for col in COLUMNAS_CLIMA}
 
     def get_weather_for_date(self, lat, lon, target_date):
         """Obtiene datos del clima para una fecha, usando API o fallback."""
@@ -90,11 +442,92 @@ class WeatherAPIManager:
             return api_data
         return self.get_realistic_fallback(target_date)
 
+    def _combinar_con_cache(self, lat, lon, clima_df: pd.DataFrame) -> int:
+        """Reemplaza en clima_df los días con datos reales en caché. Devuelve cuántos."""
+        reales = self.cache.obtener_rango(lat, lon, clima_df['date'])
+        if reales.empty:
+            return 0
+        reales = reales.set_index('date')
+        filas = clima_df['date'].isin(reales.index)
+        clima_df.loc[filas, COLUMNAS_CLIMA] = reales.loc[clima_df.loc[filas, 'date'], COLUMNAS_CLIMA].values
+        return int(filas.sum())
+
+    def get_weather_batch(self, lat, lon, dates) -> pd.DataFrame:
+        """
+        Obtiene el clima para muchas fechas: respaldo vectorizado, reemplazado por los
+        datos de la caché o de la API donde existan.
+
+        El pronóstico se pide una sola vez y cubre todas las fechas que incluye.
+        """
+        clima_df = self.get_realistic_fallback_batch(dates)
+        self.actualizar_pronostico(lat, lon)
+
+        n_reales = self._combinar_con_cache(lat, lon, clima_df)
+        if n_reales:
+            print(f"Clima real (API/caché) para {n_reales} de {len(clima_df)} días.")
+        return clima_df
+
+    async def get_weather_grid_async(self, ubicaciones: dict, dates,
+                                     max_concurrencia: int = MAX_CONCURRENCIA,
+                                     reintentos: int = REINTENTOS_MALLA,
+                                     backoff: float = BACKOFF_MALLA) -> pd.DataFrame:
+        """
+        Obtiene el clima de varias ubicaciones y fechas de forma concurrente.
+
+        Cada ubicación necesita a lo sumo una petición (el pronóstico cubre todas sus
+        fechas), así que el tiempo total crece con ubicaciones / max_concurrencia y no
+        con ubicaciones × días.
+
+        Solo se devuelven filas con clima real (de la API o de la caché): el clima de
+        respaldo es la climatología de Culiacán y no representa a otras ubicaciones,
+        así que los días sin datos simplemente no aparecen.
+
+        Args:
+            ubicaciones (dict): Nombre -> (lat, lon), p. ej. UBICACIONES_SINALOA.
+            dates: Fechas a cubrir.
+            max_concurrencia (int): Peticiones simultáneas como máximo.
+            reintentos (int): Reintentos por ubicación ante errores de la API.
+            backoff (float): Espera base (segundos) antes del primer reintento.
+
+        Returns:
+            pd.DataFrame: Formato largo con 'ubicacion', 'lat', 'lon', 'date' y COLUMNAS_CLIMA,
+            solo para los pares (ubicación, día) con datos reales.
+        """
+        semaforo = asyncio.Semaphore(max_concurrencia)
+        await asyncio.gather(*(
+            self.actualizar_pronostico_async(lat, lon, semaforo, reintentos, backoff)
+            for lat, lon in ubicaciones.values()
+        ))
+
+        tablas = []
+        for nombre, (lat, lon) in ubicaciones.items():
+            clima_df = self.cache.obtener_rango(lat, lon, dates)
+            if clima_df.empty:
+                continue
+            clima_df.insert(0, 'ubicacion', nombre)
+            clima_df.insert(1, 'lat', lat)
+            clima_df.insert(2, 'lon', lon)
+            tablas.append(clima_df)
+        columnas = ['ubicacion', 'lat', 'lon', 'date'] + COLUMNAS_CLIMA
+        if not tablas:
+            return pd.DataFrame(columns=columnas)
+        malla = pd.concat(tablas, ignore_index=True)[columnas]
+        print(f"Clima real (API/caché) para {len(malla)} filas (ubicación, día) de la malla.")
+        return malla
+
+    def get_weather_grid(self, ubicaciones: dict, dates, **kwargs) -> pd.DataFrame:
+        """Envoltura síncrona de get_weather_grid_async (ver sus argumentos)."""
+        return asyncio.run(self.get_weather_grid_async(ubicaciones, dates, **kwargs))
+
 # --- Bloque de Ejecución ---
 
-def main():
+def main(malla=False):
     """
     Genera un archivo CSV con datos climáticos para un rango de fechas.
+
+    Args:
+        malla (bool): Además de clima.csv, genera clima_ubicaciones.csv con el clima
+            de UBICACIONES_SINALOA en formato largo (ubicación, fecha).
     """
     print("Iniciando la generación de datos climáticos...")
     
@@ -108,29 +541,80 @@ def main():
     RAPIDAPI_KEY = None
     
     weather_manager = WeatherAPIManager(api_key=RAPIDAPI_KEY)
-    clima_data = []
-
-    for target_date in date_range:
-        fecha_str = target_date.strftime('%Y-%m-%d')
-        print(f"Obteniendo clima para: {fecha_str}")
-        clima = weather_manager.get_weather_for_date(CULIACAN_LAT, CULIACAN_LON, fecha_str)
-        clima['date'] = target_date
-        clima_data.append(clima)
-        time.sleep(0.1) # Pequeña pausa para no saturar
-
-    clima_df = pd.DataFrame(clima_data)
-    
-    # Definir rutas de salida
-    output_dir = Path(__file__).parent.parent / 'datos'
-    output_dir.mkdir(exist_ok=True)
-    output_path = output_dir / 'clima.csv'
+    print(f"Obteniendo clima para {len(date_range)} días ({start_date} a {end_date})...")
+    clima_df = weather_manager.get_weather_batch(CULIACAN_LAT, CULIACAN_LON, date_range)
 
     # Guardar datos
     if not clima_df.empty:
-        clima_df.to_csv(output_path, index=False)
+        output_path = almacen.guardar(clima_df, 'clima')
         print(f"Datos del clima guardados en: {output_path}")
     else:
         print("No se generó el archivo CSV del clima.")
 
+    if malla:
+        print(f"Obteniendo clima para {len(UBICACIONES_SINALOA)} ubicaciones "
+              f"(hasta {MAX_CONCURRENCIA} consultas simultáneas)...")
+        malla_df = weather_manager.get_weather_grid(UBICACIONES_SINALOA, date_range)
+        if malla_df.empty:
+            # Sin API (o sin respuesta) no hay clima real por ubicación; no se inventa
+            print("No hay clima real por ubicación (API sin configurar o sin respuesta); "
+                  "no se actualizó clima_ubicaciones.")
+        else:
+            malla_path = almacen.guardar(malla_df, 'clima_ubicaciones')
+            print(f"Clima por ubicación guardado en: {malla_path} ({len(malla_df)} filas)")
+
+# --- Benchmark ---
+
+def _fallback_por_dia(target_date):
+    """Generación anterior, un día a la vez con la semilla global de NumPy (referencia)."""
+    date_obj = dt.datetime.strptime(target_date, '%Y-%m-%d')
+    temp_prom, min_tipica, max_tipica = CLIMA_CULIACAN.get(date_obj.month, (25.0, 18.0, 32.0))
+    np.random.seed(date_obj.timetuple().tm_yday)
+    temp_avg = temp_prom + np.random.normal(0, 1.0)
+    rango_diario = max(9, min(15, (max_tipica - min_tipica) + np.random.normal(0, 0.5)))
+    temp_max = temp_avg + (rango_diario * 0.55)
+    temp_min = temp_avg - (rango_diario * 0.45)
+    if date_obj.month in [6, 7, 8, 9]: prob_lluvia, lluvia_base = 0.25, 5.0
+    elif date_obj.month in [12, 1, 2, 3]: prob_lluvia, lluvia_base = 0.02, 1.0
+    else: prob_lluvia, lluvia_base = 0.10, 3.0
+    prcp = lluvia_base * np.random.exponential(1.5) if np.random.random() < prob_lluvia else 0
+    wspd = np.random.uniform(3, 12)
+    pres = np.random.normal(1012, 5)
+    return {
+        'tavg': round(temp_avg, 1), 'tmin': round(temp_min, 1), 'tmax': round(temp_max, 1),
+        'prcp': round(prcp, 1), 'wspd': round(wspd, 1), 'pres': round(pres, 1)
+    }
+
+def benchmark_fallback(años=10):
+    """Compara la generación día por día con la vectorizada sobre `años` de fechas."""
+    fechas = pd.date_range(end=dt.date.today(), periods=int(años * 365.25))
+    manager = WeatherAPIManager(cache=CacheClima(':memory:'))
+
+    inicio = time.perf_counter()
+    por_dia = pd.DataFrame([_fallback_por_dia(f.strftime('%Y-%m-%d')) for f in fechas])
+    t_por_dia = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lote = manager.get_realistic_fallback_batch(fechas)
+    t_lote = time.perf_counter() - inicio
+
+    # Reproducibilidad: un subrango produce exactamente los mismos valores
+    sub = manager.get_realistic_fallback_batch(fechas[100:200])
+    assert sub[COLUMNAS_CLIMA].equals(lote[COLUMNAS_CLIMA].iloc[100:200].reset_index(drop=True))
+
+    print(f"Días generados: {len(fechas)}")
+    print(f"Día por día: {t_por_dia:.3f} s (más {0.1 * len(fechas):.0f} s de pausas en la versión anterior)")
+    print(f"Vectorizado: {t_lote:.4f} s ({t_por_dia / t_lote:.0f}x más rápido)")
+    print("Medias por columna (día por día vs vectorizado):")
+    print(pd.DataFrame({'por_dia': por_dia.mean(), 'vectorizado': lote[COLUMNAS_CLIMA].mean()}).round(2))
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Genera datos/clima.csv.")
+    parser.add_argument("--benchmark", action="store_true", help="Mide la generación del clima de respaldo.")
+    parser.add_argument("--malla", action="store_true",
+                        help="También genera datos/clima_ubicaciones.csv para UBICACIONES_SINALOA.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_fallback()
+    else:
+        main(malla=args.malla)
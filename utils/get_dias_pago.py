@@ -1,8 +1,12 @@
 # utils/get_dias_pago.py
 import pandas as pd
 import datetime as dt
-from pathlib import Path
 import numpy as np
+import argparse
+import time
+from functools import lru_cache
+
+import almacen
 
 # --- Funciones para días festivos mexicanos ---
 
@@ -33,6 +37,11 @@ def obtener_festivos_mexico(año):
     """
     Obtiene la lista de días festivos oficiales en México para un año dado.
     """
+    return list(_festivos_mexico(int(año)))
+
+@lru_cache(maxsize=None)
+def _festivos_mexico(año):
+    """Tabla de festivos de un año, calculada una sola vez (tupla inmutable)."""
     festivos = []
     
     # Año Nuevo
@@ -85,7 +94,12 @@ def obtener_festivos_mexico(año):
     # Navidad
     festivos.append(dt.date(año, 12, 25))
     
-    return sorted(festivos)
+    return tuple(sorted(festivos))
+
+def festivos_en_rango(start_date, end_date) -> pd.DatetimeIndex:
+    """Festivos de todos los años entre start_date y end_date como DatetimeIndex."""
+    años = range(pd.Timestamp(start_date).year, pd.Timestamp(end_date).year + 1)
+    return pd.DatetimeIndex([f for año in años for f in _festivos_mexico(año)])
 
 def es_dia_pago(fecha):
     """
@@ -112,37 +126,48 @@ def es_dia_pago(fecha):
     
     return False
 
+def marcar_dias_pago(fechas: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de es_dia_pago para una serie de fechas.
+
+    Días 15, último día del mes, días 1 y viernes.
+    """
+    return ((fechas.dt.day == 15) | fechas.dt.is_month_end | (fechas.dt.day == 1)
+            | (fechas.dt.weekday == 4))
+
+def contar_dias_desde_pago(es_pago: pd.Series) -> pd.Series:
+    """
+    Días transcurridos desde el último día de pago (0 en el propio día de pago).
+
+    Cada día de pago abre un grupo nuevo (suma acumulada) y la posición dentro del
+    grupo es la distancia al pago. El primer día del rango cuenta como 0.
+    """
+    grupos = es_pago.astype(np.int64).cumsum()
+    return es_pago.groupby(grupos).cumcount().astype(np.int64)
+
 def generar_datos_calendario(start_date, end_date):
     """
     Genera un DataFrame con información de calendario para un rango de fechas.
     """
     print("Generando datos de calendario y días especiales...")
     
-    # Crear rango de fechas
-    date_range = pd.date_range(start=start_date, end=end_date)
-    
     # Crear DataFrame base
-    df = pd.DataFrame({'date': date_range})
+    df = pd.DataFrame({'date': pd.date_range(start=start_date, end=end_date)})
+    fechas = df['date']
     
     # Información básica de fecha
-    df['año'] = df['date'].dt.year
-    df['mes'] = df['date'].dt.month
-    df['dia'] = df['date'].dt.day
-    df['dia_semana'] = df['date'].dt.day_name()
-    df['dia_semana_num'] = df['date'].dt.weekday  # 0=lunes, 6=domingo
-    df['es_fin_semana'] = df['dia_semana_num'].isin([5, 6])  # sábado y domingo
+    df['año'] = fechas.dt.year
+    df['mes'] = fechas.dt.month
+    df['dia'] = fechas.dt.day
+    df['dia_semana'] = fechas.dt.day_name()
+    df['dia_semana_num'] = fechas.dt.weekday  # 0=lunes, 6=domingo
+    df['es_fin_semana'] = df['dia_semana_num'] >= 5  # sábado y domingo
     
     # Días de pago
-    df['es_dia_pago'] = df['date'].apply(es_dia_pago)
-    
-    # Días festivos
-    años_unicos = df['año'].unique()
-    todos_festivos = []
-    for año in años_unicos:
-        festivos_año = obtener_festivos_mexico(año)
-        todos_festivos.extend(festivos_año)
+    df['es_dia_pago'] = marcar_dias_pago(fechas)
     
-    df['es_festivo'] = df['date'].dt.date.isin(todos_festivos)
+    # Días festivos (tablas por año en caché)
+    df['es_festivo'] = fechas.isin(festivos_en_rango(start_date, end_date))
     
     # Día hábil (no es fin de semana ni festivo)
     df['es_dia_habil'] = ~(df['es_fin_semana'] | df['es_festivo'])
@@ -157,12 +182,7 @@ def generar_datos_calendario(start_date, end_date):
     df['quincena'] = np.where(df['dia'] <= 15, 1, 2)
     
     # Días desde último día de pago
-    df['dias_desde_pago'] = 0
-    for i in range(1, len(df)):
-        if df.loc[i, 'es_dia_pago']:
-            df.loc[i, 'dias_desde_pago'] = 0
-        else:
-            df.loc[i, 'dias_desde_pago'] = df.loc[i-1, 'dias_desde_pago'] + 1
+    df['dias_desde_pago'] = contar_dias_desde_pago(df['es_dia_pago'])
     
     return df
 
@@ -172,11 +192,6 @@ def main():
     """
     print("Iniciando la generación de datos de días de pago y festivos...")
     
-    # Definir rutas de salida
-    output_dir = Path(__file__).parent.parent / 'datos'
-    output_dir.mkdir(exist_ok=True)
-    output_path = output_dir / 'calendario.csv'
-    
     # Rango de fechas: desde una fecha de inicio hasta el día actual
     start_date = dt.date(2024, 7, 1)  # Ajustar según necesidades
     end_date = dt.date.today()
@@ -186,7 +201,7 @@ def main():
     
     # Guardar datos
     if not calendario_df.empty:
-        calendario_df.to_csv(output_path, index=False)
+        output_path = almacen.guardar(calendario_df, 'calendario')
         print(f"Datos de calendario guardados en: {output_path}")
         print(f"Total de días procesados: {len(calendario_df)}")
         print(f"Días de pago: {calendario_df['es_dia_pago'].sum()}")
@@ -195,5 +210,58 @@ def main():
     else:
         print("No se generó el archivo CSV de calendario.")
 
+# --- Benchmark ---
+
+def _generar_datos_calendario_lento(start_date, end_date):
+    """Implementación anterior, fila por fila (referencia para la verificación)."""
+    date_range = pd.date_range(start=start_date, end=end_date)
+    df = pd.DataFrame({'date': date_range})
+    df['año'] = df['date'].dt.year
+    df['mes'] = df['date'].dt.month
+    df['dia'] = df['date'].dt.day
+    df['dia_semana'] = df['date'].dt.day_name()
+    df['dia_semana_num'] = df['date'].dt.weekday
+    df['es_fin_semana'] = df['dia_semana_num'].isin([5, 6])
+    df['es_dia_pago'] = df['date'].apply(es_dia_pago)
+    todos_festivos = []
+    for año in df['año'].unique():
+        todos_festivos.extend(obtener_festivos_mexico(año))
+    df['es_festivo'] = df['date'].dt.date.isin(todos_festivos)
+    df['es_dia_habil'] = ~(df['es_fin_semana'] | df['es_festivo'])
+    df['despues_festivo'] = df['es_festivo'].shift(1, fill_value=False)
+    df['antes_festivo'] = df['es_festivo'].shift(-1, fill_value=False)
+    df['quincena'] = np.where(df['dia'] <= 15, 1, 2)
+    df['dias_desde_pago'] = 0
+    for i in range(1, len(df)):
+        if df.loc[i, 'es_dia_pago']:
+            df.loc[i, 'dias_desde_pago'] = 0
+        else:
+            df.loc[i, 'dias_desde_pago'] = df.loc[i-1, 'dias_desde_pago'] + 1
+    return df
+
+def benchmark_calendario(años=50):
+    """Mide el tiempo de ambas versiones (la equivalencia se prueba en tests/test_get_dias_pago.py)."""
+    start_date = dt.date(2025 - años, 1, 1)
+    end_date = dt.date(2024, 12, 31)
+
+    inicio = time.perf_counter()
+    _generar_datos_calendario_lento(start_date, end_date)
+    t_lento = time.perf_counter() - inicio
+
+    _festivos_mexico.cache_clear()
+    inicio = time.perf_counter()
+    rapido = generar_datos_calendario(start_date, end_date)
+    t_rapido = time.perf_counter() - inicio
+
+    print(f"Días generados: {len(rapido)} ({años} años)")
+    print(f"Fila por fila: {t_lento:.3f} s")
+    print(f"Vectorizado: {t_rapido * 1000:.1f} ms ({t_lento / t_rapido:.0f}x más rápido)")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Genera datos/calendario.csv.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Mide el calendario vectorizado contra la versión fila por fila.")
+    if parser.parse_args().benchmark:
+        benchmark_calendario()
+    else:
+        main()
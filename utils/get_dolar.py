@@ -1,47 +1,187 @@
 # utils/get_dolar.py
 import pandas as pd
-import yfinance as yf
+import numpy as np
 import datetime as dt
 from pathlib import Path
+import argparse
+import os
 import sys
+import time
+
+import almacen
+
+# --- Constantes y Configuración ---
+
+SIMBOLO = 'USDMXN=X'
+FECHA_INICIO = dt.date(2024, 9, 9)
+
+# Caché columnar (Parquet) con la serie histórica ya descargada. Solo se pide al
+# proveedor el rango que falta, más unos días finales por si el último cierre
+# todavía era provisional. La caché recuerda hasta qué fecha se consultó, así que
+# una segunda corrida con el mismo rango no pide nada.
+RUTA_CACHE = Path(__file__).parent.parent / 'datos' / 'cache' / 'dolar.parquet'
+DIAS_REVISION = 3
+
+COLUMNAS_DOLAR = ['date', 'precio_dolar']
+
+# --- Proveedores ---
+
+def proveedor_yfinance(simbolo, start_date, end_date) -> pd.DataFrame:
+    """
+    Descarga cierres diarios de Yahoo Finance.
+
+    Un proveedor es cualquier función (simbolo, start_date, end_date) -> DataFrame con
+    'date' y 'precio_dolar' para las fechas del rango (ambos extremos incluidos).
+    """
+    import yfinance as yf
+
+    usd_df = yf.download(simbolo, start=start_date, end=end_date + dt.timedelta(days=1),
+                         progress=False, auto_adjust=False)
+    if usd_df.empty:
+        return pd.DataFrame(columns=COLUMNAS_DOLAR)
+
+    # Las versiones recientes de yfinance devuelven columnas (campo, símbolo); al
+    # escribirlas a CSV aparecía la fila fantasma con el símbolo
+    if isinstance(usd_df.columns, pd.MultiIndex):
+        usd_df.columns = usd_df.columns.get_level_values(0)
+    usd_df = usd_df[['Close']].rename(columns={'Close': 'precio_dolar'})
+    usd_df = usd_df.rename_axis('date').reset_index()
+    return usd_df
+
+def normalizar_serie(df: pd.DataFrame) -> pd.DataFrame:
+    """Deja la serie con esquema fijo: fecha sin zona horaria, precio float64, sin duplicados."""
+    if df is None or df.empty:
+        return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'),
+                             'precio_dolar': pd.Series(dtype='float64')})
+    df = df[COLUMNAS_DOLAR].copy()
+    fechas = pd.to_datetime(df['date'], errors='coerce')
+    if getattr(fechas.dt, 'tz', None) is not None:
+        fechas = fechas.dt.tz_localize(None)
+    df['date'] = fechas.dt.normalize().astype('datetime64[ns]')
+    df['precio_dolar'] = pd.to_numeric(df['precio_dolar'], errors='coerce').astype('float64')
+    df = df.dropna(subset=COLUMNAS_DOLAR)
+    df = df.drop_duplicates(subset='date', keep='last').sort_values('date')
+    return df.reset_index(drop=True)
+
+# --- Caché Local ---
+
+# Claves de los metadatos del Parquet con el rango ya consultado al proveedor
+_META_DESDE, _META_HASTA = b'consultado_desde', b'consultado_hasta'
+
+def leer_cache(path=RUTA_CACHE):
+    """
+    Lee la serie en caché.
+
+    Returns:
+        tuple: (serie, (desde, hasta) ya consultado al proveedor). Sin caché la serie
+        queda vacía; sin caché o en cachés anteriores el rango consultado es None.
+    """
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    if not path.exists():
+        return normalizar_serie(None), None
+    tabla = pq.read_table(path)
+    meta = tabla.schema.metadata or {}
+    consultado = None
+    if _META_DESDE in meta and _META_HASTA in meta:
+        consultado = (dt.date.fromisoformat(meta[_META_DESDE].decode()),
+                      dt.date.fromisoformat(meta[_META_HASTA].decode()))
+    return normalizar_serie(tabla.to_pandas()), consultado
+
+def guardar_cache(df: pd.DataFrame, path=RUTA_CACHE, consultado=None):
+    """
+    Escribe la caché de forma atómica (archivo temporal + reemplazo).
+
+    Args:
+        consultado (tuple): Rango (desde, hasta) ya consultado, que se guarda en los
+            metadatos del Parquet.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+    if consultado is not None:
+        meta = {**(tabla.schema.metadata or {}),
+                _META_DESDE: consultado[0].isoformat().encode(), _META_HASTA: consultado[1].isoformat().encode()}
+        tabla = tabla.replace_schema_metadata(meta)
+    temporal = path.with_suffix(path.suffix + '.tmp')
+    pq.write_table(tabla, temporal)
+    os.replace(temporal, path)
+
+def rangos_faltantes(cache_df: pd.DataFrame, start_date, end_date, dias_revision=DIAS_REVISION,
+                     consultado=None):
+    """
+    Calcula los rangos de fechas que hay que pedir al proveedor.
+
+    Args:
+        consultado (tuple): Rango (desde, hasta) ya consultado. Lo que cae dentro no
+            se vuelve a pedir, ni siquiera los días de revisión. None si no se conoce
+            (se piden siempre los días de revisión).
+
+    Returns:
+        list: Tuplas (inicio, fin) de dt.date, con ambos extremos incluidos.
+    """
+    if cache_df.empty and consultado is None:
+        return [(start_date, end_date)]
+    rangos = []
+    primera = consultado[0] if consultado else cache_df['date'].iloc[0].date()
+    if start_date < primera:
+        rangos.append((start_date, primera - dt.timedelta(days=1)))
+    if consultado is None or end_date > consultado[1]:
+        ultima = cache_df['date'].iloc[-1].date() if not cache_df.empty else consultado[1]
+        desde = max(ultima - dt.timedelta(days=dias_revision), start_date)
+        if desde <= end_date:
+            rangos.append((desde, end_date))
+    return rangos
 
 # --- Función Principal ---
 
-def get_dolar_data(start_date, end_date):
+def get_dolar_data(start_date, end_date, proveedor=proveedor_yfinance, cache_path=RUTA_CACHE):
     """
-    Descarga los datos del tipo de cambio USD/MXN desde Yahoo Finance.
+    Obtiene el tipo de cambio USD/MXN, descargando solo lo que falta en la caché local.
 
     Args:
-        start_date (dt.date): Fecha de inicio para la descarga de datos.
-        end_date (dt.date): Fecha de fin para la descarga de datos.
+        start_date (dt.date): Fecha de inicio de la serie.
+        end_date (dt.date): Fecha de fin de la serie.
+        proveedor (callable): Fuente de datos (ver proveedor_yfinance); se puede
+            reemplazar por una función sin conexión.
+        cache_path (Path): Ruta de la caché Parquet. None para no usar caché.
 
     Returns:
         pd.DataFrame: Un DataFrame con 'date' y 'precio_dolar'.
     """
-    print("Descargando datos del tipo de cambio USD/MXN...")
-    try:
-        # Descargar datos para el par USD/MXN
-        usd_df = yf.download('USDMXN=X', start=start_date, end=end_date + dt.timedelta(days=1))
-        
-        if usd_df.empty:
-            print("No se pudieron descargar los datos del dólar.", file=sys.stderr)
-            return pd.DataFrame()
-
-        # Procesar datos
-        usd_df = usd_df[['Close']].copy()
-        usd_df.rename(columns={'Close': 'precio_dolar'}, inplace=True)
-        usd_df.reset_index(inplace=True)
-        usd_df.rename(columns={'Date': 'date'}, inplace=True)
-        
-        # Asegurarse de que la fecha no tenga zona horaria
-        usd_df['date'] = usd_df['date'].dt.tz_localize(None)
-        
-        print("Datos del dólar obtenidos y procesados exitosamente.")
-        return usd_df
-
-    except Exception as e:
-        print(f"Error al descargar los datos del dólar: {e}", file=sys.stderr)
-        return pd.DataFrame()
+    print("Actualizando datos del tipo de cambio USD/MXN...")
+    cache_df, consultado = leer_cache(cache_path) if cache_path is not None else (normalizar_serie(None), None)
+
+    rangos = rangos_faltantes(cache_df, start_date, end_date, consultado=consultado)
+    descargas, fallos = [], 0
+    for inicio, fin in rangos:
+        print(f"Descargando {SIMBOLO} del {inicio} al {fin}...")
+        try:
+            descargas.append(normalizar_serie(proveedor(SIMBOLO, inicio, fin)))
+        except Exception as e:
+            fallos += 1
+            print(f"Error al descargar los datos del dólar: {e}", file=sys.stderr)
+
+    nuevos = [d for d in descargas if not d.empty]
+    # Lo descargado reemplaza a lo guardado en las fechas comunes
+    serie = normalizar_serie(pd.concat([cache_df] + nuevos, ignore_index=True)) if nuevos else cache_df
+    if nuevos:
+        print(f"{sum(len(d) for d in nuevos)} cierres descargados; {len(serie)} en caché.")
+    # El rango consultado solo avanza si todas las descargas respondieron
+    if rangos and not fallos:
+        consultado = (min(start_date, consultado[0]), max(end_date, consultado[1])) if consultado \
+            else (start_date, end_date)
+    if cache_path is not None and (nuevos or (rangos and not fallos)):
+        guardar_cache(serie, cache_path, consultado)
+
+    serie = serie[(serie['date'] >= pd.Timestamp(start_date)) & (serie['date'] <= pd.Timestamp(end_date))]
+    if serie.empty:
+        print("No se pudieron obtener los datos del dólar.", file=sys.stderr)
+    return serie.reset_index(drop=True)
 
 # --- Bloque de Ejecución ---
 
@@ -50,25 +190,76 @@ def main():
     Función principal para ejecutar el script de forma independiente.
     """
     print("Iniciando la actualización de datos del dólar...")
-    
+
     # Rango de fechas
-    start_date = dt.date(2024, 9, 9)
+    start_date = FECHA_INICIO
     end_date = dt.date.today()
 
     # Obtener datos
     dolar_df = get_dolar_data(start_date, end_date)
 
-    # Definir rutas de salida
-    output_dir = Path(__file__).parent.parent / 'datos'
-    output_dir.mkdir(exist_ok=True)
-    output_path = output_dir / 'dolar.csv'
-
     # Guardar datos
     if not dolar_df.empty:
-        dolar_df.to_csv(output_path, index=False)
+        output_path = almacen.guardar(dolar_df, 'dolar')
         print(f"Datos del dólar guardados en: {output_path}")
     else:
         print("No se generó el archivo CSV del dólar.")
 
+# --- Benchmark ---
+
+class ProveedorSintetico:
+    """Proveedor sin conexión: caminata aleatoria determinista en días hábiles."""
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+        self.dias_pedidos = 0
+        self.llamadas = 0
+        self.rangos = []
+
+    def __call__(self, simbolo, start_date, end_date):
+        self.llamadas += 1
+        self.rangos.append((start_date, end_date))
+        time.sleep(self.latencia)
+        fechas = pd.bdate_range(start_date, end_date)
+        self.dias_pedidos += (end_date - start_date).days + 1
+        dias = fechas.values.astype('datetime64[D]').astype(np.int64)
+        # El valor de cada día depende solo de la fecha, igual que una fuente real
+        precio = 18.0 + 2.0 * np.sin(dias / 200.0) + 0.1 * np.cos(dias * 1.7)
+        return pd.DataFrame({'date': fechas, 'precio_dolar': precio})
+
+def benchmark_cache(años=10, corridas=30):
+    """Simula `corridas` ejecuciones diarias y compara los días pedidos con y sin caché."""
+    import tempfile
+
+    inicio_serie = dt.date.today() - dt.timedelta(days=int(años * 365.25))
+    hoy = dt.date.today() - dt.timedelta(days=corridas)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = Path(tmp) / 'dolar.parquet'
+        con_cache, sin_cache = ProveedorSintetico(), ProveedorSintetico()
+        get_dolar_data(inicio_serie, hoy, con_cache, cache_path)
+        dias_inicial = con_cache.dias_pedidos
+
+        t_con = t_sin = 0.0
+        for _ in range(corridas):
+            hoy += dt.timedelta(days=1)
+            t = time.perf_counter()
+            serie = get_dolar_data(inicio_serie, hoy, con_cache, cache_path)
+            t_con += time.perf_counter() - t
+            t = time.perf_counter()
+            completa = get_dolar_data(inicio_serie, hoy, sin_cache, None)
+            t_sin += time.perf_counter() - t
+
+    pd.testing.assert_frame_equal(serie, completa)
+    por_corrida = (con_cache.dias_pedidos - dias_inicial) / corridas
+    print(f"\nHistoria: {años} años, {corridas} corridas diarias")
+    print(f"Sin caché: {sin_cache.dias_pedidos / corridas:.0f} días pedidos por corrida, {t_sin / corridas * 1000:.1f} ms")
+    print(f"Con caché: {por_corrida:.0f} días pedidos por corrida, {t_con / corridas * 1000:.1f} ms")
+    print("La serie con caché es idéntica a la descarga completa.")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Genera datos/dolar.csv.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Simula corridas diarias con un proveedor sin conexión.")
+    if parser.parse_args().benchmark:
+        benchmark_cache()
+    else:
+        main()
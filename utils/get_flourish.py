@@ -0,0 +1,31 @@
+# utils/get_flourish.py
+import argparse
+import sys
+
+from flourish import FUENTES, scrape_varios
+from get_homicidios import guardar_homicidios
+from get_robos import guardar_robos
+
+# --- Bloque de Ejecución ---
+
+def main(incremental=True):
+    """
+    Obtiene homicidios y robos en una sola sesión de navegador compartida.
+
+    Robos sigue siendo opcional, como cuando era su propia etapa: si falla se
+    reporta y el merge usa el robos.csv de la corrida anterior. Solo una falla
+    de homicidios hace fallar la etapa.
+    """
+    print("Iniciando la actualización de datos de Flourish (homicidios y robos)...")
+
+    resultados = scrape_varios(FUENTES)
+    guardar_homicidios(resultados["homicidios"], incremental=incremental)
+    try:
+        guardar_robos(resultados["robos"], incremental=incremental)
+    except Exception as e:
+        print(f"Error al guardar robos (opcional, se conserva el archivo anterior): {e}", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Actualiza homicidios.csv y robos.csv.")
+    parser.add_argument("--completo", action="store_true", help="Reescribe toda la historia.")
+    main(incremental=not parser.parse_args().completo)
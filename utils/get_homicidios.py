@@ -1,155 +1,74 @@
 # utils/get_homicidios.py
-import pandas as pd
-import re
-import datetime as dt
+import argparse
 from pathlib import Path
-import time
-import sys
 
-# Para web scraping
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
+from flourish import HO_URL, scrape_flourish
+from incremental import actualizar_serie_csv
+import almacen
 
-# --- Constantes y Configuración ---
+# --- Procesamiento y Guardado ---
 
-# Regex para extraer datos de Flourish
-REGEX_DL = re.compile(r",\s*(\d{2}-[a-z]{3}-\d{2}):\s*(\d+)", re.I)
-MES = {"ene":"jan","feb":"feb","mar":"mar","abr":"apr","may":"may","jun":"jun",
-       "jul":"jul","ago":"aug","sep":"sep","oct":"oct","nov":"nov","dic":"dec"}
+# Filas que un cambio en un día afecta en los promedios móviles centrados
+CONTEXTO_PROMEDIOS = 30 - 1
 
-HO_URL = "https://flo.uri.sh/visualisation/19405940/embed?auto=1"
-RB_URL = "https://flo.uri.sh/visualisation/21616394/embed" # URL para robos, por si se necesita
+def calcular_promedios_moviles(homicidios_df):
+    """Calcula los promedios móviles centrados de 7 y 30 días."""
+    # Promedio móvil de 7 días
+    homicidios_df['homicidios_ma7'] = homicidios_df['homicidios'].rolling(window=7, center=True).mean()
+    # Promedio móvil de 30 días
+    homicidios_df['homicidios_ma30'] = homicidios_df['homicidios'].rolling(window=30, center=True).mean()
+    return homicidios_df
 
-# --- Funciones Auxiliares ---
-
-def date_es(txt: str) -> dt.date:
-    """Convierte fecha en español a formato date"""
-    try:
-        d, m, y = txt.split("-")
-        return dt.datetime.strptime(f"{d}-{MES[m.lower()]}-{y}", "%d-%b-%y").date()
-    except (ValueError, KeyError) as e:
-        print(f"Error al procesar fecha: {txt}. Error: {e}", file=sys.stderr)
-        return None
-
-def get_driver():
-    """Configura y devuelve un driver de Chrome para scraping"""
-    opt = Options()
-    opt.add_argument("--headless=new")
-    opt.add_argument("--disable-gpu")
-    opt.add_argument("--no-sandbox")
-    opt.add_argument("--disable-dev-shm-usage")
-    opt.add_argument("--disable-logging")
-    opt.add_argument("--log-level=3")
-    
-    try:
-        service = Service(ChromeDriverManager().install())
-        return webdriver.Chrome(service=service, options=opt)
-    except Exception as e:
-        print(f"Error al configurar el driver de Chrome: {e}", file=sys.stderr)
-        return None
-
-# --- Función Principal de Scraping ---
-
-def scrape_flourish(url: str, col: str, max_retries: int = 3) -> pd.DataFrame:
+def guardar_homicidios(homicidios_df, output_path=None, incremental=True):
     """
-    Realiza scraping de datos de una visualización de Flourish.
-    
-    Args:
-        url (str): La URL de la visualización de Flourish.
-        col (str): El nombre de la columna para los datos extraídos.
-        max_retries (int): Número máximo de reintentos.
+    Calcula los promedios móviles y guarda los datos de homicidios.
 
-    Returns:
-        pd.DataFrame: Un DataFrame con 'date' y la columna especificada.
+    Args:
+        homicidios_df (pd.DataFrame): DataFrame con 'date' y 'homicidios'.
+        output_path (Path): Ruta de la copia CSV. Por defecto, datos/homicidios.csv; la
+            tabla Feather se guarda junto a ella (ver almacen).
+        incremental (bool): Si solo se agregan o corrigen los días nuevos o revisados,
+            recalculando los promedios únicamente en la cola afectada.
     """
-    for attempt in range(max_retries):
-        driver = None
-        try:
-            print(f"Intento {attempt + 1}/{max_retries} para obtener datos de {col}...")
-            driver = get_driver()
-            if not driver:
-                print("Driver no disponible, saltando intento.", file=sys.stderr)
-                time.sleep(5)
-                continue
+    if output_path is None:
+        output_dir = Path(__file__).parent.parent / 'datos'
+        output_dir.mkdir(exist_ok=True)
+        output_path = output_dir / 'homicidios.csv'
 
-            driver.get(url)
-            
-            # Espera a que los elementos de datos carguen usando un selector más específico
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "path.data-point[aria-label]"))
-            )
-            
-            # Extraer datos directamente de los elementos
-            registros = []
-            elements = driver.find_elements(By.CSS_SELECTOR, "path.data-point[aria-label]")
-            
-            for el in elements:
-                match = REGEX_DL.search(el.get_attribute("aria-label"))
-                if match:
-                    fecha_str, valor = match.groups()
-                    registros.append({"fecha_str": fecha_str, col: int(valor)})
+    if homicidios_df.empty:
+        print("No se generó el archivo CSV de homicidios porque no se obtuvieron datos.")
+        return
 
-            if not registros:
-                print(f"No se encontraron datos en el intento {attempt + 1}", file=sys.stderr)
-                time.sleep(5)
-                continue
+    output_path = Path(output_path)
+    if incremental:
+        resultado = actualizar_serie_csv(output_path, homicidios_df, 'homicidios',
+                                         recalcular=calcular_promedios_moviles, contexto=CONTEXTO_PROMEDIOS)
+        if resultado['filas_escritas'] or not almacen.ruta(output_path.stem, output_path.parent).exists():
+            almacen.reemplazar_cola(output_path.stem, resultado['cola'], output_path.parent)
+        print(f"Datos de homicidios actualizados en: {output_path}")
+        return
 
-            # Procesar y limpiar datos
-            df = pd.DataFrame(registros)
-            df["date"] = df["fecha_str"].apply(date_es)
-            df = df.dropna(subset=['date']) # Eliminar fechas que no se pudieron procesar
-            df[col] = pd.to_numeric(df[col])
-            df = df.groupby("date")[col].sum().reset_index()
-            df = df.sort_values("date", ascending=True).reset_index(drop=True)
-            
-            print(f"Datos de {col} obtenidos exitosamente.")
-            return df[["date", col]]
+    # Calcular promedio móvil de homicidios
+    print("Calculando promedio móvil de homicidios...")
+    homicidios_df = calcular_promedios_moviles(homicidios_df)
 
-        except Exception as e:
-            print(f"Error en el intento {attempt + 1} para {col}: {e}", file=sys.stderr)
-            time.sleep(5)
-        finally:
-            if driver:
-                driver.quit()
-    
-    print(f"No se pudieron obtener los datos de {col} después de {max_retries} intentos.", file=sys.stderr)
-    return pd.DataFrame()
+    # Guardar datos
+    almacen.guardar(homicidios_df, output_path.stem, output_path.parent)
+    print(f"Datos de homicidios guardados en: {output_path}")
 
 # --- Bloque de Ejecución ---
 
-def main():
+def main(incremental=True):
     """
     Función principal para ejecutar el script de forma independiente.
     """
     print("Iniciando la actualización de datos de homicidios...")
-    
-    # Definir rutas de salida
-    output_dir = Path(__file__).parent.parent / 'datos'
-    output_dir.mkdir(exist_ok=True)
-    output_path = output_dir / 'homicidios.csv'
 
-    # Obtener datos
+    # Obtener y guardar datos
     homicidios_df = scrape_flourish(HO_URL, "homicidios")
-
-    # Calcular promedio móvil de homicidios
-    if not homicidios_df.empty:
-        print("Calculando promedio móvil de homicidios...")
-        # Promedio móvil de 7 días
-        homicidios_df['homicidios_ma7'] = homicidios_df['homicidios'].rolling(window=7, center=True).mean()
-        # Promedio móvil de 30 días
-        homicidios_df['homicidios_ma30'] = homicidios_df['homicidios'].rolling(window=30, center=True).mean()
-
-    # Guardar datos
-    if not homicidios_df.empty:
-        homicidios_df.to_csv(output_path, index=False)
-        print(f"Datos de homicidios guardados en: {output_path}")
-    else:
-        print("No se generó el archivo CSV de homicidios porque no se obtuvieron datos.")
+    guardar_homicidios(homicidios_df, incremental=incremental)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Actualiza datos/homicidios.csv.")
+    parser.add_argument("--completo", action="store_true", help="Reescribe toda la historia.")
+    main(incremental=not parser.parse_args().completo)
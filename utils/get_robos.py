@@ -1,146 +1,56 @@
 # utils/get_robos.py
-import pandas as pd
-import re
-import datetime as dt
+import argparse
 from pathlib import Path
-import time
-import sys
 
-# Para web scraping
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
+from flourish import RB_URL, scrape_flourish
+from incremental import actualizar_serie_csv
+import almacen
 
-# --- Constantes y Configuración ---
+# --- Guardado ---
 
-# Regex para extraer datos de Flourish
-REGEX_DL = re.compile(r",\s*(\d{2}-[a-z]{3}-\d{2}):\s*(\d+)", re.I)
-MES = {"ene":"jan","feb":"feb","mar":"mar","abr":"apr","may":"may","jun":"jun",
-       "jul":"jul","ago":"aug","sep":"sep","oct":"oct","nov":"nov","dic":"dec"}
-
-RB_URL = "https://flo.uri.sh/visualisation/21616394/embed" # URL para robos
-
-# --- Funciones Auxiliares ---
-
-def date_es(txt: str) -> dt.date:
-    """Convierte fecha en español a formato date"""
-    try:
-        d, m, y = txt.split("-")
-        return dt.datetime.strptime(f"{d}-{MES[m.lower()]}-{y}", "%d-%b-%y").date()
-    except (ValueError, KeyError) as e:
-        print(f"Error al procesar fecha: {txt}. Error: {e}", file=sys.stderr)
-        return None
-
-def get_driver():
-    """Configura y devuelve un driver de Chrome para scraping"""
-    opt = Options()
-    opt.add_argument("--headless=new")
-    opt.add_argument("--disable-gpu")
-    opt.add_argument("--no-sandbox")
-    opt.add_argument("--disable-dev-shm-usage")
-    opt.add_argument("--disable-logging")
-    opt.add_argument("--log-level=3")
-    
-    try:
-        service = Service(ChromeDriverManager().install())
-        return webdriver.Chrome(service=service, options=opt)
-    except Exception as e:
-        print(f"Error al configurar el driver de Chrome: {e}", file=sys.stderr)
-        return None
-
-# --- Función Principal de Scraping ---
-
-def scrape_flourish(url: str, col: str, max_retries: int = 3) -> pd.DataFrame:
+def guardar_robos(robos_df, output_path=None, incremental=True):
     """
-    Realiza scraping de datos de una visualización de Flourish.
-    
-    Args:
-        url (str): La URL de la visualización de Flourish.
-        col (str): El nombre de la columna para los datos extraídos.
-        max_retries (int): Número máximo de reintentos.
+    Guarda los datos de robos de vehículos.
 
-    Returns:
-        pd.DataFrame: Un DataFrame con 'date' y la columna especificada.
+    Args:
+        robos_df (pd.DataFrame): DataFrame con 'date' y 'robos'.
+        output_path (Path): Ruta de la copia CSV. Por defecto, datos/robos.csv; la
+            tabla Feather se guarda junto a ella (ver almacen).
+        incremental (bool): Si solo se agregan o corrigen los días nuevos o revisados.
     """
-    for attempt in range(max_retries):
-        driver = None
-        try:
-            print(f"Intento {attempt + 1}/{max_retries} para obtener datos de {col}...")
-            driver = get_driver()
-            if not driver:
-                print("Driver no disponible, saltando intento.", file=sys.stderr)
-                time.sleep(5)
-                continue
-
-            driver.get(url)
-            
-            # Espera a que los elementos de datos carguen usando un selector más específico
-            WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "path.data-point[aria-label]"))
-            )
-            
-            # Extraer datos directamente de los elementos
-            registros = []
-            elements = driver.find_elements(By.CSS_SELECTOR, "path.data-point[aria-label]")
-            
-            for el in elements:
-                match = REGEX_DL.search(el.get_attribute("aria-label"))
-                if match:
-                    fecha_str, valor = match.groups()
-                    registros.append({"fecha_str": fecha_str, col: int(valor)})
+    if output_path is None:
+        output_dir = Path(__file__).parent.parent / 'datos'
+        output_dir.mkdir(exist_ok=True)
+        output_path = output_dir / 'robos.csv'
 
-            if not registros:
-                print(f"No se encontraron datos en el intento {attempt + 1}", file=sys.stderr)
-                time.sleep(5)
-                continue
+    if robos_df.empty:
+        print("No se generó el archivo CSV de robos porque no se obtuvieron datos.")
+        return
 
-            # Procesar y limpiar datos
-            df = pd.DataFrame(registros)
-            df["date"] = df["fecha_str"].apply(date_es)
-            df = df.dropna(subset=['date']) # Eliminar fechas que no se pudieron procesar
-            df[col] = pd.to_numeric(df[col])
-            df = df.groupby("date")[col].sum().reset_index()
-            df = df.sort_values("date", ascending=True).reset_index(drop=True)
-            
-            print(f"Datos de {col} obtenidos exitosamente.")
-            return df[["date", col]]
+    output_path = Path(output_path)
+    if incremental:
+        resultado = actualizar_serie_csv(output_path, robos_df, 'robos')
+        if resultado['filas_escritas'] or not almacen.ruta(output_path.stem, output_path.parent).exists():
+            almacen.reemplazar_cola(output_path.stem, resultado['cola'], output_path.parent)
+        print(f"Datos de robos actualizados en: {output_path}")
+        return
 
-        except Exception as e:
-            print(f"Error en el intento {attempt + 1} para {col}: {e}", file=sys.stderr)
-            time.sleep(5)
-        finally:
-            if driver:
-                driver.quit()
-    
-    print(f"No se pudieron obtener los datos de {col} después de {max_retries} intentos.", file=sys.stderr)
-    return pd.DataFrame()
+    almacen.guardar(robos_df, output_path.stem, output_path.parent)
+    print(f"Datos de robos guardados en: {output_path}")
 
 # --- Bloque de Ejecución ---
 
-def main():
+def main(incremental=True):
     """
     Función principal para ejecutar el script de forma independiente.
     """
     print("Iniciando la actualización de datos de robos de vehículos...")
-    
-    # Definir rutas de salida
-    output_dir = Path(__file__).parent.parent / 'datos'
-    output_dir.mkdir(exist_ok=True)
-    output_path = output_dir / 'robos.csv'
 
-    # Obtener datos
+    # Obtener y guardar datos
     robos_df = scrape_flourish(RB_URL, "robos")
-
-    # Guardar datos
-    if not robos_df.empty:
-        robos_df.to_csv(output_path, index=False)
-        print(f"Datos de robos guardados en: {output_path}")
-    else:
-        print("No se generó el archivo CSV de robos porque no se obtuvieron datos.")
+    guardar_robos(robos_df, incremental=incremental)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Actualiza datos/robos.csv.")
+    parser.add_argument("--completo", action="store_true", help="Reescribe toda la historia.")
+    main(incremental=not parser.parse_args().completo)
@@ -0,0 +1,176 @@
+# utils/incremental.py
+import io
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# --- Constantes y Configuración ---
+
+# Días hacia atrás (desde la última fecha guardada) en los que se buscan revisiones
+# de la fuente. Puntos más antiguos se asumen estables; usar una corrida completa
+# para reconstruir toda la historia.
+VENTANA_REVISION = 90
+
+# --- Lectura y Escritura de la Cola del CSV ---
+
+def leer_cola_csv(path, n_filas: int, bloque: int = 64 * 1024):
+    """
+    Lee solo las últimas `n_filas` de un CSV sin recorrer el archivo completo.
+
+    Args:
+        path (Path): Ruta del CSV (con encabezado y columna 'date').
+        n_filas (int): Número de filas finales a leer.
+        bloque (int): Tamaño en bytes de cada lectura desde el final.
+
+    Returns:
+        tuple: (DataFrame con las filas leídas, lista con el offset en bytes donde
+        empieza cada fila más el del final del archivo, bool indicando si se leyó
+        el archivo completo).
+    """
+    with open(path, 'rb') as f:
+        encabezado = f.readline()
+        inicio_datos = f.tell()
+        f.seek(0, io.SEEK_END)
+        pos = f.tell()
+        datos = b''
+        # Se necesita una línea extra porque la primera puede quedar cortada
+        while pos > inicio_datos and datos.count(b'\n') <= n_filas:
+            leer = min(bloque, pos - inicio_datos)
+            pos -= leer
+            f.seek(pos)
+            datos = f.read(leer) + datos
+
+    if pos > inicio_datos:
+        corte = datos.index(b'\n') + 1
+        pos += corte
+        datos = datos[corte:]
+
+    lineas = datos.splitlines(keepends=True)
+    if lineas and not lineas[-1].endswith(b'\n'):
+        lineas[-1] += b'\n'
+    if len(lineas) > n_filas:
+        sobrantes = lineas[:len(lineas) - n_filas]
+        pos += sum(len(linea) for linea in sobrantes)
+        lineas = lineas[len(sobrantes):]
+
+    offsets = []
+    for linea in lineas:
+        offsets.append(pos)
+        pos += len(linea)
+    offsets.append(pos)
+
+    completo = offsets[0] == inicio_datos
+    if not lineas:
+        return pd.DataFrame(), offsets, completo
+    cola = pd.read_csv(io.BytesIO(encabezado + b''.join(lineas)), parse_dates=['date'])
+    return cola, offsets, completo
+
+def contar_filas_csv(path, bloque: int = 1024 * 1024) -> int:
+    """Número de filas de datos del CSV (sin el encabezado), contando saltos de línea por bloques."""
+    saltos = 0
+    ultimo = b'\n'
+    with open(path, 'rb') as f:
+        while datos := f.read(bloque):
+            saltos += datos.count(b'\n')
+            ultimo = datos[-1:]
+    # La última línea puede no terminar en salto de línea
+    return max(saltos + (ultimo != b'\n') - 1, 0)
+
+def reescribir_cola_csv(path, offset: int, cola_df: pd.DataFrame):
+    """Trunca el CSV en `offset` y escribe `cola_df` (sin encabezado) a partir de ahí."""
+    with open(path, 'r+b') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(cola_df.to_csv(index=False, header=False).encode('utf-8'))
+
+# --- Actualización Incremental ---
+
+def _escribir_completo(path, nuevo_df, recalcular):
+    df = nuevo_df.sort_values('date').reset_index(drop=True)
+    if recalcular is not None:
+        df = recalcular(df)
+    df.to_csv(path, index=False)
+    return {'nuevas': list(df['date']), 'revisadas': [], 'filas_escritas': len(df), 'cola': df}
+
+def actualizar_serie_csv(path, nuevo_df: pd.DataFrame, col: str, recalcular=None,
+                         contexto: int = 0, ventana_revision: int = VENTANA_REVISION) -> dict:
+    """
+    Inserta o actualiza en un CSV los puntos nuevos o revisados de una serie diaria.
+
+    Usa la última fecha guardada como marca de agua: solo se comparan los puntos de
+    los últimos `ventana_revision` días y solo se reescribe la cola afectada del
+    archivo, de modo que el trabajo depende de los días nuevos y no de toda la historia.
+
+    Args:
+        path (Path): Ruta del CSV de la serie.
+        nuevo_df (pd.DataFrame): Serie obtenida de la fuente, con 'date' y col.
+        col (str): Columna con los valores de la serie.
+        recalcular (callable): Función que recibe un DataFrame ordenado con 'date' y col
+            y devuelve el mismo DataFrame con las columnas derivadas recalculadas.
+        contexto (int): Filas que un cambio afecta hacia atrás en las columnas derivadas
+            (p. ej. ventana - 1 para una media móvil).
+        ventana_revision (int): Días hacia atrás en los que se buscan revisiones.
+
+    Returns:
+        dict: Fechas nuevas, fechas revisadas, número de filas escritas y las filas
+        reescritas ('cola'), para replicar el cambio en otros formatos.
+    """
+    path = Path(path)
+    nuevo_df = nuevo_df[['date', col]].copy()
+    nuevo_df['date'] = pd.to_datetime(nuevo_df['date'])
+
+    if not path.exists() or path.stat().st_size == 0:
+        print(f"No existe {path.name}; se escribe la serie completa.")
+        return _escribir_completo(path, nuevo_df, recalcular)
+
+    n_filas = ventana_revision + 2 * contexto
+    while True:
+        cola, offsets, completo = leer_cola_csv(path, n_filas)
+        if cola.empty:
+            return _escribir_completo(path, nuevo_df, recalcular)
+
+        marca_agua = cola['date'].max()
+        inicio_revision = marca_agua - pd.Timedelta(days=ventana_revision)
+
+        # Combinar lo guardado con lo obtenido (la fuente manda en las fechas comunes)
+        recientes = nuevo_df[nuevo_df['date'] >= max(inicio_revision, cola['date'].min())]
+        guardado = cola.set_index('date')[col]
+        obtenido = recientes.set_index('date')[col]
+        comunes = guardado.index.intersection(obtenido.index)
+        revisadas = comunes[guardado.loc[comunes].values != obtenido.loc[comunes].values]
+        # Fechas que no estaban guardadas: días posteriores a la marca de agua o huecos
+        nuevas = obtenido.index.difference(guardado.index)
+
+        if len(revisadas) == 0 and len(nuevas) == 0:
+            print(f"Sin cambios en {col} desde {marca_agua.date()}; no se reescribe el archivo.")
+            return {'nuevas': [], 'revisadas': [], 'filas_escritas': 0, 'cola': cola.iloc[:0]}
+
+        combinado = guardado.copy()
+        combinado.loc[revisadas] = obtenido.loc[revisadas]
+        combinado = pd.concat([combinado, obtenido.loc[nuevas]]).sort_index()
+        combinado = combinado.rename_axis('date').reset_index()
+
+        primer_cambio = combinado.index[combinado['date'] == min(list(revisadas) + list(nuevas))][0]
+        inicio_escritura = max(primer_cambio - contexto, 0)
+        # Las filas reescritas necesitan a su vez `contexto` filas previas intactas
+        if inicio_escritura - contexto >= 0 or completo:
+            break
+        n_filas *= 2
+
+    print(f"Última fecha almacenada de {col}: {marca_agua.date()}")
+    for fecha in revisadas:
+        print(f"Revisión de la fuente en {col} para {fecha.date()}: "
+              f"{guardado.loc[fecha]} -> {obtenido.loc[fecha]}", file=sys.stderr)
+
+    if recalcular is not None:
+        combinado = recalcular(combinado)
+    # Conservar el orden de columnas del archivo
+    combinado = combinado.reindex(columns=cola.columns)
+
+    cola_nueva = combinado.iloc[inicio_escritura:]
+    reescribir_cola_csv(path, offsets[inicio_escritura], cola_nueva)
+    print(f"{col}: {len(nuevas)} días nuevos, {len(revisadas)} revisados, "
+          f"{len(cola_nueva)} filas reescritas.")
+    return {'nuevas': list(nuevas), 'revisadas': list(revisadas), 'filas_escritas': len(cola_nueva),
+            'cola': cola_nueva.reset_index(drop=True)}
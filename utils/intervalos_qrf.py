@@ -0,0 +1,239 @@
+# utils/intervalos_qrf.py
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import backtest
+from bosque_compilado import BosqueCompilado
+
+# --- Constantes y Configuración ---
+
+CUANTILES = (0.1, 0.5, 0.9)
+
+# Ventanas de la sección 13 de analisis_alternativo.ipynb
+TRAIN_WINDOW_CUANTILES = 200
+TEST_WINDOW_CUANTILES = 14
+GAP_CUANTILES = 7
+
+# Tolerancia al comparar la distribución acumulada con cada cuantil
+EPSILON = 1e-12
+
+# --- Bosque de Cuantiles ---
+
+class IntervalosQRF:
+    """
+    Cuantiles de un RandomForest ya entrenado (quantile regression forest de
+    Meinshausen): el peso de cada fila de referencia para una consulta es el
+    promedio, sobre los árboles, de 1/|hoja| si comparte hoja con ella.
+
+    Al ajustar se guarda, por hoja, la distribución de los objetivos de referencia
+    sobre sus valores únicos (matriz dispersa hojas × valores). Los cuantiles de un
+    lote salen de un solo recorrido del bosque: la matriz de pertenencia
+    (filas × hojas) por esa distribución da la distribución de cada fila, y cada
+    cuantil es el primer valor cuya acumulada lo alcanza. Como la acumulada es
+    monótona, los cuantiles no se cruzan.
+    """
+    def __init__(self, modelo, X_ref, y_ref):
+        """
+        Args:
+            modelo: RandomForestRegressor entrenado o su BosqueCompilado.
+            X_ref, y_ref: Filas de referencia, normalmente las de entrenamiento.
+        """
+        self.bosque = modelo if isinstance(modelo, BosqueCompilado) else BosqueCompilado(modelo)
+        # Valor de cada hoja en float64: el bosque compilado lo guarda en float32 y
+        # 'pred' no coincidiría exactamente con modelo.predict
+        if isinstance(modelo, BosqueCompilado):
+            self.valor_hojas = modelo.valor.astype(np.float64)
+        else:
+            arboles = modelo.estimators_ if hasattr(modelo, 'estimators_') else [modelo]
+            self.valor_hojas = np.concatenate([e.tree_.value.ravel() for e in arboles])
+        y_ref = np.asarray(y_ref, dtype=np.float64)
+        validas = ~np.isnan(y_ref)
+        X_ref = X_ref[validas] if hasattr(X_ref, 'iloc') else np.asarray(X_ref)[validas]
+        self.valores, indice = np.unique(y_ref[validas], return_inverse=True)
+
+        hojas = self._hojas(X_ref)
+        n_hojas = len(self.bosque.valor)
+        conteos = sparse.csr_matrix(
+            (np.ones(hojas.size), (hojas.ravel(), np.repeat(indice, self.bosque.n_arboles))),
+            shape=(n_hojas, len(self.valores)),
+        )
+        tamaño = np.asarray(conteos.sum(axis=1)).ravel()
+        inverso = np.divide(1.0, tamaño, out=np.zeros_like(tamaño), where=tamaño > 0)
+        self.distribucion = sparse.diags(inverso) @ conteos
+
+    def _hojas(self, X) -> np.ndarray:
+        return self.bosque.apply(X) + self.bosque.raices
+
+    def distribuciones(self, X) -> np.ndarray:
+        """Probabilidad de cada valor de `self.valores` para cada fila, (filas, valores)."""
+        return self._distribuciones(self._hojas(X))
+
+    def _distribuciones(self, hojas) -> np.ndarray:
+        n, t = hojas.shape
+        pertenencia = sparse.csr_matrix(
+            (np.full(n * t, 1.0 / t), hojas.ravel(), np.arange(0, n * t + 1, t)),
+            shape=(n, len(self.bosque.valor)),
+        )
+        p = (pertenencia @ self.distribucion).toarray()
+        # Hojas sin filas de referencia (si la referencia no es la de entrenamiento)
+        total = p.sum(axis=1, keepdims=True)
+        return np.divide(p, total, out=np.zeros_like(p), where=total > 0)
+
+    def cuantiles(self, X, q=CUANTILES) -> np.ndarray:
+        """
+        Cuantiles de cada fila.
+
+        Returns:
+            np.ndarray: (filas, len(q)), no decrecientes a lo largo de q ordenado.
+        """
+        return self._cuantiles(self._hojas(X), q)
+
+    def _cuantiles(self, hojas, q) -> np.ndarray:
+        acumulada = np.cumsum(self._distribuciones(hojas), axis=1)
+        q = np.asarray(q, dtype=np.float64)
+        indices = (acumulada[:, :, None] < q[None, None, :] - EPSILON).sum(axis=1)
+        return self.valores[np.minimum(indices, len(self.valores) - 1)]
+
+    def intervalos(self, X, q=CUANTILES) -> pd.DataFrame:
+        """
+        Predicción puntual del bosque y columnas q10/q50/q90 (o las pedidas), con un solo recorrido.
+
+        'pred' es idéntica a `modelo.predict` si se construyó con el RandomForest de
+        sklearn; con un BosqueCompilado, la de su `predict` (hojas en float32).
+        """
+        hojas = self._hojas(X)
+        resultado = pd.DataFrame(self._cuantiles(hojas, q), columns=[f"q{round(c * 100):02d}" for c in q])
+        # Suma árbol por árbol, en el mismo orden que sklearn, para el mismo redondeo
+        pred = np.zeros(len(hojas))
+        for t in range(hojas.shape[1]):
+            pred += self.valor_hojas[hojas[:, t]]
+        resultado.insert(0, 'pred', pred / self.bosque.n_arboles)
+        return resultado
+
+# --- Backtesting ---
+
+def cobertura(y, inferior, superior) -> float:
+    y = np.asarray(y)
+    return float(np.mean((y >= inferior) & (y <= superior)))
+
+def qrf_backtest(modelo, X, y, dates, q=CUANTILES, train_window=TRAIN_WINDOW_CUANTILES,
+                 test_window=TEST_WINDOW_CUANTILES, gap=GAP_CUANTILES) -> pd.DataFrame:
+    """
+    Walk-forward con intervalos: un bosque por pliegue en lugar de un modelo por
+    cuantil. Mismas columnas que `quantile_backtest` del notebook, más 'pred'.
+    """
+    from sklearn.base import clone
+
+    X, y = backtest.como_arreglos(X, y)
+    dates = pd.Series(pd.to_datetime(np.asarray(dates)))
+    partes = []
+    for start, train_end, gap_end, test_end in backtest.pliegues(len(X), train_window, test_window, gap):
+        bosque = clone(modelo).fit(X[start:train_end], y[start:train_end])
+        intervalos = IntervalosQRF(bosque, X[start:train_end], y[start:train_end]).intervalos(X[gap_end:test_end], q)
+        intervalos.insert(0, 'y_true', y[gap_end:test_end])
+        intervalos.insert(0, 'date', dates.iloc[gap_end:test_end].values)
+        partes.append(intervalos)
+    return pd.concat(partes, ignore_index=True)
+
+# --- Referencia ---
+
+def _quantile_backtest_gbr(X, y, dates, train_window=TRAIN_WINDOW_CUANTILES, test_window=TEST_WINDOW_CUANTILES,
+                           gap=GAP_CUANTILES):
+    """Versión del notebook: tres GradientBoostingRegressor(loss='quantile') por pliegue."""
+    quantile_models = {'q10': _gbr(0.1), 'q50': _gbr(0.5), 'q90': _gbr(0.9)}
+    preds = []
+    for start, train_end, gap_end, test_end in backtest.pliegues(len(X), train_window, test_window, gap):
+        fitted = {}
+        for qname, qmdl in quantile_models.items():
+            qmdl.fit(X.iloc[start:train_end], y.iloc[start:train_end])
+            fitted[qname] = qmdl.predict(X.iloc[gap_end:test_end])
+        preds.append(pd.DataFrame({'date': dates.iloc[gap_end:test_end].values,
+                                   'y_true': y.iloc[gap_end:test_end].values, **fitted}))
+    return pd.concat(preds, ignore_index=True)
+
+def _gbr(alpha):
+    from sklearn.ensemble import GradientBoostingRegressor
+    return GradientBoostingRegressor(loss='quantile', alpha=alpha, n_estimators=100, random_state=42)
+
+def _cuantiles_directos(modelo, X_ref, y_ref, X, q) -> np.ndarray:
+    """Pesos de Meinshausen fila por fila con `apply` de sklearn y cuantil ponderado explícito."""
+    hojas_ref, hojas = modelo.apply(X_ref), modelo.apply(X)
+    y_ref = np.asarray(y_ref, dtype=np.float64)
+    orden = np.argsort(y_ref, kind='stable')
+    resultado = np.empty((len(hojas), len(q)))
+    for i, fila in enumerate(hojas):
+        comparte = hojas_ref == fila
+        pesos = (comparte / comparte.sum(axis=0)).mean(axis=1)
+        acumulada = np.cumsum(pesos[orden])
+        for k, c in enumerate(q):
+            resultado[i, k] = y_ref[orden][min(np.searchsorted(acumulada, c - EPSILON), len(orden) - 1)]
+    return resultado
+
+# --- Benchmark ---
+
+def _datos_reales():
+    """Features del modelo mejorado sobre el dataset del repositorio (sin filas incompletas)."""
+    from features_online import _features_pandas, cargar_lista_features
+    from servidor_prediccion import cargar_dataset
+
+    df = cargar_dataset()
+    X = _features_pandas(df, cargar_lista_features())
+    completas = X.notna().all(axis=1) & df['homicidios'].notna()
+    return (X[completas].reset_index(drop=True), df.loc[completas, 'homicidios'].astype('float64').reset_index(drop=True),
+            df.loc[completas, 'date'].reset_index(drop=True))
+
+def benchmark_qrf():
+    """
+    Compara los intervalos de la sección 13 (tres modelos de cuantiles por pliegue)
+    con un RandomForest por pliegue y sus cuantiles QRF.
+    """
+    import warnings
+    from sklearn.ensemble import RandomForestRegressor
+
+    warnings.filterwarnings('ignore')
+    X, y, dates = _datos_reales()
+    rf = RandomForestRegressor(n_estimators=300, max_depth=8, min_samples_leaf=2, random_state=42, n_jobs=1)
+
+    # Aritmética: los pesos dispersos coinciden con el cálculo fila por fila
+    bosque = RandomForestRegressor(n_estimators=50, max_depth=8, min_samples_leaf=2, random_state=0).fit(X[:200], y[:200])
+    q = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+    np.testing.assert_array_equal(IntervalosQRF(bosque, X[:200], y[:200]).cuantiles(X[200:], q),
+                                  _cuantiles_directos(bosque, X[:200], y[:200], X[200:], q))
+
+    inicio = time.perf_counter()
+    gbr = _quantile_backtest_gbr(X, y, dates)
+    t_gbr = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    qrf = qrf_backtest(rf, X, y, dates)
+    t_qrf = time.perf_counter() - inicio
+
+    # Inferencia sobre un lote: tres predict contra un recorrido del bosque
+    Xtr, ytr, Xte = X[:TRAIN_WINDOW_CUANTILES], y[:TRAIN_WINDOW_CUANTILES], X[TRAIN_WINDOW_CUANTILES:]
+    modelos = [_gbr(a).fit(Xtr, ytr) for a in CUANTILES]
+    inicio = time.perf_counter()
+    for _ in range(20):
+        [m.predict(Xte) for m in modelos]
+    t_pred_gbr = (time.perf_counter() - inicio) / 20
+    intervalos = IntervalosQRF(rf.fit(Xtr, ytr), Xtr, ytr)
+    inicio = time.perf_counter()
+    for _ in range(20):
+        intervalos.intervalos(Xte)
+    t_pred_qrf = (time.perf_counter() - inicio) / 20
+
+    print(f"{len(X)} días, {len(gbr)} predicciones walk-forward (train {TRAIN_WINDOW_CUANTILES}, "
+          f"test {TEST_WINDOW_CUANTILES}, gap {GAP_CUANTILES})")
+    print(f"{'':22}{'cobertura 80%':>14}{'ancho':>8}{'cruces':>8}{'backtest':>10}{'inferencia':>12}")
+    for nombre, p, t, t_pred in (('3 × GBR cuantiles', gbr, t_gbr, t_pred_gbr), ('RF + QRF', qrf, t_qrf, t_pred_qrf)):
+        cruces = int(((p['q10'] > p['q50']) | (p['q50'] > p['q90'])).sum())
+        print(f"{nombre:22}{cobertura(p['y_true'], p['q10'], p['q90']):14.3f}{(p['q90'] - p['q10']).mean():8.2f}"
+              f"{cruces:8d}{t:9.1f}s{t_pred * 1000:10.1f}ms")
+    print("Cuantiles QRF idénticos al cálculo fila por fila.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Intervalos de predicción con quantile regression forest.")
+    parser.parse_args()
+    benchmark_qrf()
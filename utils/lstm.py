@@ -0,0 +1,198 @@
+# utils/lstm.py
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from secuencias import Secuencias, TAMAÑO_LOTE, escalar_min_max
+
+# --- Constantes y Configuración ---
+
+UNIDADES = 64
+DROPOUT = 0.2
+PACIENCIA = 5
+FRACCION_VALIDACION = 0.1
+
+# Ajuste fino de cada pliegue con arranque en caliente. El early stopping vigila la
+# parte final de las secuencias nuevas, que no entra al ajuste.
+EPOCHS_AJUSTE = 5
+PACIENCIA_AJUSTE = 2
+FRACCION_VALIDACION_AJUSTE = 0.25
+
+SEMILLA = 42
+
+# --- Modelo ---
+
+def make_lstm_model(n_features: int, units: int = UNIDADES, dropout: float = DROPOUT):
+    """Misma arquitectura que la sección 19 de analisis_alternativo.ipynb."""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
+    inp = keras.Input(shape=(None, n_features))
+    x = layers.Masking(mask_value=0.0)(inp)
+    x = layers.LSTM(units, return_sequences=False)(x)
+    x = layers.Dropout(dropout)(x)
+    x = layers.Dense(32, activation='relu')(x)
+    out = layers.Dense(1, activation='relu')(x)  # homicidios >= 0
+    model = keras.Model(inp, out)
+    model.compile(optimizer=keras.optimizers.Adam(1e-3), loss='mae')
+    return model
+
+def _entrenar(model, secuencias: Secuencias, entrenamiento: slice, validacion: slice, epochs, patience,
+              batch_size=TAMAÑO_LOTE, semilla=SEMILLA, verbose=0) -> int:
+    """
+    Entrena con lotes de `secuencias` y early stopping sobre `validacion`.
+
+    Returns:
+        int: Épocas ejecutadas.
+    """
+    from tensorflow import keras
+
+    callbacks = [keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True)]
+    datos = secuencias.tf_dataset(entrenamiento.start, entrenamiento.stop, batch_size, barajar=True, semilla=semilla)
+    history = model.fit(datos, validation_data=secuencias.lote(validacion), epochs=epochs,
+                        verbose=verbose, callbacks=callbacks)
+    return len(history.epoch)
+
+def particion_ajuste(train_end_anterior: int, train_end: int, fraccion=FRACCION_VALIDACION_AJUSTE) -> tuple:
+    """
+    Secuencias de ajuste fino y de validación de un pliegue con arranque en caliente.
+
+    Ambas salen de las secuencias nuevas [train_end_anterior, train_end): la
+    validación es la parte final (al menos una secuencia) y no se entrena con ella.
+    Con una sola secuencia nueva no hay qué reservar y se valida con la misma.
+
+    Returns:
+        tuple: (slice de entrenamiento, slice de validación), en posiciones de muestra.
+    """
+    nuevas = train_end - train_end_anterior
+    if nuevas < 2:
+        return slice(train_end_anterior, train_end), slice(train_end_anterior, train_end)
+    n_val = min(max(1, int(fraccion * nuevas)), nuevas - 1)
+    return slice(train_end_anterior, train_end - n_val), slice(train_end - n_val, train_end)
+
+def _guardar_checkpoint(model, directorio: Path, nombre: str):
+    """Guarda el modelo del pliegue con escritura atómica (archivo temporal + reemplazo)."""
+    directorio.mkdir(parents=True, exist_ok=True)
+    ruta = directorio / f"{nombre}.keras"
+    temporal = directorio / f".{nombre}.tmp.keras"
+    model.save(temporal)
+    os.replace(temporal, ruta)
+    return ruta
+
+# --- Backtesting ---
+
+def lstm_walk_forward(X_scaled, y_series, window, test_window=14, gap=7, epochs=25, verbose=0,
+                      warm_start=False, epochs_ajuste=EPOCHS_AJUSTE, patience=PACIENCIA,
+                      patience_ajuste=PACIENCIA_AJUSTE, dir_checkpoints=None, semilla=SEMILLA) -> pd.DataFrame:
+    """
+    Walk-forward del LSTM con los pliegues del notebook (entrenamiento de
+    max(120, 3 × window) secuencias, gap y test en secuencias).
+
+    Sin `warm_start` cada pliegue entrena un modelo nuevo con el último 10% como
+    validación, igual que el notebook. Con `warm_start` solo el primer pliegue parte
+    de cero: los siguientes conservan los pesos (y el estado de Adam) y hacen un
+    ajuste fino de hasta `epochs_ajuste` épocas sobre las secuencias que entraron a
+    la ventana desde el pliegue anterior. El early stopping vigila la parte final de
+    esas secuencias nuevas, que se reserva del ajuste (ver particion_ajuste); las
+    anteriores ya se usaron para entrenar y no medirían el sobreajuste.
+
+    Args:
+        X_scaled: Features ya escaladas (DataFrame o arreglo) o un objeto Secuencias.
+        y_series: Objetivo alineado con X_scaled (se ignora si X_scaled es Secuencias).
+        dir_checkpoints: Si se indica, guarda el modelo de cada pliegue como .keras.
+
+    Returns:
+        pd.DataFrame: Una fila por pliegue con window, MAE, RMSE, modo, épocas y segundos de entrenamiento.
+    """
+    from sklearn.metrics import mean_absolute_error, mean_squared_error
+    from tensorflow import keras
+
+    if isinstance(X_scaled, Secuencias):
+        secuencias = X_scaled
+    else:
+        base = np.ascontiguousarray(X_scaled.to_numpy() if hasattr(X_scaled, 'to_numpy') else X_scaled,
+                                    dtype=np.float32)
+        secuencias = Secuencias(base, y_series, window)
+
+    keras.utils.set_random_seed(semilla)
+    modo = 'warm_start' if warm_start else 'desde_cero'
+    results = []
+    model = None
+    train_end_anterior = None
+    for pliegue, (start, train_end, gap_end, test_end) in enumerate(secuencias.pliegues(test_window, gap)):
+        inicio = time.perf_counter()
+        if model is None or not warm_start:
+            model = make_lstm_model(secuencias.base.shape[1])
+            n_val = max(1, int(FRACCION_VALIDACION * (train_end - start)))
+            epocas = _entrenar(model, secuencias, slice(start, train_end - n_val), slice(train_end - n_val, train_end),
+                               epochs, patience, semilla=semilla + pliegue, verbose=verbose)
+        else:
+            ajuste, validacion = particion_ajuste(train_end_anterior, train_end)
+            epocas = _entrenar(model, secuencias, ajuste, validacion, epochs_ajuste, patience_ajuste,
+                               semilla=semilla + pliegue, verbose=verbose)
+        segundos = time.perf_counter() - inicio
+        train_end_anterior = train_end
+
+        Xte, yte = secuencias.lote(slice(gap_end, test_end))
+        pred = np.asarray(model.predict_on_batch(Xte)).ravel()
+        results.append({
+            'window': window,
+            'pliegue': pliegue,
+            'modo': modo,
+            'MAE': mean_absolute_error(yte, pred),
+            'RMSE': float(np.sqrt(mean_squared_error(yte, pred))),
+            'epocas': epocas,
+            'segundos_fit': segundos,
+        })
+        if dir_checkpoints is not None:
+            _guardar_checkpoint(model, Path(dir_checkpoints), f"lstm_w{window}_{modo}_pliegue{pliegue:03d}")
+        if verbose:
+            print(f"  pliegue {pliegue}: MAE {results[-1]['MAE']:.3f}, {epocas} épocas, {segundos:.1f}s")
+    return pd.DataFrame(results)
+
+def comparar_warm_start(X_scaled, y_series, window, test_window=14, gap=7, epochs=25, **kwargs) -> pd.DataFrame:
+    """
+    Corre el walk-forward desde cero y con arranque en caliente sobre las mismas
+    secuencias y resume precisión y tiempo de entrenamiento de cada modo.
+    """
+    base = np.ascontiguousarray(X_scaled.to_numpy() if hasattr(X_scaled, 'to_numpy') else X_scaled, dtype=np.float32)
+    secuencias = Secuencias(base, y_series, window)
+    partes = [lstm_walk_forward(secuencias, None, window, test_window, gap, epochs, warm_start=warm, **kwargs)
+              for warm in (False, True)]
+    detalle = pd.concat(partes, ignore_index=True)
+    if detalle.empty:
+        return pd.DataFrame(columns=['MAE', 'RMSE', 'epocas', 'segundos_fit'])
+    return detalle.groupby('modo', sort=False).agg(
+        pliegues=('pliegue', 'count'), MAE=('MAE', 'mean'), RMSE=('RMSE', 'mean'),
+        epocas=('epocas', 'sum'), segundos_fit=('segundos_fit', 'sum'),
+    )
+
+# --- Ejecución ---
+
+def main(ventanas=(28, 365), epochs=25, dir_checkpoints=None):
+    from intervalos_qrf import _datos_reales
+
+    X, y, _ = _datos_reales()
+    X_scaled = escalar_min_max(X)
+    for window in ventanas:
+        resumen = comparar_warm_start(X_scaled, y, window, epochs=epochs, dir_checkpoints=dir_checkpoints)
+        if resumen.empty:
+            print(f"Ventana {window}: no hay secuencias suficientes para un pliegue.")
+            continue
+        print(f"\nVentana {window} ({int(resumen['pliegues'].iloc[0])} pliegues):")
+        print(resumen.round(3).to_string())
+        desde_cero, warm = resumen.loc['desde_cero', 'segundos_fit'], resumen.loc['warm_start', 'segundos_fit']
+        print(f"Tiempo de entrenamiento ahorrado: {desde_cero - warm:.1f}s ({1 - warm / desde_cero:.0%}); "
+              f"ΔMAE {resumen.loc['warm_start', 'MAE'] - resumen.loc['desde_cero', 'MAE']:+.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward del LSTM desde cero y con arranque en caliente.")
+    parser.add_argument("--ventanas", type=int, nargs='+', default=[28, 365])
+    parser.add_argument("--epochs", type=int, default=25)
+    parser.add_argument("--checkpoints", type=Path, default=None, help="Directorio para guardar el modelo de cada pliegue.")
+    args = parser.parse_args()
+    main(args.ventanas, args.epochs, args.checkpoints)
@@ -0,0 +1,327 @@
+# utils/monitor_drift.py
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.special import kolmogorov
+
+import almacen
+
+# --- Constantes y Configuración ---
+
+RUTA_DATASET = Path(__file__).parent.parent / 'Dataset_homicidios_Actualizado.csv'
+RUTA_ESTADO = almacen.DIR_DATOS / 'cache' / 'drift_estado.npz'
+
+# Cubetas por feature (cuantiles del historial al crear el estado), como `psi` de la sección 16
+NUM_CUBETAS = 10
+UMBRAL_PSI = 0.2
+PISO_PROPORCION = 1e-6
+
+# Ventana actual y ventanas de referencia, en días contados desde el final:
+# (inicio, fin) significa las filas [n - inicio, n - fin); None es desde el principio.
+VENTANA_ACTUAL = 30
+REFERENCIAS = {
+    '30d_previos': (60, 30),
+    '90d_previos': (120, 30),
+    'hace_un_año': (395, 365),
+    'historico': (None, 30),
+}
+MIN_DIAS_VENTANA = 14
+
+# Columnas que cambian con el calendario por construcción; siempre "derivan"
+COLUMNAS_EXCLUIDAS = ['date', 'año', 'mes', 'dia', 'semana', 'dia_del_año']
+
+# --- Sketch de Histogramas ---
+
+class SketchDrift:
+    """
+    Histogramas acumulados por feature: para cada día guarda el conteo de cada
+    cubeta desde el inicio del dataset, así el histograma de cualquier ventana es
+    una resta de dos filas. Los bordes de las cubetas se fijan al crear el estado.
+
+    Con cada corrida solo se recalculan los días nuevos (o desde el primer día
+    revisado cuya cubeta cambió), y PSI/KS de todas las features contra todas las
+    referencias salen de una sola operación sobre arreglos (referencias, features, cubetas).
+    """
+    def __init__(self, columnas, bordes):
+        self.columnas = list(columnas)
+        self.bordes = np.asarray(bordes, dtype=np.float64)
+        self.fechas = np.empty(0, dtype='datetime64[D]')
+        self.codigos = np.empty((0, len(self.columnas)), dtype=np.int8)
+        self.acumulados = np.zeros((1, len(self.columnas), NUM_CUBETAS), dtype=np.int32)
+
+    @classmethod
+    def desde_dataset(cls, df: pd.DataFrame):
+        """Fija columnas y bordes (cuantiles interiores de cada feature) con el historial actual."""
+        columnas = columnas_monitoreadas(df)
+        X = _matriz(df, columnas)
+        cuantiles = np.nanquantile(X, np.linspace(0, 1, NUM_CUBETAS + 1)[1:-1], axis=0).T
+        bordes = np.full((len(columnas), NUM_CUBETAS - 1), np.inf)
+        for j, fila in enumerate(cuantiles):
+            unicos = np.unique(fila[~np.isnan(fila)])
+            bordes[j, :len(unicos)] = unicos
+        sketch = cls(columnas, bordes)
+        sketch.actualizar(df)
+        return sketch
+
+    def codificar(self, X: np.ndarray) -> np.ndarray:
+        """Cubeta de cada valor (mismo criterio que np.histogram); -1 para NaN."""
+        codigos = (X[:, :, None] >= self.bordes[None, :, :]).sum(axis=2).astype(np.int8)
+        codigos[np.isnan(X)] = -1
+        return codigos
+
+    def actualizar(self, df: pd.DataFrame) -> int:
+        """
+        Incorpora el dataset del merge.
+
+        Returns:
+            int: Días recalculados (nuevos más los posteriores a la primera revisión).
+        """
+        df = df.sort_values('date')
+        fechas = df['date'].to_numpy().astype('datetime64[D]')
+        codigos = self.codificar(_matriz(df, self.columnas))
+
+        comun = min(len(self.fechas), len(fechas))
+        iguales = (self.fechas[:comun] == fechas[:comun]) & (self.codigos[:comun] == codigos[:comun]).all(axis=1)
+        desde = comun if iguales.all() else int(np.argmin(iguales))
+
+        nuevos = codigos[desde:, :, None] == np.arange(NUM_CUBETAS, dtype=np.int8)
+        acumulados = self.acumulados[desde] + np.cumsum(nuevos, axis=0, dtype=np.int32)
+        self.acumulados = np.concatenate([self.acumulados[:desde + 1], acumulados])
+        self.fechas, self.codigos = fechas, codigos
+        return len(fechas) - desde
+
+    def histograma(self, inicio: int, fin: int) -> np.ndarray:
+        """Conteos (features, cubetas) de las filas [inicio, fin)."""
+        return self.acumulados[fin] - self.acumulados[inicio]
+
+    def puntajes(self, ventana_actual=VENTANA_ACTUAL, referencias=REFERENCIAS) -> pd.DataFrame:
+        """
+        PSI, estadístico KS sobre las cubetas y su p-valor asintótico de cada feature
+        contra cada referencia con datos suficientes.
+
+        La columna 'ks' no es `scipy.stats.ks_2samp`: es la distancia máxima entre las
+        acumuladas de los dos histogramas, así que solo ve los bordes de las cubetas y
+        los valores fuera del rango histórico caen en la cubeta extrema. En
+        benchmark_drift difiere de ks_2samp hasta en 0.556; 'p_ks' hereda esa
+        aproximación y sirve para ordenar, no como prueba exacta.
+        """
+        n = len(self.fechas)
+        nombres, limites = [], []
+        for nombre, (inicio, fin) in referencias.items():
+            inicio = 0 if inicio is None else n - inicio
+            if inicio >= 0 and n - fin - inicio >= MIN_DIAS_VENTANA and n - ventana_actual >= 0:
+                nombres.append(nombre)
+                limites.append((inicio, n - fin))
+        if not nombres:
+            return pd.DataFrame(columns=['referencia', 'feature', 'psi', 'ks', 'p_ks', 'alerta'])
+
+        limites = np.array(limites)
+        referencia = self.acumulados[limites[:, 1]] - self.acumulados[limites[:, 0]]      # (K, F, B)
+        actual = self.histograma(n - ventana_actual, n)[None]                              # (1, F, B)
+        n_ref = referencia.sum(axis=2, keepdims=True)
+        n_act = actual.sum(axis=2, keepdims=True)
+        p_ref = referencia / np.maximum(n_ref, 1)
+        p_act = actual / np.maximum(n_act, 1)
+
+        e, a = p_ref.clip(PISO_PROPORCION), p_act.clip(PISO_PROPORCION)
+        psi = ((a - e) * np.log(a / e)).sum(axis=2)
+        # KS sobre las cubetas, no sobre los valores (ver el docstring)
+        ks = np.abs(np.cumsum(p_ref, axis=2) - np.cumsum(p_act, axis=2)).max(axis=2)
+        n_ref, n_act = n_ref[..., 0], n_act[..., 0]
+        n_efectivo = n_ref * n_act / np.maximum(n_ref + n_act, 1)
+        p_ks = np.where(n_efectivo > 0, kolmogorov(np.sqrt(n_efectivo) * ks), np.nan)
+
+        K, F = psi.shape
+        return pd.DataFrame({
+            'referencia': np.repeat(nombres, F),
+            'feature': np.tile(self.columnas, K),
+            'psi': psi.ravel(),
+            'ks': ks.ravel(),
+            'p_ks': p_ks.ravel(),
+            'alerta': psi.ravel() > UMBRAL_PSI,
+        })
+
+    # --- Persistencia ---
+
+    def guardar(self, ruta=RUTA_ESTADO):
+        """Guarda el estado con escritura atómica (archivo temporal + reemplazo)."""
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_suffix('.tmp')
+        with open(temporal, 'wb') as f:
+            np.savez(f, columnas=np.array(self.columnas), bordes=self.bordes, fechas=self.fechas,
+                     codigos=self.codigos, acumulados=self.acumulados)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta=RUTA_ESTADO):
+        with np.load(ruta) as datos:
+            sketch = cls(datos['columnas'].tolist(), datos['bordes'])
+            sketch.fechas, sketch.codigos, sketch.acumulados = datos['fechas'], datos['codigos'], datos['acumulados']
+        return sketch
+
+# --- Utilidades ---
+
+def columnas_monitoreadas(df: pd.DataFrame) -> list:
+    """Columnas numéricas (o booleanas) del dataset, menos las de calendario."""
+    return [c for c in df.columns if c not in COLUMNAS_EXCLUIDAS
+            and (pd.api.types.is_numeric_dtype(df[c]) or pd.api.types.is_bool_dtype(df[c]))]
+
+def _matriz(df: pd.DataFrame, columnas) -> np.ndarray:
+    return np.column_stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+                            if c in df.columns else np.full(len(df), np.nan) for c in columnas])
+
+def cargar_dataset() -> pd.DataFrame:
+    """Dataset del merge (Feather del almacén o, si no existe, el CSV de la raíz)."""
+    try:
+        return almacen.cargar('dataset')
+    except FileNotFoundError:
+        return almacen._cargar_csv(RUTA_DATASET)
+
+def monitorear(df: pd.DataFrame = None, ruta_estado=RUTA_ESTADO, reiniciar=False) -> pd.DataFrame:
+    """
+    Actualiza el sketch guardado con el dataset y calcula los puntajes de drift.
+    El estado se reconstruye si no existe, si se pide o si cambiaron las columnas.
+    """
+    df = cargar_dataset() if df is None else df
+    sketch = None
+    if not reiniciar and Path(ruta_estado).exists():
+        sketch = SketchDrift.cargar(ruta_estado)
+        if sketch.columnas != columnas_monitoreadas(df):
+            print("Las columnas del dataset cambiaron; se reconstruye el estado de drift.")
+            sketch = None
+    if sketch is None:
+        sketch = SketchDrift.desde_dataset(df)
+        recalculados = len(sketch.fechas)
+    else:
+        recalculados = sketch.actualizar(df)
+    sketch.guardar(ruta_estado)
+    puntajes = sketch.puntajes()
+    print(f"Drift: {len(sketch.fechas)} días ({recalculados} recalculados), {len(sketch.columnas)} features, "
+          f"ventana actual de {VENTANA_ACTUAL} días contra {puntajes['referencia'].nunique()} referencias.")
+    return puntajes
+
+def reportar(puntajes: pd.DataFrame):
+    """Imprime las features con mayor PSI y las alertas (PSI > 0.2)."""
+    if puntajes.empty:
+        print("Sin datos suficientes para comparar ventanas.")
+        return
+    maximo = puntajes.loc[puntajes.groupby('feature')['psi'].idxmax()].sort_values('psi', ascending=False)
+    print("Top 10 PSI (mayor drift):")
+    print(maximo.head(10)[['feature', 'referencia', 'psi', 'ks', 'p_ks']].round(4).to_string(index=False))
+    print(f"(ks y p_ks se calculan sobre las {NUM_CUBETAS} cubetas, no con ks_2samp sobre los valores)")
+    alertas = puntajes[puntajes['alerta']]
+    if alertas.empty:
+        print(f"Sin alertas de drift PSI > {UMBRAL_PSI}")
+    else:
+        print(f"ALERTAS DRIFT PSI > {UMBRAL_PSI}:")
+        for referencia, grupo in alertas.groupby('referencia', sort=False):
+            lista = ', '.join(f"{f} ({p:.2f})" for f, p in zip(grupo['feature'], grupo['psi']))
+            print(f"  {referencia}: {lista}")
+
+# --- Referencia ---
+
+def _psi_notebook(expected, actual, buckets=10):
+    """Versión de la sección 16 de analisis_alternativo.ipynb."""
+    exp, act = pd.Series(expected), pd.Series(actual)
+    qs = np.linspace(0, 1, buckets + 1)
+    bins = np.unique(np.quantile(pd.concat([exp, act]), qs))
+    if len(bins) < 3:
+        return 0.0
+    e_counts, _ = np.histogram(exp, bins=bins)
+    a_counts, _ = np.histogram(act, bins=bins)
+    e_perc = (e_counts / max(e_counts.sum(), 1)).clip(1e-6)
+    a_perc = (a_counts / max(a_counts.sum(), 1)).clip(1e-6)
+    return float(np.sum((a_perc - e_perc) * np.log(a_perc / e_perc)))
+
+def _puntajes_directos(sketch: SketchDrift, X: np.ndarray) -> pd.DataFrame:
+    """Mismos bordes, pero un np.histogram por feature y referencia desde los valores crudos."""
+    n = len(X)
+    filas = []
+    for nombre, (inicio, fin) in REFERENCIAS.items():
+        inicio = 0 if inicio is None else n - inicio
+        if inicio < 0 or n - fin - inicio < MIN_DIAS_VENTANA:
+            continue
+        for j, columna in enumerate(sketch.columnas):
+            bordes = np.concatenate([[-np.inf], sketch.bordes[j], [np.inf]])
+            ref, act = X[inicio:n - fin, j], X[n - VENTANA_ACTUAL:, j]
+            e = np.histogram(ref[~np.isnan(ref)], bins=bordes)[0]
+            a = np.histogram(act[~np.isnan(act)], bins=bordes)[0]
+            # np.histogram cierra la última cubeta; con +inf al final no hay diferencia
+            e_perc, a_perc = e / max(e.sum(), 1), a / max(a.sum(), 1)
+            psi = float(np.sum((a_perc.clip(PISO_PROPORCION) - e_perc.clip(PISO_PROPORCION))
+                               * np.log(a_perc.clip(PISO_PROPORCION) / e_perc.clip(PISO_PROPORCION))))
+            filas.append({'referencia': nombre, 'feature': columna, 'psi': psi,
+                          'ks': float(np.abs(np.cumsum(e_perc) - np.cumsum(a_perc)).max())})
+    return pd.DataFrame(filas)
+
+# --- Benchmark ---
+
+def benchmark_drift(años=10, dias_diarios=60):
+    """
+    Estado construido con el historial menos los últimos días y luego actualizado día
+    por día, contra la sección 16 del notebook (`psi` y `ks_2samp` desde los datos
+    crudos, un par de ventanas a la vez). La equivalencia con el cálculo directo se
+    verifica en tests/test_monitor_drift.py.
+    """
+    import tempfile
+    from scipy.stats import ks_2samp
+    from features_online import _dataset_sintetico
+
+    df = _dataset_sintetico(años)
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = Path(tmp) / 'drift_estado.npz'
+        inicio = time.perf_counter()
+        SketchDrift.desde_dataset(df.iloc[:len(df) - dias_diarios]).guardar(ruta)
+        t_inicial = time.perf_counter() - inicio
+
+        tiempos = []
+        for fin in range(len(df) - dias_diarios + 1, len(df) + 1):
+            inicio = time.perf_counter()
+            sketch = SketchDrift.cargar(ruta)
+            sketch.actualizar(df.iloc[:fin])
+            sketch.guardar(ruta)
+            puntajes = sketch.puntajes()
+            tiempos.append(time.perf_counter() - inicio)
+
+    X = _matriz(df.sort_values('date'), sketch.columnas)
+
+    # Notebook: cada feature y referencia desde los arreglos crudos
+    inicio = time.perf_counter()
+    n = len(X)
+    ks_exacto = []
+    for nombre, (desde, hasta) in REFERENCIAS.items():
+        desde = 0 if desde is None else n - desde
+        for j in range(X.shape[1]):
+            ref, act = X[desde:n - hasta, j], X[n - VENTANA_ACTUAL:, j]
+            ref, act = ref[~np.isnan(ref)], act[~np.isnan(act)]
+            _psi_notebook(ref, act)
+            ks_exacto.append(ks_2samp(ref, act).statistic)
+    t_notebook = time.perf_counter() - inicio
+
+    print(f"{len(df)} días × {len(sketch.columnas)} features, {len(REFERENCIAS)} referencias")
+    print(f"Estado inicial:                  {t_inicial * 1000:8.1f} ms")
+    print(f"Actualización diaria (mediana):  {np.median(tiempos) * 1000:8.1f} ms  (cargar + actualizar + guardar + puntajes)")
+    print(f"Notebook (psi + ks_2samp):       {t_notebook * 1000:8.1f} ms")
+    diferencia = np.abs(puntajes['ks'] - ks_exacto)
+    print(f"KS por cubetas vs ks_2samp exacto: diferencia mediana {np.median(diferencia):.3f}, máxima {diferencia.max():.3f}"
+          " (valores fuera del rango histórico caen en la cubeta extrema)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitoreo de drift (PSI/KS) del dataset fusionado.")
+    parser.add_argument("--reiniciar", action="store_true", help="Reconstruye el estado y los bordes de las cubetas.")
+    parser.add_argument("--benchmark", action="store_true", help="Mide la actualización diaria contra el notebook.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_drift()
+    else:
+        try:
+            reportar(monitorear(reiniciar=args.reiniciar))
+        except FileNotFoundError as e:
+            print(f"Error: no se encontró el dataset fusionado ({e}).", file=sys.stderr)
+            sys.exit(1)
@@ -0,0 +1,423 @@
+# utils/registro_modelos.py
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+import almacen
+
+# --- Constantes y Configuración ---
+
+DIR_MODELOS = Path(__file__).parent.parent / 'modelos'
+RUTA_INDICE = almacen.DIR_DATOS / 'cache' / 'registro_modelos.json'
+
+# Modelos cargados que se mantienen en memoria (LRU por hash de contenido)
+MAX_CARGADOS = 4
+
+# Nombres de archivo que generan los notebooks: (patrón, familia, rol). Los grupos
+# del patrón son el tipo de modelo y/o el sello de tiempo de la corrida.
+PATRONES = [
+    # Versiones compiladas de los bosques (bosque_compilado.py), antes que los originales
+    (re.compile(r'^modelo_mejorado_(?P<tipo>.+)_(?P<sello>\d{8}_\d{6})_compilado\.joblib$'), 'mejorado', 'compilado'),
+    (re.compile(r'^modelo_(?P<tipo>.+)_full_compilado\.joblib$'), 'full', 'compilado'),
+    (re.compile(r'^homicidios_predictor_(?P<sello>\d{8}_\d{6})\.joblib$'), 'predictor', 'modelo'),
+    (re.compile(r'^scaler_(?P<sello>\d{8}_\d{6})\.joblib$'), 'predictor', 'scaler'),
+    (re.compile(r'^model_info_(?P<sello>\d{8}_\d{6})\.json$'), 'predictor', 'metadata'),
+    (re.compile(r'^modelo_mejorado_(?P<tipo>.+)_(?P<sello>\d{8}_\d{6})\.joblib$'), 'mejorado', 'modelo'),
+    (re.compile(r'^metadata_mejorado_(?P<sello>\d{8}_\d{6})\.json$'), 'mejorado', 'metadata'),
+    (re.compile(r'^modelo_(?P<tipo>.+)_full\.joblib$'), 'full', 'modelo'),
+    (re.compile(r'^modelo_(?P<tipo>.+)_meta\.json$'), 'full', 'metadata'),
+]
+
+BLOQUE_HASH = 1 << 20
+
+# --- Utilidades ---
+
+def sha256_archivo(path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(BLOQUE_HASH), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+def clasificar(nombre: str):
+    """(familia, rol, tipo, sello) de un archivo de modelos/, o None si no es un artefacto."""
+    for patron, familia, rol in PATRONES:
+        m = patron.match(nombre)
+        if m:
+            grupos = m.groupdict()
+            return familia, rol, grupos.get('tipo'), grupos.get('sello')
+    return None
+
+def _metrica_mae(metadata: dict):
+    """MAE declarado en la metadata: 'mae' (walk-forward) o metrics.val_mae."""
+    if metadata.get('mae') is not None:
+        return float(metadata['mae'])
+    val_mae = (metadata.get('metrics') or {}).get('val_mae')
+    return float(val_mae) if val_mae is not None else None
+
+def uso_disco(directorio) -> tuple:
+    """Bytes aparentes (suma de archivos) y reales (cada inodo una vez)."""
+    aparentes, inodos = 0, {}
+    for path in Path(directorio).iterdir():
+        if path.is_file():
+            st = path.stat()
+            aparentes += st.st_size
+            inodos[(st.st_dev, st.st_ino)] = st.st_size
+    return aparentes, sum(inodos.values())
+
+# --- Registro ---
+
+class RegistroModelos:
+    """
+    Índice de los modelos de `modelos/`: agrupa cada corrida (modelo, scaler y
+    metadata con el mismo sello) y guarda el sha256 de cada archivo.
+
+    El índice se guarda en `datos/cache/registro_modelos.json` y solo se vuelve a
+    calcular el hash de los archivos cuyo tamaño o fecha de modificación cambió, así
+    que abrir el registro no lee los modelos. Los modelos se cargan al pedirlos, con
+    `mmap_mode='r'`, y los últimos `max_cargados` se conservan en memoria por hash de
+    contenido: dos corridas con el mismo archivo comparten el objeto cargado.
+    """
+    def __init__(self, directorio=DIR_MODELOS, ruta_indice=RUTA_INDICE, max_cargados=MAX_CARGADOS):
+        self.directorio = Path(directorio)
+        self.ruta_indice = Path(ruta_indice) if ruta_indice is not None else None
+        self.max_cargados = max_cargados
+        self.archivos = {}
+        self.corridas = {}
+        self.cargados = OrderedDict()
+        self.aciertos = self.fallos = 0
+        self._candado = threading.Lock()
+        if self.ruta_indice is not None and self.ruta_indice.exists():
+            with open(self.ruta_indice, encoding='utf-8') as f:
+                indice = json.load(f)
+            if indice.get('directorio') == str(self.directorio.resolve()):
+                self.archivos = indice['archivos']
+        self.actualizar()
+
+    # --- Índice ---
+
+    def actualizar(self):
+        """Revisa el directorio, calcula el hash de los archivos nuevos o cambiados y rearma las corridas."""
+        archivos, cambios = {}, 0
+        for path in sorted(self.directorio.iterdir()):
+            if not path.is_file() or clasificar(path.name) is None:
+                continue
+            st = path.stat()
+            previo = self.archivos.get(path.name)
+            if previo and previo['bytes'] == st.st_size and previo['mtime_ns'] == st.st_mtime_ns:
+                archivos[path.name] = previo
+                continue
+            archivos[path.name] = {'bytes': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha256_archivo(path)}
+            cambios += 1
+        if cambios or archivos.keys() != self.archivos.keys():
+            self.archivos = archivos
+            self._guardar_indice()
+        self.archivos = archivos
+        self.corridas = self._armar_corridas()
+        return self
+
+    def _guardar_indice(self):
+        if self.ruta_indice is None:
+            return
+        self.ruta_indice.parent.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta_indice.with_suffix(self.ruta_indice.suffix + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({'directorio': str(self.directorio.resolve()), 'archivos': self.archivos}, f)
+        os.replace(temporal, self.ruta_indice)
+
+    def _armar_corridas(self) -> dict:
+        corridas = {}
+        for nombre, info in self.archivos.items():
+            familia, rol, tipo, sello = clasificar(nombre)
+            # Los modelos *_full no tienen sello: se identifican por tipo
+            clave = f"{familia}:{sello or tipo}"
+            corrida = corridas.setdefault(clave, {'id': clave, 'familia': familia, 'tipo': tipo, 'sello': sello,
+                                                  'artefactos': {}})
+            if tipo and corrida['tipo'] is None:
+                corrida['tipo'] = tipo
+            corrida['artefactos'][rol] = {'archivo': nombre, **info}
+
+        for corrida in corridas.values():
+            metadata = self._leer_metadata(corrida)
+            corrida['tipo'] = metadata.get('model_type') or metadata.get('best_model') or corrida['tipo']
+            corrida['mae'] = _metrica_mae(metadata)
+            corrida['n_features'] = metadata.get('n_features')
+            if corrida['sello']:
+                corrida['fecha'] = dt.datetime.strptime(corrida['sello'], '%Y%m%d_%H%M%S')
+            else:
+                mtime = max(a['mtime_ns'] for a in corrida['artefactos'].values())
+                corrida['fecha'] = dt.datetime.fromtimestamp(mtime / 1e9).replace(microsecond=0)
+        return corridas
+
+    def _leer_metadata(self, corrida) -> dict:
+        artefacto = corrida['artefactos'].get('metadata')
+        if artefacto is None:
+            return {}
+        try:
+            with open(self.directorio / artefacto['archivo'], encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo leer {artefacto['archivo']}: {e}", file=sys.stderr)
+            return {}
+
+    # --- Consultas ---
+
+    def tabla(self, familia=None) -> pd.DataFrame:
+        """Una fila por corrida con modelo: id, familia, tipo, fecha, MAE, features y hash del modelo."""
+        filas = [{
+            'id': c['id'], 'familia': c['familia'], 'tipo': c['tipo'], 'fecha': c['fecha'], 'mae': c['mae'],
+            'n_features': c['n_features'], 'sha256': c['artefactos']['modelo']['sha256'][:12],
+            'bytes': c['artefactos']['modelo']['bytes'],
+        } for c in self._con_modelo(familia)]
+        return pd.DataFrame(filas).sort_values('fecha').reset_index(drop=True)
+
+    def _con_modelo(self, familia=None) -> list:
+        return [c for c in self.corridas.values()
+                if 'modelo' in c['artefactos'] and (familia is None or c['familia'] == familia)]
+
+    def obtener(self, id_corrida: str) -> dict:
+        if id_corrida not in self.corridas:
+            raise KeyError(f"No existe la corrida '{id_corrida}'.")
+        return self.corridas[id_corrida]
+
+    def ultimo(self, familia='mejorado') -> dict:
+        """Corrida más reciente de la familia (None = todas)."""
+        candidatas = self._con_modelo(familia)
+        if not candidatas:
+            raise LookupError(f"No hay modelos de la familia '{familia}'.")
+        return max(candidatas, key=lambda c: (c['fecha'], c['id']))
+
+    def mejor(self, familia='mejorado') -> dict:
+        """
+        Corrida con menor MAE declarado (la más reciente si empatan). Las métricas
+        vienen de cada metadata y solo son comparables dentro de una familia.
+        """
+        candidatas = [c for c in self._con_modelo(familia) if c['mae'] is not None]
+        if not candidatas:
+            raise LookupError(f"No hay modelos de la familia '{familia}' con MAE.")
+        return min(candidatas, key=lambda c: (c['mae'], -c['fecha'].timestamp()))
+
+    def ruta(self, corrida, rol='modelo') -> Path:
+        corrida = self.obtener(corrida) if isinstance(corrida, str) else corrida
+        return self.directorio / corrida['artefactos'][rol]['archivo']
+
+    def metadata(self, corrida) -> dict:
+        corrida = self.obtener(corrida) if isinstance(corrida, str) else corrida
+        return self._leer_metadata(corrida)
+
+    def features(self, corrida) -> list:
+        """Orden de features de la corrida ('features', 'feature_names' o 'columns')."""
+        metadata = self.metadata(corrida)
+        for clave in ('features', 'feature_names', 'columns'):
+            if clave in metadata:
+                return metadata[clave]
+        raise KeyError("La metadata no incluye la lista de features.")
+
+    # --- Carga ---
+
+    def cargar(self, corrida, rol='modelo', mmap_mode='r', compilado=True):
+        """
+        Modelo (o scaler) de una corrida, cargado una sola vez por contenido.
+
+        Con mmap_mode='r' los arreglos NumPy guardados sin compresión quedan como
+        memory maps de solo lectura, compartidos entre procesos. Los árboles de
+        sklearn copian sus nodos al deserializarse, así que un RandomForest ocupa
+        memoria propia en cada proceso aunque se cargue así; por eso, si la corrida
+        tiene versión compilada (bosque_compilado.py), se devuelve esa, cuyos nodos
+        sí quedan en el memory map.
+
+        Args:
+            rol (str): Artefacto de la corrida ('modelo', 'scaler', 'compilado').
+            compilado (bool): Con rol='modelo', devolver la versión compilada si existe
+                y fue generada a partir de este mismo modelo. False para obtener el
+                estimador de sklearn (p. ej. para reentrenarlo o volver a compilarlo).
+        """
+        corrida = self.obtener(corrida) if isinstance(corrida, str) else corrida
+        if rol == 'modelo' and compilado and 'compilado' in corrida['artefactos']:
+            bosque = self._cargar_artefacto(corrida, 'compilado', mmap_mode)
+            if getattr(bosque, 'sha256_origen', None) == corrida['artefactos']['modelo']['sha256']:
+                return bosque
+            print(f"La versión compilada de '{corrida['id']}' no corresponde al modelo actual; "
+                  f"se usa el original (ejecuta bosque_compilado.py).", file=sys.stderr)
+        return self._cargar_artefacto(corrida, rol, mmap_mode)
+
+    def _cargar_artefacto(self, corrida, rol, mmap_mode):
+        import joblib
+
+        sha = corrida['artefactos'][rol]['sha256']
+        with self._candado:
+            if sha in self.cargados:
+                self.cargados.move_to_end(sha)
+                self.aciertos += 1
+                return self.cargados[sha]
+        objeto = joblib.load(self.ruta(corrida, rol), mmap_mode=mmap_mode)
+        with self._candado:
+            self.fallos += 1
+            self.cargados[sha] = objeto
+            self.cargados.move_to_end(sha)
+            while len(self.cargados) > self.max_cargados:
+                self.cargados.popitem(last=False)
+        return objeto
+
+    # --- Disco ---
+
+    def duplicados(self) -> dict:
+        """sha256 -> archivos con ese contenido (solo los que se repiten)."""
+        grupos = {}
+        for nombre, info in self.archivos.items():
+            grupos.setdefault(info['sha256'], []).append(nombre)
+        return {sha: sorted(nombres) for sha, nombres in grupos.items() if len(nombres) > 1}
+
+    def deduplicar(self) -> int:
+        """
+        Reemplaza los archivos repetidos por enlaces duros al primero de cada grupo:
+        los nombres y rutas siguen iguales, pero el contenido se guarda una vez.
+
+        Returns:
+            int: Bytes liberados.
+        """
+        liberados = 0
+        for nombres in self.duplicados().values():
+            original = self.directorio / nombres[0]
+            for nombre in nombres[1:]:
+                copia = self.directorio / nombre
+                if os.path.samefile(original, copia):
+                    continue
+                temporal = copia.with_suffix(copia.suffix + '.tmp')
+                os.link(original, temporal)
+                os.replace(temporal, copia)
+                liberados += original.stat().st_size
+        self.actualizar()
+        return liberados
+
+    def registrar(self, modelo, metadata: dict, tipo='RF_improved', sello=None) -> dict:
+        """
+        Guarda un modelo mejorado con su metadata, con los nombres del notebook.
+
+        Si ya hay un archivo con el mismo contenido, el nuevo nombre es un enlace duro
+        a él y el disco no crece.
+
+        Returns:
+            dict: La corrida registrada.
+        """
+        import joblib
+
+        sello = sello or dt.datetime.now().strftime('%Y%m%d_%H%M%S')
+        destino = self.directorio / f"modelo_mejorado_{tipo}_{sello}.joblib"
+        temporal = destino.with_suffix('.joblib.tmp')
+        joblib.dump(modelo, temporal)
+        sha = sha256_archivo(temporal)
+        existente = next((n for n, info in self.archivos.items() if info['sha256'] == sha), None)
+        if existente is not None:
+            os.unlink(temporal)
+            os.link(self.directorio / existente, temporal)
+        os.replace(temporal, destino)
+
+        ruta_metadata = self.directorio / f"metadata_mejorado_{sello}.json"
+        with open(ruta_metadata, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': sello, 'model_type': tipo, **metadata}, f, indent=2, ensure_ascii=False)
+        self.actualizar()
+        return self.obtener(f"mejorado:{sello}")
+
+# --- Bloque de Ejecución ---
+
+def main(deduplicar=False):
+    registro = RegistroModelos()
+    print(registro.tabla(None).to_string(index=False))
+    print(f"\nÚltimo modelo mejorado: {registro.ultimo()['id']}")
+    print(f"Mejor modelo mejorado por MAE: {registro.mejor()['id']}")
+    duplicados = registro.duplicados()
+    if duplicados:
+        print(f"\n{sum(len(n) - 1 for n in duplicados.values())} archivos repetidos:")
+        for nombres in duplicados.values():
+            print(f"  {', '.join(nombres)}")
+    if deduplicar:
+        antes = uso_disco(registro.directorio)[1]
+        liberados = registro.deduplicar()
+        print(f"\nEnlaces duros creados: {liberados / 1e6:.1f} MB liberados "
+              f"({antes / 1e6:.1f} -> {uso_disco(registro.directorio)[1] / 1e6:.1f} MB).")
+
+# --- Benchmark ---
+
+def benchmark_registro(reentrenamientos=5, consultas=50):
+    """
+    Sobre una copia de modelos/: índice en frío y en caliente, deduplicación,
+    reentrenamientos que repiten el modelo y cargas repetidas con y sin LRU.
+    """
+    import shutil
+    import tempfile
+    import warnings
+
+    import joblib
+
+    warnings.filterwarnings('ignore')
+    with tempfile.TemporaryDirectory() as tmp:
+        directorio = Path(tmp) / 'modelos'
+        shutil.copytree(DIR_MODELOS, directorio)
+        ruta_indice = Path(tmp) / 'registro.json'
+
+        inicio = time.perf_counter()
+        registro = RegistroModelos(directorio, ruta_indice)
+        t_frio = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        registro = RegistroModelos(directorio, ruta_indice)
+        t_caliente = time.perf_counter() - inicio
+
+        aparentes, reales = uso_disco(directorio)
+        liberados = registro.deduplicar()
+        _, reales_dedup = uso_disco(directorio)
+
+        # Reentrenar y guardar el mismo modelo no debe ocupar más disco
+        mejor = registro.mejor()
+        modelo = registro.cargar(mejor, compilado=False)
+        metadata = {k: v for k, v in registro.metadata(mejor).items() if k not in ('timestamp', 'model_type')}
+        for i in range(reentrenamientos):
+            registro.registrar(modelo, metadata, sello=f"20300101_00000{i}")
+        _, reales_reentreno = uso_disco(directorio)
+
+        # Cargar el modelo vigente en cada consulta contra el LRU del registro
+        inicio = time.perf_counter()
+        for _ in range(consultas // 10):
+            joblib.load(registro.ruta(registro.ultimo()))
+        t_sin_lru = (time.perf_counter() - inicio) / (consultas // 10)
+        registro.cargar(registro.ultimo())
+        inicio = time.perf_counter()
+        for _ in range(consultas):
+            vigente = registro.cargar(registro.ultimo())
+        t_lru = (time.perf_counter() - inicio) / consultas
+        # Las corridas con el mismo contenido comparten el objeto cargado
+        assert registro.cargar('mejorado:20300101_000000') is vigente
+        duplicadas = [c for c in registro.corridas.values()
+                      if c['artefactos'].get('modelo', {}).get('sha256') == mejor['artefactos']['modelo']['sha256']]
+        assert len({id(registro.cargar(c, compilado=False)) for c in duplicadas}) == 1
+
+    print(f"{len(registro.corridas)} corridas, {len(registro.archivos)} archivos indexados")
+    print(f"Índice en frío (hash de todo): {t_frio * 1000:7.1f} ms; en caliente: {t_caliente * 1000:5.1f} ms")
+    print(f"Disco: {aparentes / 1e6:.1f} MB aparentes, {reales / 1e6:.1f} MB reales; "
+          f"tras deduplicar {reales_dedup / 1e6:.1f} MB ({liberados / 1e6:.1f} MB liberados)")
+    print(f"Tras {reentrenamientos} reentrenamientos con el mismo modelo: {reales_reentreno / 1e6:.1f} MB "
+          f"(un solo archivo nuevo)")
+    print(f"Modelo vigente por consulta: joblib.load {t_sin_lru * 1000:.1f} ms, registro (LRU) {t_lru * 1000:.3f} ms "
+          f"({registro.aciertos} aciertos, {registro.fallos} cargas)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registro de modelos de modelos/.")
+    parser.add_argument("--deduplicar", action="store_true",
+                        help="Reemplaza los archivos repetidos por enlaces duros.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Mide el registro sobre una copia de modelos/.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_registro()
+    else:
+        main(args.deduplicar)
@@ -0,0 +1,186 @@
+# utils/secuencias.py
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import backtest
+
+# --- Constantes y Configuración ---
+
+VENTANAS_LSTM = (28, 365)
+HORIZONTE = 1
+TAMAÑO_LOTE = 32
+MIN_TRAIN_LSTM = 120
+
+# --- Base Escalada ---
+
+def escalar_min_max(X, ajuste=None):
+    """
+    Min-max por columna, como la sección 18 de analisis_alternativo.ipynb (rango 0 → 1).
+
+    Args:
+        X: DataFrame o arreglo (filas, features).
+        ajuste: Filas con las que se calculan mínimo y máximo (slice o máscara);
+            por defecto todas, igual que el notebook.
+
+    Returns:
+        np.ndarray: Arreglo float32 contiguo que comparten todas las ventanas y pliegues.
+    """
+    X = np.asarray(X.to_numpy(dtype=np.float64) if hasattr(X, 'to_numpy') else X, dtype=np.float64)
+    referencia = X if ajuste is None else X[ajuste]
+    minimo = referencia.min(axis=0)
+    rango = referencia.max(axis=0) - minimo
+    rango[rango == 0] = 1
+    return np.ascontiguousarray((X - minimo) / rango, dtype=np.float32)
+
+# --- Secuencias ---
+
+class Secuencias:
+    """
+    Ventanas (muestras, window, features) sobre una base escalada sin copiarla.
+
+    La muestra j usa las filas [j, j + window) y su objetivo es y[j + window + horizon - 1],
+    igual que `build_sequences` del notebook. `X` es una vista de `sliding_window_view`,
+    así que varias longitudes de ventana y todos los pliegues comparten la misma base;
+    solo se copia cada lote al pedirlo.
+    """
+    def __init__(self, base: np.ndarray, y, window: int, horizon: int = HORIZONTE):
+        self.base = base
+        self.window = window
+        self.horizon = horizon
+        y = np.asarray(y.to_numpy() if hasattr(y, 'to_numpy') else y, dtype=np.float32)
+        if len(y) != len(base):
+            raise ValueError(f"La base tiene {len(base)} filas y y tiene {len(y)}.")
+        n = max(len(base) - window - horizon + 1, 0)
+        if n > 0:
+            # sliding_window_view deja la ventana en el último eje: (n, features, window) → (n, window, features)
+            vistas = np.lib.stride_tricks.sliding_window_view(base, window, axis=0)
+            self.X = vistas[:n].transpose(0, 2, 1)
+        else:
+            # Serie más corta que la ventana: sin muestras (sliding_window_view fallaría)
+            self.X = np.empty((0, window, base.shape[1]), dtype=base.dtype)
+        self.y = y[window + horizon - 1:window + horizon - 1 + n]
+        # Fila de la base que predice cada muestra (el `idx` del notebook)
+        self.indices = np.arange(window + horizon - 1, window + horizon - 1 + n)
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    @property
+    def forma(self) -> tuple:
+        return (len(self), self.window, self.base.shape[1])
+
+    def lote(self, posiciones) -> tuple:
+        """Copia contigua (float32) de las muestras pedidas, lista para el modelo."""
+        if isinstance(posiciones, slice):
+            return np.ascontiguousarray(self.X[posiciones]), self.y[posiciones]
+        posiciones = np.asarray(posiciones)
+        return np.ascontiguousarray(self.X[posiciones]), self.y[posiciones]
+
+    def generador(self, inicio=0, fin=None, batch_size=TAMAÑO_LOTE, barajar=False, semilla=None):
+        """
+        Lotes (X, y) de las muestras [inicio, fin). Con `barajar` el orden cambia en
+        cada recorrido, como `model.fit(..., shuffle=True)`.
+        """
+        fin = len(self) if fin is None else fin
+        orden = np.arange(inicio, fin)
+        if barajar:
+            np.random.default_rng(semilla).shuffle(orden)
+            for i in range(0, len(orden), batch_size):
+                yield self.lote(np.sort(orden[i:i + batch_size]))
+        else:
+            for i in range(inicio, fin, batch_size):
+                yield self.lote(slice(i, min(i + batch_size, fin)))
+
+    def tf_dataset(self, inicio=0, fin=None, batch_size=TAMAÑO_LOTE, barajar=False, semilla=None):
+        """
+        `tf.data.Dataset` de lotes sobre `generador`, con prefetch. TensorFlow se
+        importa solo aquí, así que el resto del módulo no depende de él.
+        """
+        import tensorflow as tf
+
+        firma = (tf.TensorSpec(shape=(None, self.window, self.base.shape[1]), dtype=tf.float32),
+                 tf.TensorSpec(shape=(None,), dtype=tf.float32))
+        # Cada recorrido (época) llama de nuevo a la función y cambia la semilla del barajado
+        recorridos = iter(range(1 << 30))
+
+        def crear():
+            semilla_recorrido = None if semilla is None else semilla + next(recorridos)
+            return self.generador(inicio, fin, batch_size, barajar, semilla_recorrido)
+
+        return tf.data.Dataset.from_generator(crear, output_signature=firma).prefetch(tf.data.AUTOTUNE)
+
+    def pliegues(self, test_window=14, gap=7, train_window=None) -> list:
+        """
+        Pliegues de `lstm_walk_forward` en posiciones de muestra; por defecto el
+        entrenamiento usa max(120, 3 × window) secuencias.
+        """
+        train_window = max(MIN_TRAIN_LSTM, 3 * self.window) if train_window is None else train_window
+        return backtest.pliegues(len(self), train_window, test_window, gap)
+
+def secuencias_por_ventana(X, y, ventanas=VENTANAS_LSTM, horizon=HORIZONTE, ajuste=None) -> dict:
+    """Escala X una sola vez y devuelve {window: Secuencias} sobre esa misma base."""
+    base = escalar_min_max(X, ajuste)
+    return {w: Secuencias(base, y, w, horizon) for w in ventanas}
+
+# --- Referencia ---
+
+def _build_sequences(Xdf, yser, window, horizon=1):
+    """Versión del notebook: copia cada ventana en un arreglo 3-D."""
+    Xarr, yarr, idx = [], [], []
+    for i in range(window, len(Xdf) - horizon + 1):
+        Xarr.append(Xdf.iloc[i - window:i].values)
+        yarr.append(float(yser.iloc[i + horizon - 1]))
+        idx.append(i + horizon - 1)
+    Xarr = np.asarray(Xarr, dtype=np.float32)
+    yarr = np.asarray(yarr, dtype=np.float32)
+    return Xarr, yarr, idx
+
+# --- Benchmark ---
+
+def _medir(funcion):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resultado, segundos, pico
+
+def benchmark_secuencias(dias=3000, n_features=40, semilla=0):
+    """
+    Memoria pico y tiempo de construir las secuencias de 28 y 365 días, más un
+    recorrido completo por lotes, contra `build_sequences` del notebook.
+    """
+    rng = np.random.default_rng(semilla)
+    X = pd.DataFrame(rng.normal(size=(dias, n_features)), columns=[f"f{i}" for i in range(n_features)])
+    y = pd.Series(rng.poisson(6, size=dias).astype(float))
+
+    base, t_base, pico_base = _medir(lambda: escalar_min_max(X))
+    X_escalado = pd.DataFrame(base.astype(np.float64), columns=X.columns)
+    print(f"{dias} días × {n_features} features; base escalada {base.nbytes / 1e6:.1f} MB")
+    print(f"{'ventana':>8}{'notebook':>22}{'vistas + lotes':>24}")
+    for window in VENTANAS_LSTM:
+        (Xseq, yseq, idx), t_copia, pico_copia = _medir(lambda: _build_sequences(X_escalado, y, window))
+        secuencias = Secuencias(base, y, window)
+        np.testing.assert_array_equal(secuencias.X, Xseq)
+        np.testing.assert_array_equal(secuencias.y, yseq)
+        np.testing.assert_array_equal(secuencias.indices, idx)
+        del Xseq
+
+        def recorrer():
+            return sum(len(yb) for _, yb in secuencias.generador(batch_size=TAMAÑO_LOTE, barajar=True, semilla=0))
+        total, t_vistas, pico_vistas = _medir(recorrer)
+        assert total == len(secuencias)
+        print(f"{window:8d}{pico_copia / 1e6:10.1f} MB {t_copia:8.2f}s{pico_vistas / 1e6:12.1f} MB {t_vistas:8.2f}s")
+    print("Ventanas idénticas a build_sequences.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Secuencias para el LSTM como vistas de una base escalada.")
+    parser.add_argument("--dias", type=int, default=3000)
+    parser.add_argument("--features", type=int, default=40)
+    args = parser.parse_args()
+    benchmark_secuencias(args.dias, args.features)
@@ -0,0 +1,542 @@
+# utils/servidor_prediccion.py
+import argparse
+import copy
+import json
+import math
+import queue
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+import almacen
+from calendario_indice import CalendarioIndice
+from features_online import COLUMNAS_BASE, DIR_MODELOS, MotorFeatures, cargar_lista_features, fila_pronostico
+from registro_modelos import RegistroModelos
+
+# --- Constantes y Configuración ---
+
+HOST = '127.0.0.1'
+PUERTO = 8765
+RUTA_DATASET = Path(__file__).parent.parent / 'Dataset_homicidios_Actualizado.csv'
+
+# Micro-lotes: las peticiones que llegan mientras se espera el primer vector se
+# agrupan en una sola llamada a predict (hasta MAX_LOTE filas).
+ESPERA_LOTE = 0.002
+MAX_LOTE = 256
+
+# Pronósticos más allá del día siguiente: recursivos, usando la predicción de cada
+# día como su conteo de homicidios.
+HORIZONTE_MAXIMO = 30
+
+# Latencias guardadas para los percentiles
+MUESTRAS_LATENCIA = 10000
+
+# --- Modelo Vigente ---
+
+def rutas_modelo_actual(dir_modelos=DIR_MODELOS, compilado=True):
+    """
+    Modelo mejorado más reciente del registro y su metadata.
+
+    Args:
+        compilado (bool): Preferir la versión compilada del bosque si existe
+            (ver bosque_compilado.py).
+
+    Returns:
+        tuple: (ruta del .joblib, ruta del metadata_mejorado_*.json).
+    """
+    registro = RegistroModelos(dir_modelos)
+    corrida = registro.ultimo('mejorado')
+    rol = 'compilado' if compilado and 'compilado' in corrida['artefactos'] else 'modelo'
+    return registro.ruta(corrida, rol), registro.ruta(corrida, 'metadata')
+
+def cargar_dataset() -> pd.DataFrame:
+    """Dataset del merge (Feather del almacén o, si no existe, el CSV de la raíz)."""
+    try:
+        df = almacen.cargar('dataset')
+    except FileNotFoundError:
+        df = almacen._cargar_csv(RUTA_DATASET)
+    return df.sort_values('date').reset_index(drop=True)
+
+# --- Micro-lotes ---
+
+class LotePredicciones:
+    """
+    Agrupa los vectores de peticiones concurrentes en una sola llamada a `predict`.
+
+    Un hilo toma el primer vector de la cola, espera hasta `espera` segundos por más
+    (o hasta `max_lote` filas) y predice todo junto; cada petición recibe sus filas
+    por un Future. Una vez cerrado (al recargar el modelo), las peticiones que
+    todavía usan este lote predicen directamente, sin pasar por el hilo.
+    """
+    def __init__(self, modelo, features, espera=ESPERA_LOTE, max_lote=MAX_LOTE):
+        self.modelo = modelo
+        self.features = list(features)
+        self.espera = espera
+        self.max_lote = max_lote
+        self.cola = queue.Queue()
+        self.cerrado = False
+        self.candado = threading.Lock()
+        self.lotes = 0
+        self.filas = 0
+        self.hilo = threading.Thread(target=self._trabajar, daemon=True)
+        self.hilo.start()
+
+    def predecir(self, vectores: np.ndarray) -> np.ndarray:
+        """Predicciones de las filas de `vectores` (bloquea hasta que salga su lote)."""
+        vectores = np.atleast_2d(vectores)
+        # El candado garantiza que nada entre a la cola después de la marca de cierre
+        with self.candado:
+            futuro = None if self.cerrado else Future()
+            if futuro is not None:
+                self.cola.put((vectores, futuro))
+        if futuro is None:
+            return self._predecir(vectores)
+        return futuro.result()
+
+    def cerrar(self):
+        """Termina el hilo después de atender lo que ya está en la cola."""
+        with self.candado:
+            if not self.cerrado:
+                self.cerrado = True
+                self.cola.put(None)
+
+    def _predecir(self, vectores: np.ndarray) -> np.ndarray:
+        X = pd.DataFrame(vectores, columns=self.features)
+        pred = np.asarray(self.modelo.predict(X), dtype=np.float64)
+        self.lotes += 1
+        self.filas += len(X)
+        return pred
+
+    def _trabajar(self):
+        while True:
+            primero = self.cola.get()
+            if primero is None:
+                return
+            pendientes, filas, cerrar = [primero], len(primero[0]), False
+            limite = time.monotonic() + self.espera
+            while filas < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    item = self.cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if item is None:
+                    cerrar = True
+                    break
+                pendientes.append(item)
+                filas += len(item[0])
+
+            try:
+                pred = self._predecir(np.vstack([v for v, _ in pendientes]))
+            except Exception as e:
+                for _, futuro in pendientes:
+                    futuro.set_exception(e)
+            else:
+                inicio = 0
+                for vectores, futuro in pendientes:
+                    futuro.set_result(pred[inicio:inicio + len(vectores)])
+                    inicio += len(vectores)
+            if cerrar:
+                return
+
+# --- Latencias ---
+
+class Latencias:
+    """Últimas `n` latencias por ruta, con percentiles en milisegundos."""
+    def __init__(self, n=MUESTRAS_LATENCIA):
+        self.n = n
+        self.muestras = {}
+        self.candado = threading.Lock()
+
+    def registrar(self, ruta: str, segundos: float):
+        with self.candado:
+            self.muestras.setdefault(ruta, deque(maxlen=self.n)).append(segundos)
+
+    def percentiles(self) -> dict:
+        with self.candado:
+            copia = {ruta: np.array(m) * 1000 for ruta, m in self.muestras.items()}
+        return {
+            ruta: {'n': len(ms), 'p50_ms': float(np.percentile(ms, 50)), 'p90_ms': float(np.percentile(ms, 90)),
+                   'p99_ms': float(np.percentile(ms, 99)), 'max_ms': float(ms.max())}
+            for ruta, ms in copia.items() if len(ms)
+        }
+
+# --- Servicio ---
+
+class EstadoServicio:
+    """
+    Todo lo que se mantiene en memoria para un modelo y un dataset: el modelo, la
+    lista de features, el motor de features al último día, los vectores históricos y
+    los estados ya pronosticados para días futuros.
+    """
+    def __init__(self, modelo, features, df: pd.DataFrame, ruta_modelo=None, indice=None):
+        self.modelo = modelo
+        self.features = list(features)
+        self.ruta_modelo = ruta_modelo
+        self.indice = indice or CalendarioIndice()
+
+        # Una pasada del motor: deja el estado al último día y los vectores de cada día
+        self.motor = MotorFeatures(self.features)
+        registros = df.to_dict('records')
+        self.historicos = np.array([self.motor.paso(fila) for fila in registros]).reshape(len(df), len(self.features))
+        self.fechas = pd.DatetimeIndex(df['date']).normalize()
+        self.observados = df['homicidios'].to_numpy(dtype=np.float64)
+        self.ultima_fila = registros[-1]
+        self.siguiente = self.motor.ultima_fecha + pd.Timedelta(days=1)
+
+        self.lote = LotePredicciones(modelo, self.features)
+        # Motor con la historia hasta el día anterior a cada fecha futura
+        self.motores_futuros = {self.siguiente: self.motor}
+        self.candado_futuro = threading.Lock()
+        self.memo = {}
+
+    def _fila_futura(self, fecha, covariables=None) -> dict:
+        fila = fila_pronostico(self.ultima_fila, fecha, self.indice)
+        if covariables:
+            fila.update(covariables)
+        return fila
+
+    def _motor_para(self, fecha: pd.Timestamp) -> MotorFeatures:
+        """Motor listo para `fecha`, extendiendo el pronóstico recursivo si hace falta."""
+        if fecha in self.motores_futuros:
+            return self.motores_futuros[fecha]
+        with self.candado_futuro:
+            dia = max(self.motores_futuros)
+            while dia < fecha:
+                motor = self.motores_futuros[dia]
+                fila = self._fila_futura(dia)
+                fila['homicidios'] = float(self.lote.predecir(motor.vector(fila))[0])
+                siguiente = copy.deepcopy(motor)
+                siguiente.agregar(fila)
+                dia += pd.Timedelta(days=1)
+                self.motores_futuros[dia] = siguiente
+        return self.motores_futuros[fecha]
+
+    def vectores(self, consultas: list):
+        """
+        Vectores de features de varias consultas.
+
+        Args:
+            consultas (list): Dicts con 'fecha' (None = día siguiente) y, opcionalmente,
+                'covariables' con valores de COLUMNAS_BASE para fechas sin datos.
+
+        Returns:
+            tuple: (matriz de vectores, lista de dicts con la descripción de cada uno).
+        """
+        vectores, info = [], []
+        for consulta in consultas:
+            fecha = pd.Timestamp(consulta.get('fecha') or self.siguiente).normalize()
+            covariables = consulta.get('covariables') or {}
+            desconocidas = set(covariables) - set(COLUMNAS_BASE)
+            if desconocidas:
+                raise ValueError(f"Covariables desconocidas: {sorted(desconocidas)}")
+            if fecha < self.fechas[0]:
+                raise ValueError(f"{fecha.date()} es anterior al dataset ({self.fechas[0].date()}).")
+            if fecha < self.siguiente:
+                if covariables:
+                    raise ValueError("Las covariables solo se pueden cambiar en fechas sin datos.")
+                i = self.fechas.get_loc(fecha)
+                vectores.append(self.historicos[i])
+                observado = self.observados[i]
+                info.append({'fecha': fecha.strftime('%Y-%m-%d'), 'tipo': 'historico',
+                             'observado': None if math.isnan(observado) else observado})
+                continue
+            horizonte = (fecha - self.siguiente).days + 1
+            if horizonte > HORIZONTE_MAXIMO:
+                raise ValueError(f"{fecha.date()} está a {horizonte} días; el máximo es {HORIZONTE_MAXIMO}.")
+            vectores.append(self._motor_para(fecha).vector(self._fila_futura(fecha, covariables)))
+            info.append({'fecha': fecha.strftime('%Y-%m-%d'), 'tipo': 'siguiente' if horizonte == 1 else 'recursivo',
+                         'horizonte': horizonte})
+        return np.array(vectores).reshape(len(vectores), len(self.features)), info
+
+    def _clave(self, consulta):
+        if consulta.get('covariables'):
+            return None
+        return pd.Timestamp(consulta.get('fecha') or self.siguiente).strftime('%Y-%m-%d')
+
+    def predecir(self, consultas: list) -> list:
+        """
+        Predicciones de varias consultas en un solo lote (ver `vectores`). Las
+        consultas solo por fecha se memorizan: con el mismo modelo y dataset la
+        respuesta no cambia, y los tableros piden una y otra vez las mismas fechas.
+        """
+        claves = [self._clave(c) for c in consultas]
+        faltantes = [k for k, clave in enumerate(claves) if clave not in self.memo]
+        nuevas = {}
+        if faltantes:
+            X, info = self.vectores([consultas[k] for k in faltantes])
+            pred = self.lote.predecir(X)
+            nuevas = {k: {**i, 'prediccion': float(p)} for k, i, p in zip(faltantes, info, pred)}
+            for k, respuesta in nuevas.items():
+                if claves[k] is not None:
+                    self.memo[claves[k]] = respuesta
+        return [self.memo[clave] if clave in self.memo else nuevas[k] for k, clave in enumerate(claves)]
+
+def cargar_estado(ruta_modelo=None, ruta_metadata=None, df=None) -> EstadoServicio:
+    """Carga modelo, features y dataset una vez; se reutilizan en todas las peticiones."""
+    import joblib
+
+    if ruta_modelo is None:
+        ruta_modelo, ruta_metadata = rutas_modelo_actual()
+    features = cargar_lista_features(ruta_metadata)
+    # Los arreglos del bosque compilado quedan en memory map, compartidos entre procesos
+    modelo = joblib.load(ruta_modelo, mmap_mode='r')
+    # Los lotes son pequeños: repartir los árboles entre hilos cuesta más que predecir
+    if hasattr(modelo, 'get_params') and 'n_jobs' in modelo.get_params():
+        modelo.set_params(n_jobs=1)
+    if df is None:
+        df = cargar_dataset()
+    return EstadoServicio(modelo, features, df, ruta_modelo)
+
+class ServicioPrediccion:
+    """Estado vigente (reemplazable en caliente) y latencias del servidor."""
+    def __init__(self, cargador=cargar_estado):
+        self.cargador = cargador
+        self.latencias = Latencias()
+        self.inicio = time.time()
+        self.estado = cargador()
+
+    def recargar(self):
+        """
+        Vuelve a cargar modelo y dataset. Las peticiones en curso terminan con el estado
+        anterior: lo que ya estaba en su cola sale en el último lote y lo que llega
+        después (p. ej. los pasos de un pronóstico recursivo) se predice directamente.
+        """
+        nuevo = self.cargador()
+        anterior, self.estado = self.estado, nuevo
+        anterior.lote.cerrar()
+
+    def salud(self) -> dict:
+        estado = self.estado
+        return {
+            'modelo': str(estado.ruta_modelo), 'features': len(estado.features),
+            'ultima_fecha': estado.motor.ultima_fecha.strftime('%Y-%m-%d'),
+            'siguiente': estado.siguiente.strftime('%Y-%m-%d'),
+            'activo_s': round(time.time() - self.inicio, 1),
+        }
+
+    def metricas(self) -> dict:
+        lote = self.estado.lote
+        return {
+            'latencias': self.latencias.percentiles(),
+            'lotes': lote.lotes, 'filas': lote.filas,
+            'filas_por_lote': lote.filas / lote.lotes if lote.lotes else 0.0,
+        }
+
+# --- HTTP ---
+
+class _Manejador(BaseHTTPRequestHandler):
+    servicio = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _atender(self, ruta, funcion):
+        inicio = time.perf_counter()
+        try:
+            codigo, cuerpo = 200, funcion()
+        except (ValueError, KeyError) as e:
+            codigo, cuerpo = 400, {'error': str(e)}
+        except Exception as e:
+            print(f"Error al atender {ruta}: {e}", file=sys.stderr)
+            codigo, cuerpo = 500, {'error': str(e)}
+        self._responder(codigo, cuerpo)
+        self.servicio.latencias.registrar(ruta, time.perf_counter() - inicio)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parametros = parse_qs(url.query)
+        if url.path == '/prediccion':
+            fechas = parametros.get('fecha', [None])
+            self._atender(url.path, lambda: self.servicio.estado.predecir([{'fecha': f} for f in fechas]))
+        elif url.path == '/salud':
+            self._atender(url.path, self.servicio.salud)
+        elif url.path == '/metricas':
+            self._atender(url.path, self.servicio.metricas)
+        else:
+            self._responder(404, {'error': f"Ruta desconocida: {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        longitud = int(self.headers.get('Content-Length') or 0)
+        cuerpo = self.rfile.read(longitud) if longitud else b''
+        if url.path == '/prediccion':
+            def predecir():
+                consultas = json.loads(cuerpo or b'[]')
+                if isinstance(consultas, dict):
+                    consultas = [consultas]
+                return self.servicio.estado.predecir(consultas)
+            self._atender(url.path, predecir)
+        elif url.path == '/recargar':
+            self._atender(url.path, lambda: (self.servicio.recargar(), self.servicio.salud())[1])
+        else:
+            self._responder(404, {'error': f"Ruta desconocida: {url.path}"})
+
+class _ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler espera una dirección de cliente con host y puerto
+        solicitud, _ = super().get_request()
+        return solicitud, ('unix', 0)
+
+def crear_servidor(servicio: ServicioPrediccion, host=HOST, puerto=PUERTO, ruta_socket=None):
+    """
+    Servidor HTTP multihilo (TCP o socket Unix) sobre un servicio ya cargado.
+
+    Rutas:
+        GET  /prediccion[?fecha=AAAA-MM-DD]  Día siguiente o cualquier fecha (repetible).
+        POST /prediccion  JSON: [{"fecha": ..., "covariables": {...}}, ...]
+        GET  /metricas    Percentiles de latencia por ruta y tamaño de los lotes.
+        GET  /salud       Modelo y última fecha cargados.
+        POST /recargar    Vuelve a leer el modelo más reciente y el dataset.
+    """
+    manejador = type('Manejador', (_Manejador,), {'servicio': servicio})
+    if ruta_socket is not None:
+        Path(ruta_socket).unlink(missing_ok=True)
+        return _ServidorUnix(str(ruta_socket), manejador)
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    return servidor
+
+# --- Bloque de Ejecución ---
+
+def main(host=HOST, puerto=PUERTO, ruta_socket=None):
+    inicio = time.perf_counter()
+    servicio = ServicioPrediccion()
+    salud = servicio.salud()
+    print(f"Modelo {Path(salud['modelo']).name} con {salud['features']} features; "
+          f"datos al {salud['ultima_fecha']} (cargado en {time.perf_counter() - inicio:.2f} s).")
+    servidor = crear_servidor(servicio, host, puerto, ruta_socket)
+    print(f"Sirviendo en {ruta_socket or f'http://{host}:{servidor.server_address[1]}'} (Ctrl+C para terminar).")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        if ruta_socket is not None:
+            Path(ruta_socket).unlink(missing_ok=True)
+
+# --- Benchmark ---
+
+def benchmark_servidor(clientes=8, peticiones=100, escenarios=20, cargas_en_frio=10):
+    """
+    Compara cargar el modelo en cada predicción (como los scripts uso_modelo_mejorado_*)
+    con el servidor en caliente atendiendo clientes concurrentes: consultas repetidas
+    por fecha (como un tablero) y escenarios con covariables distintas, sin y con
+    micro-lotes.
+    """
+    import warnings
+    from concurrent.futures import ThreadPoolExecutor
+    from urllib.request import Request, urlopen
+
+    import joblib
+
+    warnings.filterwarnings('ignore')
+    ruta_modelo, _ = rutas_modelo_actual(compilado=False)
+    servicio = ServicioPrediccion()
+    estado = servicio.estado
+    fila = fila_pronostico(estado.ultima_fila, estado.siguiente, estado.indice)
+    vector = pd.DataFrame([estado.motor.vector(fila)], columns=estado.features)
+
+    inicio = time.perf_counter()
+    for _ in range(cargas_en_frio):
+        esperado = float(joblib.load(ruta_modelo).predict(vector)[0])
+    t_frio = (time.perf_counter() - inicio) / cargas_en_frio
+
+    servidor = crear_servidor(servicio, puerto=0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://{HOST}:{servidor.server_address[1]}"
+    fechas = [None] + [f.strftime('%Y-%m-%d') for f in estado.fechas[-60:]]
+
+    def consulta_fecha(k, i):
+        fecha = fechas[(k + i) % len(fechas)]
+        with urlopen(base + '/prediccion' + (f'?fecha={fecha}' if fecha else '')) as r:
+            respuesta = json.loads(r.read())[0]
+        if fecha is None:
+            assert abs(respuesta['prediccion'] - esperado) < 1e-6
+
+    def consulta_escenario(k, i):
+        cuerpo = json.dumps({'covariables': {'tavg': 20.0 + k + i / 100, 'has_event': 1}}).encode()
+        with urlopen(Request(base + '/prediccion', cuerpo, method='POST')) as r:
+            json.loads(r.read())
+
+    def medir(consulta, n):
+        def cliente(k):
+            latencias = []
+            for i in range(n):
+                inicio = time.perf_counter()
+                consulta(k, i)
+                latencias.append(time.perf_counter() - inicio)
+            return latencias
+        lotes_previos = estado.lote.lotes
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(clientes) as pool:
+            latencias = np.concatenate([np.array(l) for l in pool.map(cliente, range(clientes))]) * 1000
+        t_total = time.perf_counter() - inicio
+        print(f"  p50 {np.percentile(latencias, 50):7.2f} ms, p99 {np.percentile(latencias, 99):7.2f} ms; "
+              f"{len(latencias) / t_total:5.0f} peticiones/s, {estado.lote.lotes - lotes_previos} llamadas a predict")
+
+    try:
+        print(f"Modelo: {ruta_modelo.name} ({ruta_modelo.stat().st_size / 1e6:.1f} MB), {len(estado.features)} features")
+        print(f"Carga en frío + predict por petición: {t_frio * 1000:.1f} ms")
+        print(f"Servidor en caliente, {clientes} clientes:")
+        print(f" Tablero ({peticiones} consultas por fecha cada uno):")
+        medir(consulta_fecha, peticiones)
+        print(f" Escenarios ({escenarios} cada uno), un predict por petición:")
+        estado.lote.max_lote = 1
+        medir(consulta_escenario, escenarios)
+        print(f" Escenarios ({escenarios} cada uno), con micro-lotes:")
+        estado.lote.max_lote = MAX_LOTE
+        medir(consulta_escenario, escenarios)
+
+        # Históricos iguales a predecir sobre los vectores del motor; pronóstico a 7 días
+        cuerpo = json.dumps([{'fecha': f} for f in fechas[1:]]
+                            + [{'fecha': (estado.siguiente + pd.Timedelta(days=6)).strftime('%Y-%m-%d')}])
+        with urlopen(Request(base + '/prediccion', cuerpo.encode(), method='POST')) as r:
+            lote = json.loads(r.read())
+        directo = joblib.load(ruta_modelo).predict(pd.DataFrame(estado.historicos[-60:], columns=estado.features))
+        np.testing.assert_allclose([p['prediccion'] for p in lote[:-1]], directo, rtol=0, atol=1e-6)
+        with urlopen(base + '/metricas') as r:
+            metricas = json.loads(r.read())
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+    print(f"Filas por llamada a predict (promedio): {metricas['filas_por_lote']:.1f}")
+    print(f"Pronóstico a 7 días ({lote[-1]['fecha']}): {lote[-1]['prediccion']:.2f}")
+    print("Predicciones iguales (±1e-6) a cargar el modelo de sklearn y predecir directamente.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de predicciones con el modelo en memoria.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--socket", default=None, help="Ruta de un socket Unix en lugar de TCP.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compara la carga por petición con el servidor en caliente.")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark_servidor()
+    else:
+        main(args.host, args.puerto, args.socket)
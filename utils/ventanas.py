@@ -0,0 +1,299 @@
+# utils/ventanas.py
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- Constantes y Configuración ---
+
+# Features de series de tiempo de experimentacion_modelos.ipynb ("CARACTERÍSTICAS DE
+# LAG Y ROLLING WINDOWS"). Los nombres resultantes son '{prefijo}_lag_1',
+# '{prefijo}_rolling_mean_3', '{prefijo}_diff_1', '{prefijo}_expanding_mean',
+# '{prefijo}_volatility_7', etc.
+ESPECIFICACION = {
+    'lag': [1, 2, 3, 7, 14, 30],
+    'rolling': [3, 7, 14, 30],          # mean, std, max y min por ventana
+    'diff': [1, 7],
+    'expanding': True,                  # mean y std desde el inicio
+    'volatility': [7, 14, 30],          # desviación estándar móvil
+}
+
+ESTADISTICOS_ROLLING = ['mean', 'std', 'max', 'min']
+
+SERIES_POR_BLOQUE = 8
+
+def nombres_features(prefijo='homicidios', espec=ESPECIFICACION) -> list:
+    """Nombres de las columnas que produce construir_matriz, en orden."""
+    nombres = [f'{prefijo}_lag_{k}' for k in espec.get('lag', [])]
+    for w in espec.get('rolling', []):
+        nombres += [f'{prefijo}_rolling_{stat}_{w}' for stat in ESTADISTICOS_ROLLING]
+    nombres += [f'{prefijo}_diff_{k}' for k in espec.get('diff', [])]
+    if espec.get('expanding'):
+        nombres += [f'{prefijo}_expanding_mean', f'{prefijo}_expanding_std']
+    nombres += [f'{prefijo}_volatility_{w}' for w in espec.get('volatility', [])]
+    return nombres
+
+# --- Construcción de la Matriz ---
+
+class _Acumulados:
+    """Sumas acumuladas de una base (series x días) que comparten todas las ventanas."""
+    def __init__(self, base: np.ndarray):
+        self.base = base
+        s, n = base.shape
+        valido = ~np.isnan(base)
+        # Centrar cada serie reduce la cancelación en suma de cuadrados - suma²/n
+        con_datos = valido.any(axis=1)
+        self.centro = np.zeros((s, 1))
+        self.centro[con_datos, 0] = np.nanmean(base[con_datos], axis=1)
+        centrada = np.where(valido, base - self.centro, 0.0)
+
+        self.suma = np.zeros((s, n + 1))
+        self.cuadrados = np.zeros((s, n + 1))
+        self.conteo = np.zeros((s, n + 1), dtype=np.int64)
+        np.cumsum(centrada, axis=1, out=self.suma[:, 1:])
+        np.cumsum(centrada * centrada, axis=1, out=self.cuadrados[:, 1:])
+        np.cumsum(valido, axis=1, out=self.conteo[:, 1:])
+        # Cambios de valor entre días consecutivos, para detectar ventanas constantes
+        # (pandas devuelve ahí la media exacta y desviación 0)
+        self.cambios = np.zeros((s, n), dtype=np.int64)
+        np.cumsum(base[:, 1:] != base[:, :-1], axis=1, out=self.cambios[:, 1:])
+        self._media_std = {}
+        self._extremos = {1: (base, base)}
+
+    def max_min(self, w: int):
+        """
+        Máximo y mínimo de cada ventana de w días (NaN si la ventana tiene NaN).
+
+        Tabla dispersa: los extremos de ventanas de 2^k días se obtienen duplicando los
+        de 2^(k-1), y una ventana de w días es la unión de dos ventanas de 2^k <= w días
+        que se traslapan. Todas las ventanas comparten los mismos niveles.
+        """
+        p = 1
+        while p * 2 <= w:
+            if p * 2 not in self._extremos:
+                maximo, minimo = self._extremos[p]
+                self._extremos[p * 2] = (np.maximum(maximo[:, :-p], maximo[:, p:]),
+                                         np.minimum(minimo[:, :-p], minimo[:, p:]))
+            p *= 2
+        # Nivel p: columna i = ventana de p días que empieza en el día i
+        maximo, minimo = self._extremos[p]
+        inicio, fin = slice(0, self.base.shape[1] - w + 1), slice(w - p, self.base.shape[1] - p + 1)
+        return (np.maximum(maximo[:, inicio], maximo[:, fin]),
+                np.minimum(minimo[:, inicio], minimo[:, fin]))
+
+    def media_std(self, w: int):
+        """Media y desviación estándar (ddof=1) de cada ventana completa de w días."""
+        if w in self._media_std:
+            return self._media_std[w]
+        suma = self.suma[:, w:] - self.suma[:, :-w]
+        cuadrados = self.cuadrados[:, w:] - self.cuadrados[:, :-w]
+        completa = (self.conteo[:, w:] - self.conteo[:, :-w]) == w
+        constante = (self.cambios[:, w - 1:] - self.cambios[:, :self.base.shape[1] - w + 1]) == 0
+
+        media = suma / w + self.centro
+        np.copyto(media, self.base[:, w - 1:], where=constante)
+        if w > 1:
+            var = np.maximum(cuadrados - suma * suma / w, 0.0) / (w - 1)
+            std = np.sqrt(var)
+            std[constante] = 0.0
+        else:
+            std = np.full_like(media, np.nan)
+        media[~completa] = np.nan
+        std[~completa] = np.nan
+        self._media_std[w] = (media, std)
+        return media, std
+
+    def expanding(self):
+        """Media y desviación estándar desde el inicio (ignorando NaN, como pandas)."""
+        conteo = self.conteo[:, 1:]
+        suma, cuadrados = self.suma[:, 1:], self.cuadrados[:, 1:]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = suma / conteo + self.centro
+            std = np.sqrt(np.maximum(cuadrados - suma * suma / conteo, 0.0) / (conteo - 1))
+        maximo = np.fmax.accumulate(self.base, axis=1)
+        constante = maximo == np.fmin.accumulate(self.base, axis=1)
+        np.copyto(media, maximo, where=constante)
+        std[constante] = 0.0
+        media[conteo == 0] = np.nan
+        std[conteo < 2] = np.nan
+        return media, std
+
+def _desplazar(x: np.ndarray, k: int) -> np.ndarray:
+    if k == 0:
+        return x
+    resultado = np.full_like(x, np.nan)
+    k = min(k, x.shape[1])
+    resultado[:, k:] = x[:, :x.shape[1] - k]
+    return resultado
+
+def _llenar_bloque(x: np.ndarray, espec: dict, desplazamiento: int, bloque: np.ndarray):
+    """Escribe las features de un bloque de series en `bloque` (features, series, días)."""
+    n = x.shape[1]
+    j = 0
+    # Con k >= n el lag y la diferencia quedan todo NaN, como en pandas
+    for k in espec.get('lag', []):
+        k = min(k, n)
+        bloque[j, :, :k] = np.nan
+        bloque[j, :, k:] = x[:, :n - k]
+        j += 1
+
+    ventanas = _Acumulados(_desplazar(x, desplazamiento))
+    for w in espec.get('rolling', []):
+        bloque[j:j + 4, :, :w - 1] = np.nan
+        if w <= n:
+            bloque[j, :, w - 1:], bloque[j + 1, :, w - 1:] = ventanas.media_std(w)
+            bloque[j + 2, :, w - 1:], bloque[j + 3, :, w - 1:] = ventanas.max_min(w)
+        j += 4
+
+    for k in espec.get('diff', []):
+        k = min(k, n)
+        bloque[j, :, :k] = np.nan
+        np.subtract(x[:, k:], x[:, :n - k], out=bloque[j, :, k:])
+        j += 1
+
+    if espec.get('expanding'):
+        bloque[j], bloque[j + 1] = ventanas.expanding()
+        j += 2
+
+    for w in espec.get('volatility', []):
+        bloque[j, :, :w - 1] = np.nan
+        if w <= n:
+            bloque[j, :, w - 1:] = ventanas.media_std(w)[1]
+        j += 1
+
+def construir_matriz(valores, espec=ESPECIFICACION, desplazamiento: int = 0, salida=None,
+                     series_por_bloque: int = SERIES_POR_BLOQUE) -> np.ndarray:
+    """
+    Calcula todas las features de ventana de una o varias series en una sola pasada.
+
+    Las medias y desviaciones salen de sumas acumuladas (O(días) por ventana), máximos
+    y mínimos de una tabla dispersa de ventanas compartida (O(días · log ventana)).
+    Las series se procesan por bloques: cada feature se calcula sobre un arreglo
+    contiguo y el bloque se copia una sola vez a la matriz de salida. Las definiciones
+    son las de pandas con los parámetros por defecto: una ventana con algún NaN da NaN;
+    expanding ignora los NaN.
+
+    Args:
+        valores (np.ndarray): (días,) o (días, series), días consecutivos.
+        espec (dict): Features a calcular (ver ESPECIFICACION).
+        desplazamiento (int): Días que se retrasan las ventanas (rolling, expanding y
+            volatility); 1 equivale a `.shift(1).rolling(...)`, sin fuga del propio día.
+        salida (np.ndarray): Matriz (series, días, features) float64 a reutilizar.
+        series_por_bloque (int): Series que se calculan juntas (acota la memoria temporal).
+
+    Returns:
+        np.ndarray: (series, días, features), en el orden de nombres_features.
+        `salida.reshape(-1, n_features)` es la matriz del panel en formato largo (una
+        fila por serie y día) sin copiar.
+    """
+    x = np.asarray(valores, dtype=np.float64)
+    if x.ndim == 1:
+        x = x[:, None]
+    # Series en filas: cada serie queda contigua en memoria
+    x = np.ascontiguousarray(x.T)
+    s, n = x.shape
+    n_features = len(nombres_features('x', espec))
+    if salida is None:
+        salida = np.empty((s, n, n_features))
+    elif salida.shape != (s, n, n_features):
+        raise ValueError(f"La matriz de salida debe tener forma {(s, n, n_features)}.")
+
+    bloque = np.empty((n_features, min(series_por_bloque, s), n))
+    for inicio in range(0, s, series_por_bloque):
+        fin = min(inicio + series_por_bloque, s)
+        parte = bloque[:, :fin - inicio]
+        _llenar_bloque(x[inicio:fin], espec, desplazamiento, parte)
+        salida[inicio:fin] = parte.transpose(1, 2, 0)
+    return salida
+
+def features_ventanas(df: pd.DataFrame, columna='homicidios', por=None, espec=ESPECIFICACION,
+                      desplazamiento: int = 0) -> pd.DataFrame:
+    """
+    Versión para DataFrames: una serie diaria o un panel en formato largo.
+
+    Args:
+        df (pd.DataFrame): Con 'date', `columna` y, para un panel, la columna `por`
+            (p. ej. la ciudad). Los días faltantes de cada serie cuentan como NaN.
+        columna (str): Serie a transformar; también es el prefijo de los nombres.
+        por (str): Columna que identifica cada serie del panel.
+
+    Returns:
+        pd.DataFrame: Las features, con el mismo índice que `df`.
+    """
+    fechas = pd.date_range(df['date'].min(), df['date'].max(), freq='D')
+    nombres = nombres_features(columna, espec)
+    if por is None:
+        ancho = df.set_index('date')[columna].reindex(fechas).to_frame()
+        series = [None]
+    else:
+        ancho = df.pivot(index='date', columns=por, values=columna).reindex(fechas)
+        series = list(ancho.columns)
+    matriz = construir_matriz(ancho.to_numpy(), espec, desplazamiento)
+
+    # Posición de cada fila de df en la matriz (serie, día)
+    dia = (df['date'] - fechas[0]).dt.days.to_numpy()
+    serie = np.zeros(len(df), dtype=np.intp) if por is None else pd.Index(series).get_indexer(df[por])
+    return pd.DataFrame(matriz[serie, dia], index=df.index, columns=nombres)
+
+# --- Referencia ---
+
+def _features_pandas(serie: pd.Series, prefijo='homicidios', espec=ESPECIFICACION) -> pd.DataFrame:
+    """Una columna por llamada de pandas, como en el notebook."""
+    df = pd.DataFrame(index=serie.index)
+    for lag in espec.get('lag', []):
+        df[f'{prefijo}_lag_{lag}'] = serie.shift(lag)
+    for window in espec.get('rolling', []):
+        df[f'{prefijo}_rolling_mean_{window}'] = serie.rolling(window=window).mean()
+        df[f'{prefijo}_rolling_std_{window}'] = serie.rolling(window=window).std()
+        df[f'{prefijo}_rolling_max_{window}'] = serie.rolling(window=window).max()
+        df[f'{prefijo}_rolling_min_{window}'] = serie.rolling(window=window).min()
+    for k in espec.get('diff', []):
+        df[f'{prefijo}_diff_{k}'] = serie.diff(k)
+    if espec.get('expanding'):
+        df[f'{prefijo}_expanding_mean'] = serie.expanding().mean()
+        df[f'{prefijo}_expanding_std'] = serie.expanding().std()
+    for window in espec.get('volatility', []):
+        df[f'{prefijo}_volatility_{window}'] = serie.rolling(window=window).std()
+    return df
+
+# --- Benchmark ---
+
+def benchmark_ventanas(series=100, años=10, semilla=0):
+    """
+    Mide el constructor contra pandas columna por columna en un panel de series (la
+    equivalencia se prueba en tests/test_ventanas.py).
+    """
+    import warnings
+
+    rng = np.random.default_rng(semilla)
+    n = int(años * 365.25)
+    # Conteos con tendencia por serie, huecos y tramos constantes (días sin registro)
+    tasas = rng.uniform(1, 20, series) * (1 + 0.5 * np.sin(np.arange(n) / 90.0))[:, None]
+    valores = rng.poisson(tasas).astype(np.float64)
+    valores[rng.random((n, series)) < 0.01] = np.nan
+    valores[100:130, 0] = 0.0
+
+    # pandas advierte al agregar columnas una a una
+    warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+    inicio = time.perf_counter()
+    for i in range(series):
+        _features_pandas(pd.Series(valores[:, i]))
+    t_pandas = time.perf_counter() - inicio
+
+    salida = np.empty((series, n, len(nombres_features())))
+    inicio = time.perf_counter()
+    construir_matriz(valores, salida=salida)
+    t_matriz = time.perf_counter() - inicio
+
+    print(f"Panel: {series} series x {n} días, {salida.shape[2]} features "
+          f"({salida.nbytes / 1024**2:.0f} MB)")
+    print(f"pandas, columna por columna: {t_pandas:8.3f} s")
+    print(f"Matriz en una pasada:        {t_matriz:8.3f} s ({t_pandas / t_matriz:.0f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Features de lags y ventanas móviles con NumPy.")
+    parser.add_argument("--series", type=int, default=100)
+    parser.add_argument("--años", type=int, default=10)
+    args = parser.parse_args()
+    benchmark_ventanas(args.series, args.años)